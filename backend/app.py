@@ -12,19 +12,36 @@ else:
     load_dotenv('.env')
     print("✅ Loaded .env (development)")
 
-from flask import Flask, render_template, request, jsonify,  send_from_directory
+from flask import Flask, render_template, request, jsonify,  send_from_directory, Response, stream_with_context
 from flask_cors import CORS
 from models.predictor import TrafficPredictor
 from datetime import datetime, timedelta
 import pandas as pd
+import numpy as np
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from services.traffic_api import TrafficAPIService
 from services.database import DatabaseService
+from services.aggregation import SimulationAggregate
+from services.simulation_cache import SimulationCache, scenario_fingerprint
+from services.scheduling import StartTimeRanking
+from services.uncertainty import DelayUncertainty, uncertainty_options, probability_matrix
+from services.job_queue import (
+    JobQueue, JobLimitError, register_job_handler, register_worker_initializer,
+    ACTIVE_STATUSES, TERMINAL_STATUSES, SUCCEEDED, CANCELLED
+)
+from services.road_network import RoadNetworkLoader
+from services.traffic_assignment import NetworkImpactModel
+from services.routing import RoutingEngine, directions_json
+from services.http_client import get_http_client
+from services.realtime_poller import RealtimePoller
 from services.email_service import send_otp_email
 from werkzeug.utils import secure_filename
 from flask import send_file
 import random
 import string
-from routes.auth import auth_bp
+from routes.auth import auth_bp, decode_token
 from flask import jsonify, request, send_file, make_response
 from datetime import datetime
 import pandas as pd
@@ -124,6 +141,9 @@ except Exception as e:
 # After creating the app
 traffic_service = TrafficAPIService()
 
+# Shared keep-alive client for TomTom / Google calls
+http_client = get_http_client()
+
 print("Loading traffic API service...")
 traffic_service = TrafficAPIService()
 print("✓ Traffic API service ready!")
@@ -288,9 +308,26 @@ Message:
         }), 500
 
 
+def fetch_google_directions(origin, destination, alternatives=False):
+    """Google Directions request (origin / destination as "lat,lng")"""
+    # Get API key from environment or hardcode temporarily
+    api_key = os.environ.get('GOOGLE_MAPS_API_KEY', 'YOUR_API_KEY_HERE')
+    
+    url = f"https://maps.googleapis.com/maps/api/directions/json?origin={origin}&destination={destination}&mode=driving&key={api_key}"
+    if alternatives:
+        url += "&alternatives=true"
+    
+    return http_client.get(url)
+
+
 @app.route('/api/google-directions', methods=['POST'])
 def google_directions():
-    """Proxy endpoint for Google Directions API to avoid CORS"""
+    """
+    Proxy endpoint for Google Directions API to avoid CORS
+    
+    Served from the local road graph (same response layout) when both
+    ends are on it; Google only answers for points outside the graph.
+    """
     try:
         data = request.get_json()
         origin = data.get('origin')  # "lat,lng"
@@ -299,12 +336,11 @@ def google_directions():
         if not origin or not destination:
             return jsonify({'error': 'Missing origin or destination'}), 400
         
-        # Get API key from environment or hardcode temporarily
-        api_key = os.environ.get('GOOGLE_MAPS_API_KEY', 'YOUR_API_KEY_HERE')
+        local = local_routes({'origin': origin, 'destination': destination})
+        if local is not None and local['routes']:
+            return jsonify(directions_json(local['routes']))
         
-        url = f"https://maps.googleapis.com/maps/api/directions/json?origin={origin}&destination={destination}&mode=driving&key={api_key}"
-        
-        response = requests.get(url, timeout=10)
+        response = fetch_google_directions(origin, destination)
         
         if response.status_code == 200:
             return jsonify(response.json())
@@ -1385,6 +1421,26 @@ def get_severity_status(severity):
     else:
         return 'Normal'
 
+def aggregate_report_periods(simulation, period_hours):
+    """
+    Aggregate simulation results into fixed periods (24 = days, 168 = weeks)
+    
+    A new period starts at every later result whose hour is a multiple of
+    period_hours. Peak hours are within 90% of the period's max severity.
+    """
+    results = simulation.get('results', [])
+    period_hours_index = np.array([r.get('hour', i) for i, r in enumerate(results)], dtype=np.int64)
+    boundaries = (period_hours_index > 0) & (period_hours_index % period_hours == 0)
+    boundaries[:1] = False
+    
+    return SimulationAggregate(
+        hours=[r.get('hour', 0) % 24 for r in results],
+        groups=np.cumsum(boundaries),
+        severities=[r.get('severity', 0) for r in results],
+        delays=[r.get('delay_minutes', 0) for r in results],
+        peak_ratio=0.9
+    )
+
 def calculate_daily_summary(simulation):
     """Calculate day-by-day summary with accurate peak hour detection"""
     results = simulation.get('results', [])
@@ -1393,105 +1449,37 @@ def calculate_daily_summary(simulation):
     if not results or not start_time:
         return []
     
+    aggregate = aggregate_report_periods(simulation, 24)
     daily_summary = []
-    current_day = []
-    day_number = 1
     
-    for i, result in enumerate(results):
-        hour = result.get('hour', i)
-        
-        # Group by 24-hour periods
-        if hour > 0 and hour % 24 == 0:
-            if current_day:
-                # ✅ FIXED: Accurate peak hour detection
-                # Find all hours with severity within 10% of max severity
-                max_severity = max(r.get('severity', 0) for r in current_day)
-                threshold = max_severity * 0.9  # Within 90% of max
-                
-                peak_hours = [
-                    r.get('hour', 0) % 24 
-                    for r in current_day 
-                    if r.get('severity', 0) >= threshold
-                ]
-                
-                # Format peak hours
-                if len(peak_hours) == 1:
-                    peak_hour_str = f"{peak_hours[0]:02d}:00"
-                elif len(peak_hours) <= 3:
-                    peak_hour_str = ", ".join(f"{h:02d}:00" for h in sorted(peak_hours))
-                else:
-                    # Show range if many consecutive hours
-                    peak_hours.sort()
-                    peak_hour_str = f"{peak_hours[0]:02d}:00 - {peak_hours[-1]:02d}:00"
-                
-                # ✅ FIXED: Calculate average delay during peak hours only
-                peak_delays = [
-                    r.get('delay_minutes', 0) 
-                    for r in current_day 
-                    if (r.get('hour', 0) % 24) in peak_hours
-                ]
-                avg_peak_delay = sum(peak_delays) / len(peak_delays) if peak_delays else 0
-                
-                # Calculate overall averages
-                avg_severity = sum(r.get('severity', 0) for r in current_day) / len(current_day)
-                max_delay = max(r.get('delay_minutes', 0) for r in current_day)
-                
-                date_obj = start_time + timedelta(days=day_number-1)
-                
-                daily_summary.append({
-                    'day_number': day_number,
-                    'date': date_obj.strftime('%Y-%m-%d'),
-                    'avg_severity': round(avg_severity, 2),
-                    'peak_hour': peak_hour_str,  # ✅ Now shows range
-                    'peak_hours': peak_hours,  # ✅ List of peak hours
-                    'max_delay': max_delay,
-                    'avg_peak_delay': round(avg_peak_delay),  # ✅ NEW: Avg delay in peak hours
-                    'status': get_severity_status(avg_severity)
-                })
-                
-                current_day = []
-                day_number += 1
-        
-        current_day.append(result)
-    
-    # Handle last day
-    if current_day:
-        max_severity = max(r.get('severity', 0) for r in current_day)
-        threshold = max_severity * 0.9
-        
-        peak_hours = [
-            r.get('hour', 0) % 24 
-            for r in current_day 
-            if r.get('severity', 0) >= threshold
-        ]
-        
+    columns = zip(
+        aggregate.group_hours.tolist(), aggregate.group_severity_sum.tolist(),
+        aggregate.group_max_delay_row.tolist(), aggregate.group_peak_hour_count.tolist(),
+        aggregate.group_peak_hour_delay_sum.tolist(), aggregate.group_peak_hours()
+    )
+    for day_index, (count, severity_sum, max_delay_row, peak_count, peak_delay_sum, peak_hours) in enumerate(columns):
+        # Format peak hours
         if len(peak_hours) == 1:
             peak_hour_str = f"{peak_hours[0]:02d}:00"
         elif len(peak_hours) <= 3:
-            peak_hour_str = ", ".join(f"{h:02d}:00" for h in sorted(peak_hours))
+            peak_hour_str = ", ".join(f"{h:02d}:00" for h in peak_hours)
         else:
-            peak_hours.sort()
+            # Show range if many consecutive hours
             peak_hour_str = f"{peak_hours[0]:02d}:00 - {peak_hours[-1]:02d}:00"
         
-        peak_delays = [
-            r.get('delay_minutes', 0) 
-            for r in current_day 
-            if (r.get('hour', 0) % 24) in peak_hours
-        ]
-        avg_peak_delay = sum(peak_delays) / len(peak_delays) if peak_delays else 0
-        
-        avg_severity = sum(r.get('severity', 0) for r in current_day) / len(current_day)
-        max_delay = max(r.get('delay_minutes', 0) for r in current_day)
+        # Average delay during peak hours only
+        avg_peak_delay = peak_delay_sum / peak_count if peak_count else 0
+        avg_severity = severity_sum / count
         
-        date_obj = start_time + timedelta(days=day_number-1)
+        date_obj = start_time + timedelta(days=day_index)
         
         daily_summary.append({
-            'day_number': day_number,
+            'day_number': day_index + 1,
             'date': date_obj.strftime('%Y-%m-%d'),
             'avg_severity': round(avg_severity, 2),
             'peak_hour': peak_hour_str,
             'peak_hours': peak_hours,
-            'max_delay': max_delay,
+            'max_delay': results[max_delay_row].get('delay_minutes', 0),
             'avg_peak_delay': round(avg_peak_delay),
             'status': get_severity_status(avg_severity)
         })
@@ -1506,78 +1494,32 @@ def calculate_weekly_summary(simulation):
     if not results or not start_time:
         return []
     
+    aggregate = aggregate_report_periods(simulation, 168)
     weekly_summary = []
-    current_week = []
-    week_number = 1
-    
-    for i, result in enumerate(results):
-        hour = result.get('hour', i)
-        
-        # Group by 168-hour periods (7 days)
-        if hour > 0 and hour % 168 == 0:
-            if current_week:
-                # ✅ FIXED: Calculate accurate weekly metrics
-                avg_severity = sum(r.get('severity', 0) for r in current_week) / len(current_week)
-                avg_delay = sum(r.get('delay_minutes', 0) for r in current_week) / len(current_week)
-                
-                # Find peak hours
-                max_severity = max(r.get('severity', 0) for r in current_week)
-                threshold = max_severity * 0.9
-                
-                peak_hours = [
-                    r for r in current_week 
-                    if r.get('severity', 0) >= threshold
-                ]
-                
-                # Calculate average delay during peak hours
-                avg_peak_delay = sum(r.get('delay_minutes', 0) for r in peak_hours) / len(peak_hours) if peak_hours else 0
-                
-                week_start = start_time + timedelta(days=(week_number-1)*7)
-                week_end = week_start + timedelta(days=6)
-                
-                # Determine trend
-                first_half_avg = sum(r.get('severity', 0) for r in current_week[:len(current_week)//2]) / (len(current_week)//2)
-                second_half_avg = sum(r.get('severity', 0) for r in current_week[len(current_week)//2:]) / (len(current_week) - len(current_week)//2)
-                
-                if second_half_avg > first_half_avg + 0.2:
-                    trend = '↑ Rising'
-                elif second_half_avg < first_half_avg - 0.2:
-                    trend = '↓ Falling'
-                else:
-                    trend = '→ Stable'
-                
-                weekly_summary.append({
-                    'week_number': week_number,
-                    'date_range': f"{week_start.strftime('%m/%d')} - {week_end.strftime('%m/%d')}",
-                    'start_date': week_start.strftime('%Y-%m-%d'),
-                    'end_date': week_end.strftime('%Y-%m-%d'),
-                    'avg_severity': round(avg_severity, 2),
-                    'total_hours': len(current_week),
-                    'avg_delay': round(avg_delay, 1),
-                    'avg_peak_delay': round(avg_peak_delay, 1),  # ✅ NEW
-                    'trend': trend
-                })
-                
-                current_week = []
-                week_number += 1
-        
-        current_week.append(result)
     
-    # Handle last week (same fix as above)
-    if current_week:
-        avg_severity = sum(r.get('severity', 0) for r in current_week) / len(current_week)
-        avg_delay = sum(r.get('delay_minutes', 0) for r in current_week) / len(current_week)
+    columns = zip(
+        aggregate.group_hours.tolist(), aggregate.group_severity_sum.tolist(),
+        aggregate.group_delay_sum.tolist(), aggregate.group_peak_count.tolist(),
+        aggregate.group_peak_delay_sum.tolist(), aggregate.group_first_half_sum.tolist(),
+        aggregate.group_second_half_sum.tolist()
+    )
+    for week_index, (count, severity_sum, delay_sum, peak_count, peak_delay_sum,
+                     first_half_sum, second_half_sum) in enumerate(columns):
+        avg_severity = severity_sum / count
+        avg_delay = delay_sum / count
         
-        max_severity = max(r.get('severity', 0) for r in current_week)
-        threshold = max_severity * 0.9
-        peak_hours = [r for r in current_week if r.get('severity', 0) >= threshold]
-        avg_peak_delay = sum(r.get('delay_minutes', 0) for r in peak_hours) / len(peak_hours) if peak_hours else 0
+        # Calculate average delay during peak hours
+        avg_peak_delay = peak_delay_sum / peak_count if peak_count else 0
         
-        week_start = start_time + timedelta(days=(week_number-1)*7)
-        week_end = start_time + timedelta(hours=len(results))
+        week_start = start_time + timedelta(days=week_index * 7)
+        if week_index < aggregate.n_groups - 1:
+            week_end = week_start + timedelta(days=6)
+        else:
+            week_end = start_time + timedelta(hours=len(results))
         
-        first_half_avg = sum(r.get('severity', 0) for r in current_week[:len(current_week)//2]) / max(len(current_week)//2, 1)
-        second_half_avg = sum(r.get('severity', 0) for r in current_week[len(current_week)//2:]) / max(len(current_week) - len(current_week)//2, 1)
+        # Determine trend
+        first_half_avg = first_half_sum / max(count // 2, 1)
+        second_half_avg = second_half_sum / max(count - count // 2, 1)
         
         if second_half_avg > first_half_avg + 0.2:
             trend = '↑ Rising'
@@ -1587,19 +1529,79 @@ def calculate_weekly_summary(simulation):
             trend = '→ Stable'
         
         weekly_summary.append({
-            'week_number': week_number,
+            'week_number': week_index + 1,
             'date_range': f"{week_start.strftime('%m/%d')} - {week_end.strftime('%m/%d')}",
             'start_date': week_start.strftime('%Y-%m-%d'),
             'end_date': week_end.strftime('%Y-%m-%d'),
             'avg_severity': round(avg_severity, 2),
-            'total_hours': len(current_week),
+            'total_hours': count,
             'avg_delay': round(avg_delay, 1),
-            'avg_peak_delay': round(avg_peak_delay, 1),  # ✅ NEW
+            'avg_peak_delay': round(avg_peak_delay, 1),
             'trend': trend
         })
     
     return weekly_summary
 
+def get_windows_memory():
+    """Working set of this process via GetProcessMemoryInfo ({} if unavailable)"""
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return {}
+        return {
+            'rss_mb': counters.WorkingSetSize / 1024 / 1024,
+            'max_rss_mb': counters.PeakWorkingSetSize / 1024 / 1024,
+            'private_mb': counters.PagefileUsage / 1024 / 1024
+        }
+    except (ImportError, AttributeError, OSError):
+        return {}
+
+
+def get_worker_memory():
+    """
+    Memory of this server worker in MB
+    
+    rss counts shared model pages in every worker, pss splits them between
+    the workers sharing them - compare pss across worker counts.
+    """
+    fields = {'Rss': 'rss_mb', 'Pss': 'pss_mb', 'Shared_Clean': 'shared_mb', 'Shared_Dirty': 'shared_mb',
+              'Private_Clean': 'private_mb', 'Private_Dirty': 'private_mb'}
+    memory = {'pid': os.getpid()}
+    try:
+        # Linux: totals over all mappings
+        with open('/proc/self/smaps_rollup', 'r') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in fields:
+                    key = fields[name]
+                    memory[key] = memory.get(key, 0) + int(value.split()[0]) / 1024
+    except OSError:
+        try:
+            import resource
+        except ImportError:
+            # Windows: no resource module
+            memory.update(get_windows_memory())
+        else:
+            import sys
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # ru_maxrss is bytes on macOS, KB elsewhere
+            memory['max_rss_mb'] = max_rss / 1024 / (1024 if sys.platform == 'darwin' else 1)
+    
+    return {key: round(value, 1) if isinstance(value, float) else value for key, value in memory.items()}
+
+
 # health check endpoint
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -1613,6 +1615,16 @@ def health_check():
             'success': True,
             'ml_model': 'active',
             'database': 'active',
+            'prediction_cache': predictor.cache_stats() if predictor else None,
+            'simulation_cache': simulation_cache.stats(),
+            'jobs': job_queue.stats(),
+            'road_network': road_network.stats(),
+            'http_client': http_client.stats(),
+            'traffic_cache': traffic_service.cache.stats(),
+            'realtime_poller': realtime_poller.stats(),
+            'traffic_breaker': traffic_service.breaker.stats(),
+            'model_loading': predictor.load_stats() if predictor else None,
+            'worker_memory': get_worker_memory(),
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
@@ -1623,98 +1635,191 @@ def health_check():
             'error': str(e)
         }), 500
 
+# ============================================================
+# Realtime Poller
+# ============================================================
+# Points the realtime poller always covers (area / corridor reference points)
+REALTIME_CORRIDOR_POINTS = [
+    (14.1894, 121.1653),  # Bucal - Calamba_Pagsanjan
+    (14.2115, 121.1653),  # Parian - Maharlika_Parian
+    (14.2331, 121.1653),  # Turbina - Maharlika_Turbina
+    (14.2118, 121.1645),
+    (14.2115, 121.1635),
+    (14.2186, 121.1580),
+    (14.2000, 121.1755),
+    (14.2207, 121.1567),
+    (14.1985, 121.1780),
+    (14.2096, 121.1640),
+    (14.1947, 121.1800),
+    (14.2280, 121.1605),
+    (14.2148, 121.1610)
+]
+# Opt-in: polling the whole city costs TomTom calls whether or not anyone
+# is using the app, so it also needs a real TOMTOM_API_KEY in the environment
+REALTIME_POLLER_ENABLED = (
+    os.getenv('REALTIME_POLLER', 'false').lower() == 'true' and bool(os.getenv('TOMTOM_API_KEY'))
+)
+# Longest a request handler waits on TomTom before using historical data
+REALTIME_LATENCY_BUDGET_S = float(os.getenv('REALTIME_LATENCY_BUDGET_S', '2.5'))
+
+realtime_poller = RealtimePoller(traffic_service, REALTIME_CORRIDOR_POINTS)
+
+
+@app.before_request
+def start_realtime_poller():
+    """
+    Start polling with the first request (not in the reloader parent or job workers)
+
+    Each gunicorn/Passenger worker starts one, but only the worker holding
+    the REALTIME_POLLER_LOCK file lock calls TomTom; the rest load the
+    snapshot it writes to REALTIME_SNAPSHOT_FILE.
+    """
+    if REALTIME_POLLER_ENABLED:
+        realtime_poller.start()
+
+
 # ============================================================
 # NEW ROUTE: Get Real-Time Traffic Status for Area
 # ============================================================
+LIVE_FLOW_GRID = int(os.getenv('LIVE_FLOW_GRID', '4'))
+LIVE_FLOW_MAX_GRID = int(os.getenv('LIVE_FLOW_MAX_GRID', '10'))
+LIVE_FLOW_WORKERS = int(os.getenv('LIVE_FLOW_WORKERS', '8'))
+LIVE_FLOW_DEADLINE_S = float(os.getenv('LIVE_FLOW_DEADLINE_S', '6'))
+
+# Shared by all live-flow requests; TomTom QPS is enforced by http_client
+live_flow_executor = ThreadPoolExecutor(max_workers=LIVE_FLOW_WORKERS, thread_name_prefix='live-flow')
+
+
+def fetch_flow_cell(lat, lng, deadline):
+    """TomTom flow segment nearest one grid point (tile cached), or None"""
+    return traffic_service.get_flow_segment(lat, lng, style='relative', timeout=5, deadline=deadline) or None
+
+
+def live_flow_response(flows, grid, cells, failed=0, pending=0, snapshot_age_s=None):
+    """Map segments for [(lat, lng, flowSegmentData)] of the live-flow grid"""
+    all_segments = []
+    seen_roads = set()  # Avoid duplicate road segments
+    
+    for lat, lng, seg in flows:
+        # Create unique road ID to avoid duplicates
+        road_id = f"{seg.get('frc', '')}_{seg.get('currentSpeed', 0)}_{lat:.3f}_{lng:.3f}"
+        
+        if road_id not in seen_roads:
+            seen_roads.add(road_id)
+            
+            free_flow = seg.get('freeFlowSpeed', 50)
+            current = seg.get('currentSpeed', 50)
+            
+            ratio = current / free_flow if free_flow > 0 else 1
+            
+            if ratio >= 0.8:
+                severity = 'low'
+            elif ratio >= 0.5:
+                severity = 'moderate'
+            elif ratio >= 0.3:
+                severity = 'high'
+            else:
+                severity = 'severe'
+            
+            coords = seg.get('coordinates', {}).get('coordinate', [])
+            
+            if coords:
+                all_segments.append({
+                    'coordinates': coords,
+                    'currentSpeed': current,
+                    'freeFlowSpeed': free_flow,
+                    'severity': severity,
+                    'roadName': seg.get('roadName', 'Unknown Road')
+                })
+    
+    print(f"✓ Fetched {len(all_segments)} traffic segments for Calamba ({cells - pending}/{cells} cells)")
+    
+    return {
+        'success': True,
+        'timestamp': datetime.now().isoformat(),
+        'segments': all_segments,
+        'count': len(all_segments),
+        'grid': grid,
+        'cells': cells,
+        'cells_failed': failed,
+        'cells_pending': pending,
+        'partial': bool(pending) or failed > 0,
+        'snapshot_age_s': snapshot_age_s
+    }
+
+
 @app.route('/api/traffic/live-flow', methods=['GET'])
 def get_live_traffic_flow():
-    """Get live traffic flow for multiple points in Calamba using TomTom API"""
+    """
+    Get live traffic flow for multiple points in Calamba using TomTom API
+
+    Grid points are fetched concurrently (rate limited per TomTom's QPS);
+    whatever has arrived when the deadline passes is returned, with
+    partial=True if some cells were still pending.
+
+    When the realtime poller's snapshot has at least grid x grid points
+    inside the bounds, those are served instead (snapshot_age_s is set).
+
+    Query params:
+        - bounds: min_lat,min_lng,max_lat,max_lng
+        - grid: Points per side (default LIVE_FLOW_GRID)
+        - source: 'live' to skip the snapshot
+    """
     try:
         bounds = request.args.get('bounds')
         if not bounds:
             return jsonify({'error': 'Bounds required'}), 400
         
         min_lat, min_lng, max_lat, max_lng = map(float, bounds.split(','))
+        grid = max(1, min(request.args.get('grid', LIVE_FLOW_GRID, type=int), LIVE_FLOW_MAX_GRID))
         
         tomtom_key = os.getenv('TOMTOM_API_KEY', '')
         if not tomtom_key:
             return jsonify({'success': True, 'segments': [], 'message': 'No API key'}), 200
         
-        # Create a grid of points across Calamba (4x4 grid = 16 points)
-        lat_step = (max_lat - min_lat) / 4
-        lng_step = (max_lng - min_lng) / 4
-        
-        all_segments = []
-        seen_roads = set()  # Avoid duplicate road segments
-        
-        for i in range(4):
-            for j in range(4):
+        # Create a grid of points across Calamba (4x4 grid = 16 points by default)
+        lat_step = (max_lat - min_lat) / grid
+        lng_step = (max_lng - min_lng) / grid
+        
+        # Serve from the city snapshot when it is at least as dense as the requested grid
+        snapshot = traffic_service.snapshot
+        if snapshot is not None and snapshot.age_s() <= traffic_service.snapshot_max_age_s and request.args.get('source') != 'live':
+            snapshot_flows = snapshot.within(min_lat, min_lng, max_lat, max_lng)
+            if len(snapshot_flows) >= grid * grid:
+                return jsonify(live_flow_response(
+                    [(lat, lng, dict(flow)) for (lat, lng), flow in snapshot_flows],
+                    grid=grid, cells=len(snapshot_flows), snapshot_age_s=round(snapshot.age_s(), 1)
+                ))
+        
+        deadline = time.monotonic() + LIVE_FLOW_DEADLINE_S
+        cells = []
+        for i in range(grid):
+            for j in range(grid):
                 lat = min_lat + (i + 0.5) * lat_step
                 lng = min_lng + (j + 0.5) * lng_step
-                
-                try:
-                    url = f"https://api.tomtom.com/traffic/services/4/flowSegmentData/relative/10/json"
-                    params = {
-                        'point': f"{lat},{lng}",
-                        'key': tomtom_key,
-                        'unit': 'KMPH'
-                    }
-                    
-                    response = requests.get(url, params=params, timeout=5)
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        
-                        if 'flowSegmentData' in data:
-                            seg = data['flowSegmentData']
-                            
-                            # Create unique road ID to avoid duplicates
-                            road_id = f"{seg.get('frc', '')}_{seg.get('currentSpeed', 0)}_{lat:.3f}_{lng:.3f}"
-                            
-                            if road_id not in seen_roads:
-                                seen_roads.add(road_id)
-                                
-                                free_flow = seg.get('freeFlowSpeed', 50)
-                                current = seg.get('currentSpeed', 50)
-                                
-                                ratio = current / free_flow if free_flow > 0 else 1
-                                
-                                if ratio >= 0.8:
-                                    severity = 'low'
-                                elif ratio >= 0.5:
-                                    severity = 'moderate'
-                                elif ratio >= 0.3:
-                                    severity = 'high'
-                                else:
-                                    severity = 'severe'
-                                
-                                coords = seg.get('coordinates', {}).get('coordinate', [])
-                                
-                                if coords:
-                                    all_segments.append({
-                                        'coordinates': coords,
-                                        'currentSpeed': current,
-                                        'freeFlowSpeed': free_flow,
-                                        'severity': severity,
-                                        'roadName': seg.get('roadName', 'Unknown Road')
-                                    })
-                    
-                    # Small delay to avoid rate limiting
-                    import time
-                    time.sleep(0.1)
-                    
-                except Exception as e:
-                    print(f"Error fetching point ({lat}, {lng}): {str(e)}")
-                    continue
+                cells.append((lat, lng, live_flow_executor.submit(fetch_flow_cell, lat, lng, deadline)))
         
-        print(f"✓ Fetched {len(all_segments)} traffic segments for Calamba")
+        done, pending = wait([future for _, _, future in cells], timeout=LIVE_FLOW_DEADLINE_S)
+        for future in pending:
+            future.cancel()
         
-        return jsonify({
-            'success': True,
-            'timestamp': datetime.now().isoformat(),
-            'segments': all_segments,
-            'count': len(all_segments)
-        })
+        flows = []
+        failed = 0
+        
+        # Assemble in grid order so the output doesn't depend on arrival order
+        for lat, lng, future in cells:
+            if future not in done:
+                continue
+            try:
+                seg = future.result()
+            except Exception as e:
+                print(f"Error fetching point ({lat}, {lng}): {str(e)}")
+                failed += 1
+                continue
+            if seg:
+                flows.append((lat, lng, seg))
+        
+        return jsonify(live_flow_response(flows, grid=grid, cells=len(cells), failed=failed, pending=len(pending)))
         
     except Exception as e:
         print(f"Error in live traffic: {str(e)}")
@@ -1773,7 +1878,8 @@ def get_traffic_status():
             try:
                 realtime_data = traffic_service.get_traffic_flow(
                     coords['lat'], 
-                    coords['lng']
+                    coords['lng'],
+                    budget_s=REALTIME_LATENCY_BUDGET_S
                 )
                 
                 if realtime_data.get('success'):
@@ -1801,7 +1907,8 @@ def get_traffic_status():
                             'Heavy'
                         ),
                         'timestamp': datetime.now().isoformat(),
-                        'data_source': 'realtime'
+                        'data_source': 'realtime',
+                        'snapshot_age_s': realtime_data.get('snapshot_age_s')
                     })
             except Exception as e:
                 print(f"Real-time API failed: {e}")
@@ -2797,8 +2904,21 @@ def get_realtime_traffic():
                 'error': 'Missing lat/lng'
             }), 400
         
+        # Optional latency budget in seconds
+        budget_s = data.get('budget_s')
+        if budget_s is not None:
+            try:
+                budget_s = float(budget_s)
+            except (ValueError, TypeError):
+                budget_s = float('nan')
+            if not np.isfinite(budget_s) or budget_s <= 0:
+                return jsonify({
+                    'success': False,
+                    'error': 'budget_s must be a positive number of seconds'
+                }), 400
+        
         # Fetch real-time traffic
-        traffic_data = traffic_service.get_traffic_flow(lat, lng)
+        traffic_data = traffic_service.get_traffic_flow(lat, lng, budget_s=budget_s)
         
         return jsonify(traffic_data)
         
@@ -2861,503 +2981,816 @@ def get_road_traffic():
         }), 500
 
 
+# ============================================================
+# Simulation Result Cache
+# ============================================================
+
+# Deterministic runs live for SIMULATION_CACHE_TTL_S, realtime runs only
+# as long as the realtime snapshot they used (REALTIME_SNAPSHOT_TTL_S)
+simulation_cache = SimulationCache()
+REALTIME_SNAPSHOT_TTL_S = float(os.getenv('REALTIME_SNAPSHOT_TTL_S', '300'))
+
+
+def fresh_simulation_id(payload):
+    """A cached simulation payload under a fresh simulation_id"""
+    return {**payload, 'simulation_id': f"sim_{datetime.now().strftime('%Y%m%d_%H%M%S')}"}
+
+
+def simulation_response(payload, status=200, cache_state=None):
+    """JSON response for a run_*_simulation result (X-Simulation-Cache: HIT / MISS)"""
+    response = jsonify(payload)
+    response.status_code = status
+    if cache_state:
+        response.headers['X-Simulation-Cache'] = cache_state
+    return response
+
+
+# ============================================================
+# Streaming Helpers (NDJSON / Server-Sent Events)
+# ============================================================
+
+def requested_stream_format():
+    """
+    'ndjson' or 'sse' when the client opted into streaming, else None
+    (?stream=ndjson|sse, or an Accept header of application/x-ndjson or text/event-stream)
+    """
+    stream = request.args.get('stream', '').lower()
+    if stream in ('ndjson', 'sse'):
+        return stream
+    accept = request.headers.get('Accept', '')
+    if 'application/x-ndjson' in accept:
+        return 'ndjson'
+    if 'text/event-stream' in accept:
+        return 'sse'
+    return None
+
+
+def stream_frame(stream_format, frame_type, payload):
+    """Encode one frame: a JSON line, or an SSE event named after the frame type"""
+    if stream_format == 'sse':
+        return f"event: {frame_type}\ndata: {json.dumps(payload, default=str)}\n\n"
+    return json.dumps({'type': frame_type, **payload}, default=str) + '\n'
+
+
+def stream_response(stream_format, frames):
+    """Chunked response for a frame generator; errors become a final error frame"""
+    def guarded():
+        try:
+            yield from frames
+        except Exception as e:
+            import traceback
+            print("\n❌ ERROR while streaming:")
+            print(traceback.format_exc())
+            yield stream_frame(stream_format, 'error', {'success': False, 'error': str(e)})
+    
+    mimetype = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+    return Response(stream_with_context(guarded()), mimetype=mimetype, headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Keep nginx from buffering the stream
+    })
+
+
 # ============================================================
 # UPDATED: Simulation with Real-Time Data Integration
 # ============================================================
 
-@app.route('/api/simulate-disruption-realtime', methods=['POST'])
-def simulate_disruption_realtime():
+SCENARIO_REQUIRED_FIELDS = ['area', 'road_corridor', 'disruption_type', 'start_date', 'start_time', 'end_date', 'end_time']
+
+# Define impact zones with distance-based severity multipliers
+IMPACT_ZONES = [
+    {'min_dist': 0, 'max_dist': 150, 'multiplier': 1.0, 'label': 'Critical Impact'},
+    {'min_dist': 150, 'max_dist': 300, 'multiplier': 0.75, 'label': 'High Impact'},
+    {'min_dist': 300, 'max_dist': 450, 'multiplier': 0.50, 'label': 'Moderate Impact'},
+    {'min_dist': 450, 'max_dist': 600, 'multiplier': 0.30, 'label': 'Low Impact'},
+]
+
+# Road type importance factors (higher capacity = more affected by disruption)
+ROAD_TYPE_FACTORS = {
+    'motorway': 1.2,
+    'trunk': 1.15,
+    'primary': 1.1,
+    'secondary': 1.0,
+    'tertiary': 0.9,
+    'residential': 0.7,
+    'service': 0.5,
+}
+
+# Road graph for affected segments (ROAD_NETWORK_FILE extract or segments table)
+road_network = RoadNetworkLoader(db)
+ROAD_NETWORK_MAX_SEGMENTS = int(os.getenv('ROAD_NETWORK_MAX_SEGMENTS', '200'))
+# The closest segment within this distance is the disrupted road itself
+ROAD_SNAP_DISTANCE_M = float(os.getenv('ROAD_SNAP_DISTANCE_M', '25'))
+
+# Network simulation area (0 = whole network), zone count and equilibrium stop
+NETWORK_SIM_RADIUS_M = float(os.getenv('NETWORK_SIM_RADIUS_M', '2500'))
+NETWORK_SIM_ZONES = int(os.getenv('NETWORK_SIM_ZONES', '24'))
+NETWORK_SIM_MAX_ITERATIONS = int(os.getenv('NETWORK_SIM_MAX_ITERATIONS', '100'))
+NETWORK_SIM_GAP = float(os.getenv('NETWORK_SIM_GAP', '2e-4'))
+network_impact_models = {}  # RoadNetwork -> NetworkImpactModel, built on first use
+
+# Largest number of scenarios accepted by /api/simulate-disruption-batch
+SIMULATION_BATCH_MAX = int(os.getenv('SIMULATION_BATCH_MAX', '50'))
+
+
+def parse_disruption_scenario(data):
     """
-    Smart simulation that uses real-time data ONLY for same-day disruptions (0-6 hours ahead)
-    Future disruptions use historical patterns only
+    Validate and normalize one realtime simulation payload
+
+    Returns:
+        tuple: (scenario dict, None) or (None, error message for a 400)
     """
+    if not isinstance(data, dict):
+        return None, 'Scenario must be a JSON object'
+
+    # ✅ VALIDATE REQUIRED FIELDS FIRST
+    missing_fields = [field for field in SCENARIO_REQUIRED_FIELDS if not data.get(field)]
+    if missing_fields:
+        return None, f'Missing required fields: {", ".join(missing_fields)}'
+
+    # ✅ PARSE DATETIME - This automatically handles string-to-datetime conversion
     try:
-        data = request.get_json()
-        
-        # ✅ VALIDATE REQUIRED FIELDS FIRST
-        required_fields = ['area', 'road_corridor', 'disruption_type', 'start_date', 'start_time', 'end_date', 'end_time']
-        missing_fields = [field for field in required_fields if not data.get(field)]
-        
-        if missing_fields:
-            return jsonify({
-                'success': False,
-                'error': f'Missing required fields: {", ".join(missing_fields)}'
-            }), 400
-        
-        # Extract basic parameters
-        area = str(data.get('area', 'Unknown'))
-        road_corridor = str(data.get('road_corridor', 'Unknown'))
-        disruption_type = str(data.get('disruption_type'))
-        
-        # ✅ PARSE DATETIME - This automatically handles string-to-datetime conversion
-        try:
-            start_datetime = datetime.strptime(
-                f"{data['start_date']} {data['start_time']}", 
-                "%Y-%m-%d %H:%M"
-            )
-            end_datetime = datetime.strptime(
-                f"{data['end_date']} {data['end_time']}", 
-                "%Y-%m-%d %H:%M"
-            )
-        except ValueError as e:
-            return jsonify({
-                'success': False,
-                'error': f'Invalid date/time format: {str(e)}'
-            }), 400
+        start_datetime = datetime.strptime(
+            f"{data['start_date']} {data['start_time']}",
+            "%Y-%m-%d %H:%M"
+        )
+        end_datetime = datetime.strptime(
+            f"{data['end_date']} {data['end_time']}",
+            "%Y-%m-%d %H:%M"
+        )
+    except ValueError as e:
+        return None, f'Invalid date/time format: {str(e)}'
 
-        # ✅ VALIDATE DATES
-        if end_datetime <= start_datetime:
-            return jsonify({
-                'success': False,
-                'error': 'End date/time must be after start date/time'
-            }), 400
-        
-        duration_hours = (end_datetime - start_datetime).total_seconds() / 3600
-        
-        if duration_hours > 720:  # 30 days
-            return jsonify({
-                'success': False,
-                'error': 'Disruption duration cannot exceed 30 days'
-            }), 400
-        
-        if duration_hours < 1:
-            return jsonify({
-                'success': False,
-                'error': 'Disruption duration must be at least 1 hour'
-            }), 400
-        
-        road_info = data.get('road_info', {})
-        coordinates = data.get('coordinates', {})
-        
-        # ✅ VALIDATE COORDINATES WITH TYPE CONVERSION
-        try:
-            lat = float(coordinates.get('lat', 0))
-            lng = float(coordinates.get('lng', 0))
-            
-            if lat == 0 or lng == 0:
-                raise ValueError("Invalid coordinates")
-                
-            coordinates = {'lat': lat, 'lng': lng}
-        except (ValueError, TypeError):
-            return jsonify({
-                'success': False,
-                'error': 'Invalid or missing location coordinates'
-            }), 400
-        
-        # ✅ CONVERT ROAD INFO NUMERIC VALUES
-        try:
-            road_info = {
-                'lanes': int(road_info.get('lanes', 2)),
-                'length_km': float(road_info.get('length_km', 1.0)),
-                'width_meters': float(road_info.get('width_meters', 7.0)),
-                'max_speed': int(road_info.get('max_speed', 40)),
-                'total_capacity': int(road_info.get('total_capacity', 1800)),
-                'free_flow_time_minutes': float(road_info.get('free_flow_time_minutes', 10)),
-                'disruption_factors': road_info.get('disruption_factors', {}),
-                'road_type': str(road_info.get('road_type', 'local'))
-            }
-        except (ValueError, TypeError) as e:
-            return jsonify({
-                'success': False,
-                'error': f'Invalid road info data: {str(e)}'
-            }), 400
-        
-        # ============================================================
-        # ✅ SMART DECISION: Should we use real-time data?
-        # ============================================================
-        
-        now = datetime.now()
-        today = now.date()
-        disruption_start_date = start_datetime.date()
-        
-        # Calculate hours until disruption starts
-        hours_until_disruption = (start_datetime - now).total_seconds() / 3600
-        
-        # ✅ USE REAL-TIME ONLY IF:
-        # 1. Disruption starts today
-        # 2. Within next 6 hours (or already started)
-        use_realtime = (
-            disruption_start_date == today and 
-            hours_until_disruption <= 6 and 
+    # ✅ VALIDATE DATES
+    if end_datetime <= start_datetime:
+        return None, 'End date/time must be after start date/time'
+
+    duration_hours = (end_datetime - start_datetime).total_seconds() / 3600
+
+    if duration_hours > 720:  # 30 days
+        return None, 'Disruption duration cannot exceed 30 days'
+
+    if duration_hours < 1:
+        return None, 'Disruption duration must be at least 1 hour'
+
+    road_info = data.get('road_info', {})
+    coordinates = data.get('coordinates', {})
+
+    # ✅ VALIDATE COORDINATES WITH TYPE CONVERSION
+    try:
+        lat = float(coordinates.get('lat', 0))
+        lng = float(coordinates.get('lng', 0))
+
+        if lat == 0 or lng == 0:
+            raise ValueError("Invalid coordinates")
+
+        coordinates = {'lat': lat, 'lng': lng}
+    except (ValueError, TypeError, AttributeError):
+        return None, 'Invalid or missing location coordinates'
+
+    # ✅ CONVERT ROAD INFO NUMERIC VALUES
+    try:
+        road_info = {
+            'lanes': int(road_info.get('lanes', 2)),
+            'length_km': float(road_info.get('length_km', 1.0)),
+            'width_meters': float(road_info.get('width_meters', 7.0)),
+            'max_speed': int(road_info.get('max_speed', 40)),
+            'total_capacity': int(road_info.get('total_capacity', 1800)),
+            'free_flow_time_minutes': float(road_info.get('free_flow_time_minutes', 10)),
+            'disruption_factors': road_info.get('disruption_factors', {}),
+            'road_type': str(road_info.get('road_type', 'local'))
+        }
+        total_volume = int(data.get('total_volume', 0))
+    except (ValueError, TypeError, AttributeError) as e:
+        return None, f'Invalid road info data: {str(e)}'
+
+    # Optional Monte Carlo bands: true, a sample count or {'samples', 'seed'}
+    try:
+        uncertainty = uncertainty_options(data.get('uncertainty'))
+    except (ValueError, TypeError, AttributeError) as e:
+        return None, f'Invalid uncertainty option: {str(e)}'
+
+    # Optional spill-over on the road network (equilibrium assignment)
+    network_impact = bool(data.get('network_impact', False))
+
+    return {
+        'area': str(data.get('area', 'Unknown')),
+        'road_corridor': str(data.get('road_corridor', 'Unknown')),
+        'disruption_type': str(data.get('disruption_type')),
+        'start_datetime': start_datetime,
+        'end_datetime': end_datetime,
+        'duration_hours': duration_hours,
+        'coordinates': coordinates,
+        'road_info': road_info,
+        'total_volume': total_volume,
+        'description': data.get('description', ''),
+        'uncertainty': uncertainty,
+        'network_impact': network_impact
+    }, None
+
+
+def plan_realtime(scenario, now=None):
+    """
+    ✅ SMART DECISION: Should we use real-time data?
+
+    Real-time applies only if the disruption starts today and within the
+    next 6 hours (or already started). Sets the realtime fields of the scenario.
+    """
+    now = now or datetime.now()
+    today = now.date()
+
+    # Calculate hours until disruption starts
+    hours_until_disruption = (scenario['start_datetime'] - now).total_seconds() / 3600
+
+    scenario.update({
+        'now': now,
+        'today': today,
+        'hours_until_disruption': hours_until_disruption,
+        'use_realtime': (
+            scenario['start_datetime'].date() == today and
+            hours_until_disruption <= 6 and
             hours_until_disruption >= -24  # Allow up to 24h past start (ongoing disruption)
+        ),
+        'realtime_data': None,
+        'realtime_speed_factor': None,
+        'current_congestion': 0,
+        # Results built on a realtime snapshot expire with it
+        'cache_expires_at': None
+    })
+    return scenario
+
+
+def scenario_cache_key(scenario):
+    """Result cache key: normalized scenario, model version and current date"""
+    return scenario_fingerprint(
+        'simulate-disruption-realtime', predictor.model_version, {
+            'area': scenario['area'],
+            'road_corridor': scenario['road_corridor'],
+            'disruption_type': scenario['disruption_type'],
+            'start': scenario['start_datetime'].isoformat(),
+            'end': scenario['end_datetime'].isoformat(),
+            'coordinates': scenario['coordinates'],
+            'road_info': scenario['road_info'],
+            'total_volume': scenario['total_volume'],
+            'description': scenario['description'],
+            'uncertainty': scenario['uncertainty'],
+            'network_impact': scenario['network_impact']
+        },
+        # Realtime eligibility and "days away" depend on the current date
+        scenario['use_realtime'], scenario['today'].isoformat()
+    )
+
+
+def fetch_realtime(scenario):
+    """Fetch current traffic for same-day scenarios (historical fallback on failure)"""
+    now = scenario['now']
+    start_datetime = scenario['start_datetime']
+    coordinates = scenario['coordinates']
+
+    if scenario['use_realtime']:
+
+        print("\n" + "="*60)
+        print("🌐 FETCHING REAL-TIME TRAFFIC DATA")
+        print("="*60)
+        print(f"📍 Location: {coordinates['lat']}, {coordinates['lng']}")
+        print(f"⏰ Current Time: {now.strftime('%Y-%m-%d %H:%M')}")
+        print(f"🚧 Disruption Start: {start_datetime.strftime('%Y-%m-%d %H:%M')}")
+        print(f"⏱️  Hours Until Start: {scenario['hours_until_disruption']:.1f}h")
+        print(f"✅ USING REAL-TIME (disruption happening soon)")
+
+        # Fetch real-time traffic
+        realtime_data = traffic_service.get_traffic_flow(
+            coordinates['lat'],
+            coordinates['lng'],
+            budget_s=REALTIME_LATENCY_BUDGET_S
         )
-        
-        realtime_data = None
-        realtime_speed_factor = None
-        current_congestion = 0
-        
-        if use_realtime:
-            print("\n" + "="*60)
-            print("🌐 FETCHING REAL-TIME TRAFFIC DATA")
-            print("="*60)
-            print(f"📍 Location: {coordinates['lat']}, {coordinates['lng']}")
-            print(f"⏰ Current Time: {now.strftime('%Y-%m-%d %H:%M')}")
-            print(f"🚧 Disruption Start: {start_datetime.strftime('%Y-%m-%d %H:%M')}")
-            print(f"⏱️  Hours Until Start: {hours_until_disruption:.1f}h")
-            print(f"✅ USING REAL-TIME (disruption happening soon)")
-            
-            # Fetch real-time traffic
-            realtime_data = traffic_service.get_traffic_flow(
-                coordinates['lat'],
-                coordinates['lng']
-            )
-            
-            if realtime_data.get('success'):
-                current_speed = float(realtime_data.get('current_speed', 40))
-                free_flow_speed = float(realtime_data.get('free_flow_speed', 40))
-                current_congestion = int(realtime_data.get('congestion_ratio', 0))
-                
-                if free_flow_speed > 0:
-                    realtime_speed_factor = current_speed / free_flow_speed
-                
-                print(f"✅ Real-time API Success")
-                print(f"🚗 Current Speed: {current_speed} km/h")
-                print(f"🏁 Free Flow Speed: {free_flow_speed} km/h")
-                print(f"📊 Speed Factor: {realtime_speed_factor:.2f}")
-                print(f"📊 Congestion Level: {current_congestion} (0=light, 1=moderate, 2=heavy)")
-            else:
-                print(f"❌ Real-time API Failed: {realtime_data.get('error')}")
-                use_realtime = False  # Fall back to historical
-            
-            print("="*60 + "\n")
-            
+        scenario['realtime_data'] = realtime_data
+        # Cache the result only as long as the data it used stays fresh
+        # (a poller snapshot or tile cache entry may already be minutes old)
+        scenario['cache_expires_at'] = time.time() + REALTIME_SNAPSHOT_TTL_S - realtime_data.get('data_age_s', 0)
+
+        if realtime_data.get('success'):
+            current_speed = float(realtime_data.get('current_speed', 40))
+            free_flow_speed = float(realtime_data.get('free_flow_speed', 40))
+            scenario['current_congestion'] = int(realtime_data.get('congestion_ratio', 0))
+
+            if free_flow_speed > 0:
+                scenario['realtime_speed_factor'] = current_speed / free_flow_speed
+
+            print(f"✅ Real-time API Success")
+            print(f"🚗 Current Speed: {current_speed} km/h")
+            print(f"🏁 Free Flow Speed: {free_flow_speed} km/h")
+            print(f"📊 Speed Factor: {scenario['realtime_speed_factor']:.2f}")
+            print(f"📊 Congestion Level: {scenario['current_congestion']} (0=light, 1=moderate, 2=heavy)")
         else:
-            print("\n" + "="*60)
-            print("📅 FUTURE DISRUPTION - USING HISTORICAL PATTERNS")
-            print("="*60)
-            print(f"⏰ Current Time: {now.strftime('%Y-%m-%d %H:%M')}")
-            print(f"🚧 Disruption Start: {start_datetime.strftime('%Y-%m-%d %H:%M')}")
-            
-            if disruption_start_date > today:
-                days_away = (disruption_start_date - today).days
-                print(f"📆 Disruption is {days_away} day(s) away")
-            else:
-                print(f"⏱️  Disruption is {hours_until_disruption:.1f} hours away")
-            
-            print(f"✅ Using ML model trained on historical data")
-            print(f"📊 Real-time data not applicable for future predictions")
-            print("="*60 + "\n")
-        
-        # ============================================================
-        # Generate Hourly Predictions
-        # ============================================================
-        
-        hourly_predictions = []
-        current_datetime = start_datetime
-        
-        while current_datetime <= end_datetime:
-            # ✅ ENSURE ALL VALUES ARE PROPER TYPES
-            hour_input = {
-                'date': current_datetime.strftime('%Y-%m-%d'),
-                'hour': int(current_datetime.hour),  # ✅ ENSURE INT
-                'area': str(area),
-                'road_corridor': str(road_corridor),
-                'has_disruption': 1,
-                'disruption_type': str(disruption_type),
-                'total_volume': int(data.get('total_volume', 0)),
-                'has_real_status': 0
+            print(f"❌ Real-time API Failed: {realtime_data.get('error')}")
+            scenario['use_realtime'] = False  # Fall back to historical
+
+        print("="*60 + "\n")
+
+    else:
+        disruption_start_date = start_datetime.date()
+        today = scenario['today']
+
+        print("\n" + "="*60)
+        print("📅 FUTURE DISRUPTION - USING HISTORICAL PATTERNS")
+        print("="*60)
+        print(f"⏰ Current Time: {now.strftime('%Y-%m-%d %H:%M')}")
+        print(f"🚧 Disruption Start: {start_datetime.strftime('%Y-%m-%d %H:%M')}")
+
+        if disruption_start_date > today:
+            days_away = (disruption_start_date - today).days
+            print(f"📆 Disruption is {days_away} day(s) away")
+        else:
+            print(f"⏱️  Disruption is {scenario['hours_until_disruption']:.1f} hours away")
+
+        print(f"✅ Using ML model trained on historical data")
+        print(f"📊 Real-time data not applicable for future predictions")
+        print("="*60 + "\n")
+
+    return scenario
+
+
+def scenario_hour_datetimes(scenario):
+    """Every hour from start to end (inclusive)"""
+    hour_datetimes = []
+    current_datetime = scenario['start_datetime']
+    while current_datetime <= scenario['end_datetime']:
+        hour_datetimes.append(current_datetime)
+        current_datetime += timedelta(hours=1)
+    return hour_datetimes
+
+
+def scenario_hour_inputs(scenario, hour_datetimes):
+    """Model inputs for a run of hours"""
+    # ✅ ENSURE ALL VALUES ARE PROPER TYPES
+    return [
+        {
+            'date': current_datetime.strftime('%Y-%m-%d'),
+            'hour': int(current_datetime.hour),  # ✅ ENSURE INT
+            'area': scenario['area'],
+            'road_corridor': scenario['road_corridor'],
+            'has_disruption': 1,
+            'disruption_type': scenario['disruption_type'],
+            'total_volume': scenario['total_volume'],
+            'has_real_status': 0
+        }
+        for current_datetime in hour_datetimes
+    ]
+
+
+def scenario_delay_inputs(scenario, hour_datetimes):
+    """Road and real-time inputs of the delay model for a run of hours"""
+    road_info = scenario['road_info']
+    realtime_speed_factor = scenario['realtime_speed_factor']
+
+    # ✅ ONLY apply real-time factor to predictions within next 6 hours
+    realtime_factors = np.full(len(hour_datetimes), np.nan)
+    if scenario['use_realtime'] and realtime_speed_factor is not None:
+        now = scenario['now']
+        hours_until = np.array([(dt - now).total_seconds() / 3600 for dt in hour_datetimes])
+        realtime_factors[(hours_until >= -1) & (hours_until <= 6)] = realtime_speed_factor  # Current hour to 6 hours ahead
+
+    return {
+        'base_travel_time_minutes': float(road_info['free_flow_time_minutes']),
+        'road_length_km': float(road_info['length_km']),
+        'impact_factor': float(road_info['disruption_factors'].get(scenario['disruption_type'], 0.6)),
+        'realtime_speed_factor': realtime_factors
+    }
+
+
+def scenario_hourly_predictions(scenario, hour_datetimes, predictions):
+    """Hourly prediction dicts (delays in one array pass) for model predictions"""
+    # Calculate all delays at once with optional real-time adjustment
+    delays = predictor.estimate_delay_many(
+        severities=np.array([float(p['severity']) for p in predictions]),
+        **scenario_delay_inputs(scenario, hour_datetimes)
+    )
+
+    return [
+        {
+            'datetime': current_datetime.strftime('%Y-%m-%d %H:%M'),
+            'date': current_datetime.strftime('%Y-%m-%d'),
+            'hour': int(current_datetime.hour),  # ✅ ENSURE INT
+            'day_of_week': current_datetime.strftime('%A'),
+            'severity': round(float(prediction['severity']), 2),
+            'severity_label': str(prediction['severity_label']),
+            'confidence': round(float(prediction['confidence']), 2),
+            'delay_info': delay_info,
+            'realtime_adjusted': bool(delay_info.get('realtime_adjusted', False)),
+            'probabilities': {
+                k: round(float(v), 2) for k, v in prediction['probabilities'].items()
             }
-            
-            # Make prediction using ML model
-            prediction = predictor.predict(hour_input)
-            
-            # ✅ ONLY apply real-time factor to predictions within next 6 hours
-            hours_until_this_prediction = (current_datetime - now).total_seconds() / 3600
-            apply_realtime_to_this_hour = (
-                use_realtime and 
-                -1 <= hours_until_this_prediction <= 6  # Current hour to 6 hours ahead
-            )
-            
-            # Calculate delay with optional real-time adjustment
-            delay_info = predictor.estimate_delay(
-                severity=float(prediction['severity']),
-                base_travel_time_minutes=float(road_info['free_flow_time_minutes']),
-                road_length_km=float(road_info['length_km']),
-                impact_factor=float(road_info['disruption_factors'].get(disruption_type, 0.6)),
-                realtime_speed_factor=realtime_speed_factor if apply_realtime_to_this_hour else None
-            )
-            
-            hourly_predictions.append({
-                'datetime': current_datetime.strftime('%Y-%m-%d %H:%M'),
-                'date': current_datetime.strftime('%Y-%m-%d'),
-                'hour': int(current_datetime.hour),  # ✅ ENSURE INT
-                'day_of_week': current_datetime.strftime('%A'),
-                'severity': round(float(prediction['severity']), 2),
-                'severity_label': str(prediction['severity_label']),
-                'confidence': round(float(prediction['confidence']), 2),
-                'delay_info': delay_info,
-                'realtime_adjusted': bool(delay_info.get('realtime_adjusted', False)),
-                'probabilities': {
-                    k: round(float(v), 2) for k, v in prediction['probabilities'].items()
-                }
-            })
-            
-            current_datetime += timedelta(hours=1)
-        
-        # ============================================================
-        # Smart Aggregation for Map Display
-        # ============================================================
+        }
+        for current_datetime, prediction, delay_info in zip(
+            hour_datetimes, predictions, predictor.delay_records(delays)
+        )
+    ]
 
-        def aggregate_predictions_smart(hourly_predictions, start_datetime, end_datetime):
-            """
-            Aggregate predictions on a day-by-day basis
-            Always returns daily granularity regardless of duration
-            """
-            # Always show day-by-day breakdown
-            daily_aggregates = []
-            current_date = start_datetime.date()
-            end_date = end_datetime.date()
-            
-            while current_date <= end_date:
-                # Get all predictions for this day
-                day_predictions = [
-                    p for p in hourly_predictions 
-                    if datetime.strptime(p['datetime'], '%Y-%m-%d %H:%M').date() == current_date
-                ]
-                
-                if day_predictions:
-                    # Calculate daily averages
-                    avg_severity = sum(p['severity'] for p in day_predictions) / len(day_predictions)
-                    avg_delay = sum(p['delay_info']['additional_delay_min'] for p in day_predictions) / len(day_predictions)
-                    
-                    # Determine dominant severity
-                    severity_counts = {
-                        'Light': sum(1 for p in day_predictions if p['severity'] < 0.5),
-                        'Moderate': sum(1 for p in day_predictions if 0.5 <= p['severity'] < 1.5),
-                        'Heavy': sum(1 for p in day_predictions if p['severity'] >= 1.5)
-                    }
-                    dominant_severity = max(severity_counts, key=severity_counts.get)
-                    
-                    # ✅ FIX: Find ALL peak hours and calculate peak delay
-                    max_severity = max(p['severity'] for p in day_predictions)
-                    # Consider hours within 0.1 of max severity as "peak hours"
-                    peak_threshold = max_severity - 0.1
-                    peak_hour_predictions = [p for p in day_predictions if p['severity'] >= peak_threshold]
-                    
-                    # Get the peak hours (sorted)
-                    peak_hours_list = sorted([p['hour'] for p in peak_hour_predictions])
-                    
-                    # Calculate average delay during peak hours
-                    peak_delay = sum(p['delay_info']['additional_delay_min'] for p in peak_hour_predictions) / len(peak_hour_predictions) if peak_hour_predictions else 0
-                    
-                    # Format peak hour display
-                    if len(peak_hours_list) == 1:
-                        peak_hour_display = peak_hours_list[0]
-                    elif len(peak_hours_list) <= 3:
-                        # Show as range or list for 2-3 hours
-                        peak_hour_display = peak_hours_list[0] if len(peak_hours_list) == 1 else f"{peak_hours_list[0]}-{peak_hours_list[-1]}"
-                    else:
-                        # Multiple peak hours - show first and last
-                        peak_hour_display = f"{peak_hours_list[0]}-{peak_hours_list[-1]}"
-                    
-                    daily_aggregates.append({
-                        'date': current_date.strftime('%Y-%m-%d'),
-                        'day_name': current_date.strftime('%A'),
-                        'avg_severity': round(avg_severity, 2),
-                        'avg_severity_label': dominant_severity,
-                        'avg_delay_min': round(avg_delay),
-                        'hour_count': len(day_predictions),
-                        'severity_breakdown': severity_counts,
-                        'peak_hour': peak_hour_display,  # ✅ Now shows formatted hour(s)
-                        'peak_hours': peak_hours_list,  # ✅ Array of all peak hours
-                        'peak_severity': round(max_severity, 2),
-                        'peak_delay': round(peak_delay),  # ✅ Average delay during peak hours
-                        'avg_peak_delay': round(peak_delay)  # ✅ Alternative field name for compatibility
-                    })
-                
-                current_date += timedelta(days=1)
-            
-            return {
-                'granularity': 'daily',
-                'display_label': 'Day-by-Day View',
-                'map_data': daily_aggregates
+
+def predict_scenario_hours(scenario, hour_datetimes):
+    """Hourly prediction dicts for a run of hours (one model pass)"""
+    predictions = predictor.predict_batch(scenario_hour_inputs(scenario, hour_datetimes))
+    return scenario_hourly_predictions(scenario, hour_datetimes, predictions)
+
+
+def build_affected_segments(scenario, avg_severity, avg_delay, hourly_predictions):
+    """Main road segment plus nearby roads with individual severities"""
+    affected_segments = []
+
+    # Create segment data for main road
+    main_segment = {
+        'segment_id': 'main',
+        'road_name': scenario['road_corridor'],
+        'road_type': scenario['road_info'].get('road_type', 'secondary'),
+        'distance_m': 0,
+        'impact_zone': 'Critical Impact',
+        'avg_severity': round(avg_severity, 2),
+        'severity_label': 'Light' if avg_severity < 0.5 else ('Moderate' if avg_severity < 1.5 else 'Heavy'),
+        'avg_delay_min': round(avg_delay),
+        'hourly_severities': [
+            {
+                'hour': p['hour'],
+                'datetime': p['datetime'],
+                'severity': p['severity'],
+                'severity_label': p['severity_label'],
+                'delay_min': p['delay_info']['additional_delay_min']
             }
+            for p in hourly_predictions
+        ]
+    }
+    affected_segments.append(main_segment)
+
+    network = road_network.get()
+    if network is not None:
+        affected_segments.extend(network_affected_segments(network, scenario, main_segment, avg_severity, avg_delay))
+        return affected_segments
+
+    # Generate nearby road segment predictions
+    # These will be used by frontend to color nearby roads accurately
+    sample_nearby_roads = [
+        {'id': 'nearby_1', 'name': 'Adjacent Road 1', 'type': 'secondary', 'distance': 100},
+        {'id': 'nearby_2', 'name': 'Adjacent Road 2', 'type': 'tertiary', 'distance': 200},
+        {'id': 'nearby_3', 'name': 'Adjacent Road 3', 'type': 'secondary', 'distance': 350},
+        {'id': 'nearby_4', 'name': 'Adjacent Road 4', 'type': 'residential', 'distance': 500},
+    ]
+
+    for nearby in sample_nearby_roads:
+        # Find applicable impact zone
+        zone = next(
+            (z for z in IMPACT_ZONES if z['min_dist'] <= nearby['distance'] < z['max_dist']),
+            IMPACT_ZONES[-1]
+        )
+
+        # Calculate segment-specific severity
+        road_factor = ROAD_TYPE_FACTORS.get(nearby['type'], 0.8)
+        segment_severity = avg_severity * zone['multiplier'] * road_factor
+        segment_delay = avg_delay * zone['multiplier'] * road_factor
+
+        segment = {
+            'segment_id': nearby['id'],
+            'road_name': nearby['name'],
+            'road_type': nearby['type'],
+            'distance_m': nearby['distance'],
+            'impact_zone': zone['label'],
+            'impact_multiplier': zone['multiplier'],
+            'road_factor': road_factor,
+            'avg_severity': round(segment_severity, 2),
+            'severity_label': 'Light' if segment_severity < 0.5 else ('Moderate' if segment_severity < 1.5 else 'Heavy'),
+            'avg_delay_min': round(segment_delay),
+        }
+        affected_segments.append(segment)
+
+    return affected_segments
+
+
+def network_affected_segments(network, scenario, main_segment, avg_severity, avg_delay):
+    """
+    Road network segments inside the impact zones, nearest first
+
+    Severity and delay are scaled by the zone multiplier and the road type
+    factor for all segments at once. The closest segment within
+    ROAD_SNAP_DISTANCE_M is the disrupted road: its geometry goes on the
+    main segment instead of being listed twice.
+    """
+    coordinates = scenario['coordinates']
+    segments, distances = network.segments_within(coordinates['lat'], coordinates['lng'], IMPACT_ZONES[-1]['max_dist'])
+
+    if len(segments) and distances[0] <= ROAD_SNAP_DISTANCE_M:
+        main_segment['network_segment_id'] = network.segment_id[segments[0]]
+        main_segment['coordinates'] = network.coordinates(segments[0])
+        segments, distances = segments[1:], distances[1:]
+    segments, distances = segments[:ROAD_NETWORK_MAX_SEGMENTS], distances[:ROAD_NETWORK_MAX_SEGMENTS]
+
+    # Zone: min_dist <= distance < max_dist (the last zone includes its edge)
+    zone_index = np.minimum(
+        np.searchsorted([z['max_dist'] for z in IMPACT_ZONES], distances, side='right'),
+        len(IMPACT_ZONES) - 1
+    )
+    multipliers = np.array([z['multiplier'] for z in IMPACT_ZONES])[zone_index]
+    road_factors = network.road_type_factors(segments, ROAD_TYPE_FACTORS)
+    severities = avg_severity * multipliers * road_factors
+    delays = avg_delay * multipliers * road_factors
+
+    return [
+        {
+            'segment_id': segment_id,
+            'road_name': name,
+            'road_type': road_type,
+            'distance_m': int(round(distance)),
+            'impact_zone': IMPACT_ZONES[zone]['label'],
+            'impact_multiplier': multiplier,
+            'road_factor': road_factor,
+            'avg_severity': round(severity, 2),
+            'severity_label': 'Light' if severity < 0.5 else ('Moderate' if severity < 1.5 else 'Heavy'),
+            'avg_delay_min': round(delay),
+            'coordinates': network.coordinates(segment)
+        }
+        for segment, segment_id, name, road_type, distance, zone, multiplier, road_factor, severity, delay in zip(
+            segments.tolist(), network.segment_id[segments], network.name[segments], network.road_type_of(segments),
+            distances.tolist(), zone_index.tolist(), multipliers.tolist(), road_factors.tolist(),
+            severities.tolist(), delays.tolist()
+        )
+    ]
+
+
+def realtime_integration(scenario, hours_adjusted):
+    use_realtime = scenario['use_realtime']
+    realtime_data = scenario['realtime_data']
+    realtime_speed_factor = scenario['realtime_speed_factor']
+    return {
+        'enabled': use_realtime and realtime_data and realtime_data.get('success', False),
+        'applicable': use_realtime,
+        'reason': (
+            'Same-day disruption - adjusted for current traffic' if use_realtime
+            else f"Future disruption ({(scenario['start_datetime'].date() - scenario['today']).days} days away) - using historical patterns"
+        ),
+        'current_speed': round(realtime_data.get('current_speed', 0), 1) if realtime_data else None,
+        'free_flow_speed': round(realtime_data.get('free_flow_speed', 0), 1) if realtime_data else None,
+        'speed_factor': round(realtime_speed_factor, 2) if realtime_speed_factor else None,
+        'current_congestion': scenario['current_congestion'],
+        'timestamp': realtime_data.get('timestamp') if realtime_data else None,
+        'snapshot_age_s': realtime_data.get('snapshot_age_s') if realtime_data else None,
+        'hours_adjusted': hours_adjusted
+    }
+
+
+def simulation_input(scenario):
+    return {
+        'area': scenario['area'],
+        'road_corridor': scenario['road_corridor'],
+        'disruption_type': scenario['disruption_type'],
+        'start': scenario['start_datetime'].strftime('%Y-%m-%d %H:%M'),
+        'end': scenario['end_datetime'].strftime('%Y-%m-%d %H:%M'),
+        'description': scenario['description'],
+        'coordinates': scenario['coordinates'],
+        'road_info': scenario['road_info']
+    }
+
+
+def scenario_duration_days(scenario):
+    return round((scenario['end_datetime'] - scenario['start_datetime']).total_seconds() / 86400, 1)
+
+
+def scenario_uncertainty(scenario, hour_datetimes, probabilities):
+    """P10 / P50 / P90 bands from the hourly class probabilities (hours x 3)"""
+    options = scenario['uncertainty']
+    class_delays = predictor.estimate_class_delays(
+        len(hour_datetimes), **scenario_delay_inputs(scenario, hour_datetimes)
+    )
+    return DelayUncertainty(probabilities, class_delays, options['samples'], options['seed']).summary()
+
+
+def scenario_network_impact(scenario, severities):
+    """
+    Spill-over of the disruption at its heaviest predicted hour
+
+    The V/C of that hour (without the disruption) calibrates the demand;
+    the capacity reduction is the one estimate_delay applies.
+    """
+    network = road_network.get()
+    if network is None:
+        return {'available': False, 'reason': 'No road network loaded'}
+
+    model = network_impact_models.get(network)
+    if model is None:
+        model = network_impact_models[network] = NetworkImpactModel(network, calculate_lane_capacity)
+
+    road_info = scenario['road_info']
+    peak = int(np.argmax(severities))
+    peak_severity = float(severities[peak])
+    base_v_c = predictor.estimate_delay_many(
+        severities=np.array([peak_severity]),
+        base_travel_time_minutes=float(road_info['free_flow_time_minutes']),
+        road_length_km=float(road_info['length_km']),
+        impact_factor=0.0
+    )['v_c_ratio'][0]
+
+    result = model.simulate(
+        scenario['coordinates']['lat'], scenario['coordinates']['lng'],
+        impact_factor=float(road_info['disruption_factors'].get(scenario['disruption_type'], 0.6)),
+        base_v_c=base_v_c,
+        disruption_length_m=float(road_info['length_km']) * 1000,
+        snap_m=ROAD_SNAP_DISTANCE_M,
+        radius_m=NETWORK_SIM_RADIUS_M,
+        n_zones=NETWORK_SIM_ZONES,
+        max_iterations=NETWORK_SIM_MAX_ITERATIONS,
+        tolerance=NETWORK_SIM_GAP
+    )
+    if result is None:
+        return {'available': False, 'reason': 'Disruption location is not on a road of the network'}
+    if result.get('available') is False:
+        return result
+
+    return {
+        'available': True,
+        'peak_hour': (scenario['start_datetime'] + timedelta(hours=peak)).strftime('%Y-%m-%d %H:%M'),
+        'peak_severity': round(peak_severity, 2),
+        **result
+    }
 
-        # ✅ Generate aggregated view
-        aggregated_view = aggregate_predictions_smart(hourly_predictions, start_datetime, end_datetime)
-        
-        # ============================================================
-        # Calculate Summary Statistics
-        # ============================================================
-        
-        total_hours = len(hourly_predictions)
+
+def build_simulation_payload(scenario, hourly_predictions, simulation_id):
+    """Full (non-streaming) simulation response for predicted hours"""
+    start_datetime = scenario['start_datetime']
+    end_datetime = scenario['end_datetime']
+
+    # ✅ Daily view, summary and time segments in one aggregation pass
+    aggregate = SimulationAggregate.from_hourly_predictions(
+        hourly_predictions, start_datetime.date(), end_datetime.date()
+    )
+    aggregated_view = {
+        'granularity': 'daily',
+        'display_label': 'Day-by-Day View',
+        'map_data': aggregate.daily_map_data(start_datetime.date())
+    }
+
+    payload = {
+        'success': True,
+        'simulation_id': simulation_id,
+        'realtime_integration': realtime_integration(scenario, aggregate.hours_adjusted),
+        'input': simulation_input(scenario),
+        'summary': aggregate.summary(scenario_duration_days(scenario)),
+        'hourly_predictions': hourly_predictions,
+        'time_segments': aggregate.time_segments(),
+        'aggregated_view': aggregated_view,
+        'has_multiple_days': (end_datetime - start_datetime).days > 1,
+        'affected_segments': build_affected_segments(scenario, aggregate.avg_severity, aggregate.avg_delay, hourly_predictions),
+        'impact_zones': IMPACT_ZONES,
+        'road_info': scenario['road_info']  # ✅ ADD THIS - needed for frontend
+    }
+
+    if scenario['uncertainty']:
+        payload['uncertainty'] = scenario_uncertainty(
+            scenario, scenario_hour_datetimes(scenario), probability_matrix(hourly_predictions)
+        )
+    if scenario['network_impact']:
+        payload['network_impact'] = scenario_network_impact(scenario, [p['severity'] for p in hourly_predictions])
+    return payload
+
+
+def run_realtime_simulation(data):
+    """
+    Full (non-streaming) realtime simulation of one payload
+
+    Independent of the request so the job queue can run it as well.
+
+    Returns:
+        tuple: (payload, http status, cache state 'HIT' / 'MISS' / None)
+    """
+    scenario, error = parse_disruption_scenario(data)
+    if error:
+        return {'success': False, 'error': error}, 400, None
+
+    plan_realtime(scenario)
+
+    # ============================================================
+    # ✅ RESULT CACHE: identical scenarios skip the simulation
+    # ============================================================
+
+    cache_key = scenario_cache_key(scenario)
+    cached, lease = simulation_cache.acquire(cache_key)
+    if cached is not None:
+        return fresh_simulation_id(cached), 200, 'HIT'
+
+    try:
+        fetch_realtime(scenario)
+        simulation_id = f"sim_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        hourly_predictions = predict_scenario_hours(scenario, scenario_hour_datetimes(scenario))
 
         # ✅ SAFETY CHECK - Prevent division by zero
-        if total_hours == 0:
-            return jsonify({
+        if len(hourly_predictions) == 0:
+            return {
                 'success': False,
                 'error': 'No predictions generated. Check start and end dates.'
-            }), 400
+            }, 400, 'MISS'
 
-        light_hours = sum(1 for p in hourly_predictions if p['severity'] < 0.5)
-        moderate_hours = sum(1 for p in hourly_predictions if 0.5 <= p['severity'] < 1.5)
-        heavy_hours = sum(1 for p in hourly_predictions if p['severity'] >= 1.5)
-        
-        # ✅ SAFE DIVISION
-        avg_severity = sum(p['severity'] for p in hourly_predictions) / max(total_hours, 1)
-        avg_delay = sum(p['delay_info']['additional_delay_min'] for p in hourly_predictions) / max(total_hours, 1)
+        payload = build_simulation_payload(scenario, hourly_predictions, simulation_id)
+        simulation_cache.store(cache_key, payload, expires_at=scenario['cache_expires_at'])
+        return payload, 200, 'MISS'
+    finally:
+        # Wake up identical requests waiting on this one
+        simulation_cache.release(cache_key, lease)
 
-        # Time segment breakdown
-        time_segments = {
-            'morning': {'light': 0, 'moderate': 0, 'heavy': 0},
-            'afternoon': {'light': 0, 'moderate': 0, 'heavy': 0},
-            'night': {'light': 0, 'moderate': 0, 'heavy': 0}
-        }
-        
-        for pred in hourly_predictions:
-            hour = int(pred['hour'])  # ✅ ENSURE INT
-            if pred['severity'] < 0.5:
-                sev_label = 'light'
-            elif pred['severity'] < 1.5:
-                sev_label = 'moderate'
-            else:
-                sev_label = 'heavy'
-            
-            if 6 <= hour <= 11:
-                time_segments['morning'][sev_label] += 1
-            elif 12 <= hour <= 17:
-                time_segments['afternoon'][sev_label] += 1
-            else:
-                time_segments['night'][sev_label] += 1
-        
-        simulation_id = f"sim_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        
-        # ============================================================
-        # Calculate Affected Road Segments with Individual Severities
-        # ============================================================
-        
-        affected_segments = []
-        
-        # Define impact zones with distance-based severity multipliers
-        impact_zones = [
-            {'min_dist': 0, 'max_dist': 150, 'multiplier': 1.0, 'label': 'Critical Impact'},
-            {'min_dist': 150, 'max_dist': 300, 'multiplier': 0.75, 'label': 'High Impact'},
-            {'min_dist': 300, 'max_dist': 450, 'multiplier': 0.50, 'label': 'Moderate Impact'},
-            {'min_dist': 450, 'max_dist': 600, 'multiplier': 0.30, 'label': 'Low Impact'},
-        ]
-        
-        # Road type importance factors (higher capacity = more affected by disruption)
-        road_type_factors = {
-            'motorway': 1.2,
-            'trunk': 1.15,
-            'primary': 1.1,
-            'secondary': 1.0,
-            'tertiary': 0.9,
-            'residential': 0.7,
-            'service': 0.5,
-        }
-        
-        # Create segment data for main road
-        main_segment = {
-            'segment_id': 'main',
-            'road_name': road_corridor,
-            'road_type': road_info.get('road_type', 'secondary'),
-            'distance_m': 0,
-            'impact_zone': 'Critical Impact',
-            'avg_severity': round(avg_severity, 2),
-            'severity_label': 'Light' if avg_severity < 0.5 else ('Moderate' if avg_severity < 1.5 else 'Heavy'),
-            'avg_delay_min': round(avg_delay),
-            'hourly_severities': [
-                {
-                    'hour': p['hour'],
-                    'datetime': p['datetime'],
-                    'severity': p['severity'],
-                    'severity_label': p['severity_label'],
-                    'delay_min': p['delay_info']['additional_delay_min']
-                }
-                for p in hourly_predictions
-            ]
-        }
-        affected_segments.append(main_segment)
-        
-        # Generate nearby road segment predictions
-        # These will be used by frontend to color nearby roads accurately
-        sample_nearby_roads = [
-            {'id': 'nearby_1', 'name': 'Adjacent Road 1', 'type': 'secondary', 'distance': 100},
-            {'id': 'nearby_2', 'name': 'Adjacent Road 2', 'type': 'tertiary', 'distance': 200},
-            {'id': 'nearby_3', 'name': 'Adjacent Road 3', 'type': 'secondary', 'distance': 350},
-            {'id': 'nearby_4', 'name': 'Adjacent Road 4', 'type': 'residential', 'distance': 500},
-        ]
-        
-        for nearby in sample_nearby_roads:
-            # Find applicable impact zone
-            zone = next(
-                (z for z in impact_zones if z['min_dist'] <= nearby['distance'] < z['max_dist']),
-                impact_zones[-1]
-            )
-            
-            # Calculate segment-specific severity
-            road_factor = road_type_factors.get(nearby['type'], 0.8)
-            segment_severity = avg_severity * zone['multiplier'] * road_factor
-            segment_delay = avg_delay * zone['multiplier'] * road_factor
-            
-            segment = {
-                'segment_id': nearby['id'],
-                'road_name': nearby['name'],
-                'road_type': nearby['type'],
-                'distance_m': nearby['distance'],
-                'impact_zone': zone['label'],
-                'impact_multiplier': zone['multiplier'],
-                'road_factor': road_factor,
-                'avg_severity': round(segment_severity, 2),
-                'severity_label': 'Light' if segment_severity < 0.5 else ('Moderate' if segment_severity < 1.5 else 'Heavy'),
-                'avg_delay_min': round(segment_delay),
-            }
-            affected_segments.append(segment)
 
-        # ============================================================
-        # Return Response
-        # ============================================================
-        
+def stream_realtime_simulation(data, stream_format):
+    """
+    Opt-in Streaming (NDJSON / SSE) of a realtime simulation
+    (not cached - frames go out while the simulation runs)
+    """
+    scenario, error = parse_disruption_scenario(data)
+    if error:
         return jsonify({
+            'success': False,
+            'error': error
+        }), 400
+
+    plan_realtime(scenario)
+    fetch_realtime(scenario)
+
+    start_datetime = scenario['start_datetime']
+    end_datetime = scenario['end_datetime']
+    simulation_id = f"sim_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+    def generate_frames():
+        """
+        Hourly frames as each day is predicted, a day frame when the
+        day closes, then the summary. Only one day is kept in memory.
+        """
+        yield stream_frame(stream_format, 'meta', {
+            'simulation_id': simulation_id,
+            'input': simulation_input(scenario),
+            'expected_hours': int(scenario['duration_hours']) + 1,
+            'impact_zones': IMPACT_ZONES,
+            'road_info': scenario['road_info']
+        })
+
+        # Only compact columns are kept across days
+        hours, days, severities, delays, adjusted = [], [], [], [], []
+        probabilities = [] if scenario['uncertainty'] else None
+
+        day_datetimes = []
+        current_datetime = start_datetime
+        while current_datetime <= end_datetime:
+            day_datetimes.append(current_datetime)
+            current_datetime += timedelta(hours=1)
+            if current_datetime <= end_datetime and current_datetime.date() == day_datetimes[0].date():
+                continue
+
+            day_predictions = predict_scenario_hours(scenario, day_datetimes)
+            for pred in day_predictions:
+                yield stream_frame(stream_format, 'hour', pred)
+                hours.append(pred['hour'])
+                days.append((day_datetimes[0].date() - start_datetime.date()).days)
+                severities.append(pred['severity'])
+                delays.append(pred['delay_info']['additional_delay_min'])
+                adjusted.append(pred['realtime_adjusted'])
+            if probabilities is not None:
+                probabilities.append(probability_matrix(day_predictions))
+
+            day = day_datetimes[0].date()
+            for day_aggregate in SimulationAggregate.from_hourly_predictions(day_predictions, day).daily_map_data(day):
+                yield stream_frame(stream_format, 'day', day_aggregate)
+            day_datetimes = []
+
+        aggregate = SimulationAggregate(hours, days, severities, delays, realtime_adjusted=adjusted)
+        summary_frame = {
             'success': True,
             'simulation_id': simulation_id,
-            'realtime_integration': {
-                'enabled': use_realtime and realtime_data and realtime_data.get('success', False),
-                'applicable': use_realtime,
-                'reason': (
-                    'Same-day disruption - adjusted for current traffic' if use_realtime 
-                    else f'Future disruption ({(disruption_start_date - today).days} days away) - using historical patterns'
-                ),
-                'current_speed': round(realtime_data.get('current_speed', 0), 1) if realtime_data else None,
-                'free_flow_speed': round(realtime_data.get('free_flow_speed', 0), 1) if realtime_data else None,
-                'speed_factor': round(realtime_speed_factor, 2) if realtime_speed_factor else None,
-                'current_congestion': current_congestion,
-                'timestamp': realtime_data.get('timestamp') if realtime_data else None,
-                'hours_adjusted': sum(1 for p in hourly_predictions if p['realtime_adjusted'])
-            },
-            'input': {
-                'area': area,
-                'road_corridor': road_corridor,
-                'disruption_type': disruption_type,
-                'start': start_datetime.strftime('%Y-%m-%d %H:%M'),
-                'end': end_datetime.strftime('%Y-%m-%d %H:%M'),
-                'description': data.get('description', ''),
-                'coordinates': coordinates,
-                'road_info': road_info
-            },
-            'summary': {
-                'total_hours': total_hours,
-                'duration_days': round((end_datetime - start_datetime).total_seconds() / 86400, 1),
-                'light_hours': light_hours,
-                'moderate_hours': moderate_hours,
-                'heavy_hours': heavy_hours,
-                'light_percentage': round(light_hours / total_hours * 100, 1),
-                'moderate_percentage': round(moderate_hours / total_hours * 100, 1),
-                'heavy_percentage': round(heavy_hours / total_hours * 100, 1),
-                'avg_severity': round(avg_severity, 1),
-                'avg_severity_label': 'Light' if avg_severity < 0.5 else ('Moderate' if avg_severity < 1.5 else 'Heavy'),
-                'avg_delay_minutes': round(avg_delay),
-                'total_delay_hours': round(sum(p['delay_info']['additional_delay_min'] for p in hourly_predictions) / 60, 1)
-            },
-            'hourly_predictions': hourly_predictions,
-            'time_segments': time_segments,
-            'aggregated_view': aggregated_view,
+            'realtime_integration': realtime_integration(scenario, aggregate.hours_adjusted),
+            'summary': aggregate.summary(scenario_duration_days(scenario)),
+            'time_segments': aggregate.time_segments(),
             'has_multiple_days': (end_datetime - start_datetime).days > 1,
-            'affected_segments': affected_segments,
-            'impact_zones': impact_zones,
-            'road_info': road_info  # ✅ ADD THIS - needed for frontend
-        })
+            # Hourly severities already went out as hour frames
+            'affected_segments': build_affected_segments(scenario, aggregate.avg_severity, aggregate.avg_delay, []),
+        }
+        if probabilities is not None:
+            summary_frame['uncertainty'] = scenario_uncertainty(
+                scenario, scenario_hour_datetimes(scenario), np.concatenate(probabilities)
+            )
+        if scenario['network_impact']:
+            summary_frame['network_impact'] = scenario_network_impact(scenario, severities)
+        yield stream_frame(stream_format, 'summary', summary_frame)
+
+    return stream_response(stream_format, generate_frames())
+
+
+@app.route('/api/simulate-disruption-realtime', methods=['POST'])
+def simulate_disruption_realtime():
+    """
+    Smart simulation that uses real-time data ONLY for same-day disruptions (0-6 hours ahead)
+    Future disruptions use historical patterns only
+
+    Long runs can go through the job queue instead (POST /api/jobs).
+    """
+    try:
+        data = request.get_json()
+
+        stream_format = requested_stream_format()
+        if stream_format:
+            return stream_realtime_simulation(data, stream_format)
+
+        return simulation_response(*run_realtime_simulation(data))
 
     except Exception as e:
         import traceback
@@ -3368,6 +3801,174 @@ def simulate_disruption_realtime():
             'error': str(e),
             'traceback': traceback.format_exc() if app.debug else None
         }), 500
+
+
+# ============================================================
+# Batch Simulation: many scenarios, one model pass
+# ============================================================
+
+def batch_scenarios(data):
+    """
+    Scenario list of a batch body ({"scenarios": [...]} or a bare list)
+
+    Returns:
+        tuple: (list, None) or (None, error message for a 400)
+    """
+    scenarios_data = data.get('scenarios') if isinstance(data, dict) else data
+
+    if not isinstance(scenarios_data, list) or not scenarios_data:
+        return None, 'Request must contain a non-empty "scenarios" list'
+
+    if len(scenarios_data) > SIMULATION_BATCH_MAX:
+        return None, f'Too many scenarios ({len(scenarios_data)}), maximum is {SIMULATION_BATCH_MAX}'
+
+    return scenarios_data, None
+
+
+def run_batch_simulation(data):
+    """
+    Simulate many disruption scenarios with a single model pass
+
+    Every scenario is validated up front, then the hours of all scenarios
+    go through the model in a single batch and are split back per scenario.
+    Each result has the single-scenario response schema; invalid or failed
+    scenarios get {'success': False, 'error': ...} in their slot.
+
+    The batch never waits on the result cache: keys are claimed without
+    blocking, and only after the realtime fetches, so batches with the
+    same scenarios in any order can't stall each other. Scenarios another
+    request is already computing are simply computed here as well.
+
+    Returns:
+        tuple: (payload, http status, None)
+    """
+    scenarios_data, error = batch_scenarios(data)
+    if error:
+        return {'success': False, 'error': error}, 400, None
+
+    leases = []
+    try:
+        results = [None] * len(scenarios_data)
+        pending = []      # (index, scenario, cache_key) to simulate
+        duplicates = {}   # index -> index of the identical scenario simulated in this batch
+        batch_keys = {}   # cache_key -> first index in this batch
+        now = datetime.now()
+
+        # ✅ VALIDATE EVERY SCENARIO BEFORE RUNNING ANY
+        for index, scenario_data in enumerate(scenarios_data):
+            scenario, error = parse_disruption_scenario(scenario_data)
+            if error:
+                results[index] = {'success': False, 'error': error}
+                continue
+
+            plan_realtime(scenario, now)
+            cache_key = scenario_cache_key(scenario)
+
+            # Identical scenarios within the batch are simulated once
+            if cache_key in batch_keys:
+                duplicates[index] = batch_keys[cache_key]
+                continue
+            batch_keys[cache_key] = index
+
+            cached = simulation_cache.peek(cache_key)
+            if cached is not None:
+                results[index] = {**cached, 'simulation_id': f"sim_{now.strftime('%Y%m%d_%H%M%S')}_{index}"}
+                continue
+            pending.append((index, scenario, cache_key))
+
+        for index, scenario, cache_key in pending:
+            fetch_realtime(scenario)
+
+        # Claim keys only now, without waiting: anything cached meanwhile is used
+        claimed = []
+        for index, scenario, cache_key in pending:
+            cached, lease = simulation_cache.acquire(cache_key, wait=False)
+            if cached is not None:
+                results[index] = {**cached, 'simulation_id': f"sim_{now.strftime('%Y%m%d_%H%M%S')}_{index}"}
+                continue
+            leases.append((cache_key, lease))
+            claimed.append((index, scenario, cache_key))
+        pending = claimed
+
+        print(f"\n📦 Batch simulation: {len(scenarios_data)} scenarios, "
+              f"{len(pending)} to simulate, {sum(r is not None and r.get('success') is False for r in results)} invalid")
+
+        # ============================================================
+        # One model pass over the hours of every pending scenario
+        # ============================================================
+
+        hour_datetimes = []
+        hour_inputs = []
+        offsets = [0]
+        for index, scenario, cache_key in pending:
+            scenario_hours = scenario_hour_datetimes(scenario)
+            hour_datetimes.append(scenario_hours)
+            hour_inputs.extend(scenario_hour_inputs(scenario, scenario_hours))
+            offsets.append(len(hour_inputs))
+
+        predictions = None
+        batch_error = None
+        if hour_inputs:
+            try:
+                predictions = predictor.predict_batch(hour_inputs)
+            except Exception as e:
+                batch_error = str(e)
+
+        for position, (index, scenario, cache_key) in enumerate(pending):
+            if batch_error:
+                results[index] = {'success': False, 'error': batch_error}
+                continue
+            try:
+                hourly_predictions = scenario_hourly_predictions(
+                    scenario, hour_datetimes[position], predictions[offsets[position]:offsets[position + 1]]
+                )
+                payload = build_simulation_payload(
+                    scenario, hourly_predictions, f"sim_{now.strftime('%Y%m%d_%H%M%S')}_{index}"
+                )
+                simulation_cache.store(cache_key, payload, expires_at=scenario['cache_expires_at'])
+                results[index] = payload
+            except Exception as e:
+                results[index] = {'success': False, 'error': str(e)}
+
+        for index, original in duplicates.items():
+            results[index] = {**results[original], 'simulation_id': f"sim_{now.strftime('%Y%m%d_%H%M%S')}_{index}"} \
+                if results[original].get('success') else results[original]
+
+        succeeded = sum(1 for r in results if r.get('success'))
+        return {
+            'success': True,
+            'total_scenarios': len(results),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'results': results
+        }, 200, None
+
+    finally:
+        for cache_key, lease in leases:
+            simulation_cache.release(cache_key, lease)
+
+
+@app.route('/api/simulate-disruption-batch', methods=['POST'])
+def simulate_disruption_batch():
+    """
+    Simulate many disruption scenarios in one request
+
+    Body: {"scenarios": [<simulate-disruption-realtime payload>, ...]}
+    """
+    try:
+        return simulation_response(*run_batch_simulation(request.get_json(silent=True)))
+
+    except Exception as e:
+        import traceback
+        print("\n❌ ERROR in simulate_disruption_batch:")
+        print(traceback.format_exc())
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc() if app.debug else None
+        }), 500
+
+
 # ============================================================
 # ROUTE 1: Home Page
 # ============================================================
@@ -3647,45 +4248,65 @@ def predict_single():
 # ROUTE 6: UPDATED - Simulate Disruption with Road Info
 # ============================================================
 
-@app.route('/api/simulate-disruption', methods=['POST'])
-def simulate_disruption():
+def run_simulation(data):
     """
     UPDATED VERSION - Now accepts road_info from OSM
+
+    Independent of the request so the job queue can run it as well.
+
+    Returns:
+        tuple: (payload, http status, cache state 'HIT' / 'MISS' / None)
     """
+    # Extract basic disruption parameters
+    area = data.get('area', 'Unknown')
+    road_corridor = data.get('road_corridor', 'Unknown')
+    disruption_type = data.get('disruption_type')
+    start_datetime = datetime.strptime(
+        f"{data['start_date']} {data['start_time']}", 
+        "%Y-%m-%d %H:%M"
+    )
+    end_datetime = datetime.strptime(
+        f"{data['end_date']} {data['end_time']}", 
+        "%Y-%m-%d %H:%M"
+    )
+    
+    # NEW: Get road information (from OSM)
+    road_info = data.get('road_info', {})
+    lanes = road_info.get('lanes', 2)
+    length_km = float(road_info.get('length_km', 1.0))
+    total_capacity = road_info.get('total_capacity', 3000)
+    free_flow_time = road_info.get('free_flow_time_minutes', 10)
+    disruption_factors = road_info.get('disruption_factors', {})
+    
+    # Get disruption impact factor
+    impact_factor = disruption_factors.get(disruption_type, 0.6)
+    
+    # Optional Monte Carlo bands: true, a sample count or {'samples', 'seed'}
+    try:
+        uncertainty = uncertainty_options(data.get('uncertainty'))
+    except (ValueError, TypeError, AttributeError) as e:
+        return {
+            'success': False,
+            'error': f'Invalid uncertainty option: {str(e)}'
+        }, 400, None
+    
+    # Identical scenarios (same body, same model) reuse the cached result
+    cache_key = scenario_fingerprint('simulate-disruption', predictor.model_version, data)
+    cached, lease = simulation_cache.acquire(cache_key)
+    if cached is not None:
+        return fresh_simulation_id(cached), 200, 'HIT'
+    
     try:
-        data = request.get_json()
-        
-        # Extract basic disruption parameters
-        area = data.get('area', 'Unknown')
-        road_corridor = data.get('road_corridor', 'Unknown')
-        disruption_type = data.get('disruption_type')
-        start_datetime = datetime.strptime(
-            f"{data['start_date']} {data['start_time']}", 
-            "%Y-%m-%d %H:%M"
-        )
-        end_datetime = datetime.strptime(
-            f"{data['end_date']} {data['end_time']}", 
-            "%Y-%m-%d %H:%M"
-        )
-        
-        # NEW: Get road information (from OSM)
-        road_info = data.get('road_info', {})
-        lanes = road_info.get('lanes', 2)
-        length_km = float(road_info.get('length_km', 1.0))
-        total_capacity = road_info.get('total_capacity', 3000)
-        free_flow_time = road_info.get('free_flow_time_minutes', 10)
-        disruption_factors = road_info.get('disruption_factors', {})
-        
-        # Get disruption impact factor
-        impact_factor = disruption_factors.get(disruption_type, 0.6)
-        
         # Generate hourly predictions
         hourly_predictions = []
+        hour_datetimes = []
+        hour_inputs = []
         current_datetime = start_datetime
         
         while current_datetime <= end_datetime:
             # Prepare input
-            hour_input = {
+            hour_datetimes.append(current_datetime)
+            hour_inputs.append({
                 'date': current_datetime.strftime('%Y-%m-%d'),
                 'hour': current_datetime.hour,
                 'area': area,
@@ -3694,19 +4315,21 @@ def simulate_disruption():
                 'disruption_type': disruption_type,
                 'total_volume': data.get('total_volume', 0),
                 'has_real_status': 0
-            }
-            
-            # Make prediction
-            prediction = predictor.predict(hour_input)
-            
-            # IMPORTANT: Calculate delay with road-specific info
-            delay_info = predictor.estimate_delay(
-                severity=prediction['severity'],
-                base_travel_time_minutes=free_flow_time,
-                road_length_km=length_km,
-                impact_factor=impact_factor
-            )
-            
+            })
+            current_datetime += timedelta(hours=1)
+        
+        # Make all predictions in one model pass
+        predictions = predictor.predict_batch(hour_inputs)
+        
+        # IMPORTANT: Calculate delays with road-specific info (one array pass)
+        delays = predictor.estimate_delay_many(
+            severities=np.array([p['severity'] for p in predictions]),
+            base_travel_time_minutes=free_flow_time,
+            road_length_km=length_km,
+            impact_factor=impact_factor
+        )
+        
+        for current_datetime, prediction, delay_info in zip(hour_datetimes, predictions, predictor.delay_records(delays)):
             # Add to results
             hourly_predictions.append({
                 'datetime': current_datetime.strftime('%Y-%m-%d %H:%M'),
@@ -3721,38 +4344,13 @@ def simulate_disruption():
                     k: round(v, 3) for k, v in prediction['probabilities'].items()
                 }
             })
-            
-            current_datetime += timedelta(hours=1)
-        
-        # Calculate summary statistics
-        total_hours = len(hourly_predictions)
-        light_hours = sum(1 for p in hourly_predictions if p['severity'] == 0)
-        moderate_hours = sum(1 for p in hourly_predictions if p['severity'] == 1)
-        heavy_hours = sum(1 for p in hourly_predictions if p['severity'] == 2)
-        avg_severity = sum(p['severity'] for p in hourly_predictions) / total_hours
-        avg_delay = sum(p['delay_info']['additional_delay_min'] for p in hourly_predictions) / total_hours
-        
-        # Time segment breakdown
-        time_segments = {
-            'morning': {'light': 0, 'moderate': 0, 'heavy': 0},
-            'afternoon': {'light': 0, 'moderate': 0, 'heavy': 0},
-            'night': {'light': 0, 'moderate': 0, 'heavy': 0}
-        }
         
-        for pred in hourly_predictions:
-            hour = pred['hour']
-            severity_label = pred['severity_label'].lower()
-            
-            if 6 <= hour <= 11:
-                time_segments['morning'][severity_label] += 1
-            elif 12 <= hour <= 17:
-                time_segments['afternoon'][severity_label] += 1
-            else:
-                time_segments['night'][severity_label] += 1
+        # Summary statistics and time segments in one aggregation pass
+        aggregate = SimulationAggregate.from_hourly_predictions(hourly_predictions, start_datetime.date())
         
         simulation_id = f"sim_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
-        return jsonify({
+        payload = {
             'success': True,
             'simulation_id': simulation_id,
             'input': {
@@ -3765,23 +4363,41 @@ def simulate_disruption():
                 'coordinates': data.get('coordinates', {}),
                 'road_info': road_info
             },
-            'summary': {
-                'total_hours': total_hours,
-                'duration_days': round((end_datetime - start_datetime).total_seconds() / 86400, 1),
-                'light_hours': light_hours,
-                'moderate_hours': moderate_hours,
-                'heavy_hours': heavy_hours,
-                'light_percentage': round(light_hours / total_hours * 100, 1),
-                'moderate_percentage': round(moderate_hours / total_hours * 100, 1),
-                'heavy_percentage': round(heavy_hours / total_hours * 100, 1),
-                'avg_severity': round(avg_severity, 2),
-                'avg_severity_label': 'Light' if avg_severity < 0.5 else ('Moderate' if avg_severity < 1.5 else 'Heavy'),
-                'avg_delay_minutes': round(avg_delay, 1),
-                'total_delay_hours': round(sum(p['delay_info']['additional_delay_min'] for p in hourly_predictions) / 60, 1)
-            },
+            'summary': aggregate.summary(
+                duration_days=round((end_datetime - start_datetime).total_seconds() / 86400, 1),
+                severity_digits=2,
+                delay_digits=1
+            ),
             'hourly_predictions': hourly_predictions,
-            'time_segments': time_segments
-        })
+            'time_segments': aggregate.time_segments()
+        }
+        
+        if uncertainty:
+            class_delays = predictor.estimate_class_delays(
+                len(hourly_predictions),
+                base_travel_time_minutes=free_flow_time,
+                road_length_km=length_km,
+                impact_factor=impact_factor
+            )
+            payload['uncertainty'] = DelayUncertainty(
+                probability_matrix(hourly_predictions), class_delays, uncertainty['samples'], uncertainty['seed']
+            ).summary()
+        
+        simulation_cache.store(cache_key, payload)
+        return payload, 200, 'MISS'
+        
+    finally:
+        # Wake up identical requests waiting on this one
+        simulation_cache.release(cache_key, lease)
+
+
+@app.route('/api/simulate-disruption', methods=['POST'])
+def simulate_disruption():
+    """
+    UPDATED VERSION - Now accepts road_info from OSM
+    """
+    try:
+        return simulation_response(*run_simulation(request.get_json()))
         
     except Exception as e:
         import traceback
@@ -3842,6 +4458,530 @@ def get_recommendations():
         'recommendations': recommendations
     })
 
+# ============================================================
+# ROUTE 7b: Least-Impact Scheduling
+# ============================================================
+
+# Longest search range (hours) accepted by /api/schedule-disruption
+SCHEDULE_MAX_RANGE_HOURS = int(os.getenv('SCHEDULE_MAX_RANGE_HOURS', '1440'))
+
+
+@app.route('/api/schedule-disruption', methods=['POST'])
+def schedule_disruption():
+    """
+    Find the start times with the least predicted impact for a disruption
+
+    Body: area, road_corridor, disruption_type, duration_hours,
+    earliest_date (+ earliest_time), latest_date (+ latest_time) - the
+    disruption must fit between earliest and latest - and optional
+    road_info, total_volume, top_k (default 5) and min_gap_hours.
+
+    Every start hour in the range is a candidate. The whole range is
+    predicted in one batch (historical patterns, no real-time data), then
+    each candidate is scored with sliding-window sums and ranked by total
+    delay, heavy hours and peak severity.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+
+        required_fields = ['area', 'road_corridor', 'disruption_type', 'duration_hours', 'earliest_date', 'latest_date']
+        missing_fields = [field for field in required_fields if not data.get(field)]
+        if missing_fields:
+            return jsonify({
+                'success': False,
+                'error': f'Missing required fields: {", ".join(missing_fields)}'
+            }), 400
+
+        area = str(data['area'])
+        road_corridor = str(data['road_corridor'])
+        disruption_type = str(data['disruption_type'])
+
+        try:
+            duration_hours = int(data['duration_hours'])
+            top_k = int(data.get('top_k', 5))
+            min_gap_hours = int(data.get('min_gap_hours', 0))
+            range_start = datetime.strptime(
+                f"{data['earliest_date']} {data.get('earliest_time', '00:00')}", "%Y-%m-%d %H:%M"
+            )
+            range_end = datetime.strptime(
+                f"{data['latest_date']} {data.get('latest_time', '23:00')}", "%Y-%m-%d %H:%M"
+            )
+        except (ValueError, TypeError) as e:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid scheduling parameters: {str(e)}'
+            }), 400
+
+        # Candidates start on the hour
+        range_start = range_start.replace(minute=0)
+        range_end = range_end.replace(minute=0)
+        range_hours = int((range_end - range_start).total_seconds() // 3600) + 1
+
+        if duration_hours < 1 or duration_hours > 720:
+            return jsonify({
+                'success': False,
+                'error': 'Disruption duration must be between 1 hour and 30 days'
+            }), 400
+
+        if top_k < 1:
+            return jsonify({
+                'success': False,
+                'error': 'top_k must be at least 1'
+            }), 400
+
+        if range_hours < duration_hours:
+            return jsonify({
+                'success': False,
+                'error': 'The date range is shorter than the disruption duration'
+            }), 400
+
+        if range_hours > SCHEDULE_MAX_RANGE_HOURS:
+            return jsonify({
+                'success': False,
+                'error': f'Date range cannot exceed {SCHEDULE_MAX_RANGE_HOURS} hours'
+            }), 400
+
+        road_info = data.get('road_info', {})
+        try:
+            free_flow_time = float(road_info.get('free_flow_time_minutes', 10))
+            length_km = float(road_info.get('length_km', 1.0))
+            impact_factor = float(road_info.get('disruption_factors', {}).get(disruption_type, 0.6))
+            total_volume = int(data.get('total_volume', 0))
+        except (ValueError, TypeError, AttributeError) as e:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid road info data: {str(e)}'
+            }), 400
+
+        # ============================================================
+        # One prediction over the union of every candidate's hours
+        # ============================================================
+
+        hour_datetimes = [range_start + timedelta(hours=h) for h in range(range_hours)]
+        predictions = predictor.predict_batch([
+            {
+                'date': current_datetime.strftime('%Y-%m-%d'),
+                'hour': current_datetime.hour,
+                'area': area,
+                'road_corridor': road_corridor,
+                'has_disruption': 1,
+                'disruption_type': disruption_type,
+                'total_volume': total_volume,
+                'has_real_status': 0
+            }
+            for current_datetime in hour_datetimes
+        ])
+        severities = np.array([float(p['severity']) for p in predictions])
+        delays = predictor.estimate_delay_many(
+            severities=severities,
+            base_travel_time_minutes=free_flow_time,
+            road_length_km=length_km,
+            impact_factor=impact_factor
+        )['additional_delay_min']
+
+        ranking = StartTimeRanking(severities, delays, duration_hours)
+
+        def window(offset, rank=None):
+            start = hour_datetimes[offset]
+            end = start + timedelta(hours=duration_hours - 1)
+            entry = {
+                'start': start.strftime('%Y-%m-%d %H:%M'),
+                'end': end.strftime('%Y-%m-%d %H:%M'),
+                'start_day': start.strftime('%A'),
+                **ranking.candidate(offset)
+            }
+            if rank is not None:
+                entry['rank'] = rank
+            return entry
+
+        best = [window(offset, rank) for rank, offset in enumerate(ranking.top(top_k, min_gap_hours), start=1)]
+        worst = window(int(ranking.order[-1]))
+
+        # Savings of the best start compared with the worst one
+        savings = round(worst['total_delay_min'] - best[0]['total_delay_min'], 1)
+
+        return jsonify({
+            'success': True,
+            'input': {
+                'area': area,
+                'road_corridor': road_corridor,
+                'disruption_type': disruption_type,
+                'duration_hours': duration_hours,
+                'earliest': range_start.strftime('%Y-%m-%d %H:%M'),
+                'latest': range_end.strftime('%Y-%m-%d %H:%M'),
+                'top_k': top_k,
+                'min_gap_hours': min_gap_hours
+            },
+            'candidates_evaluated': ranking.n_candidates,
+            'hours_predicted': range_hours,
+            'recommended_starts': best,
+            'worst_start': worst,
+            'median_total_delay_min': round(float(np.median(ranking.total_delay)), 1),
+            'delay_saved_vs_worst_min': savings
+        })
+
+    except Exception as e:
+        import traceback
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }), 500
+
+# ============================================================
+# Local Routing (road network with landmark index)
+# ============================================================
+
+# How far origin / destination may be from the graph before Google is used
+ROUTING_SNAP_M = float(os.getenv('ROUTING_SNAP_M', '200'))
+ROUTING_MAX_ALTERNATIVES = int(os.getenv('ROUTING_MAX_ALTERNATIVES', '3'))
+routing_engines = {}  # RoadNetwork -> RoutingEngine, built on first use
+
+
+def routing_engine():
+    network = road_network.get()
+    if network is None:
+        return None
+    engine = routing_engines.get(network)
+    if engine is None:
+        engine = routing_engines[network] = RoutingEngine(network)
+    return engine
+
+
+def parse_lat_lng(value):
+    """"lat,lng" string or {'lat', 'lng'} dict -> (lat, lng)"""
+    if isinstance(value, dict):
+        return float(value['lat']), float(value.get('lng', value.get('lon')))
+    lat, lng = str(value).split(',')
+    return float(lat), float(lng)
+
+
+def disruption_edge_weights(engine, data):
+    """
+    Edge weights raised by simulated delays
+
+    affected_segments (simulation results) carry the delay of the whole
+    disrupted stretch (road_info.length_km), so each segment gets its
+    length share of it; spillover_segments (network_impact) carry the
+    added delay of the segment itself. closed_segments cannot be used.
+    """
+    network = engine.network
+    stretch_m = float((data.get('road_info') or {}).get('length_km', 1.0)) * 1000
+    segment_delays = {}
+
+    for segment in data.get('affected_segments') or []:
+        for index in network.segment_indices([segment.get('network_segment_id') or segment.get('segment_id')]):
+            share = min(network.length_m[index] / max(stretch_m, 1.0), 1.0)
+            segment_delays[index] = segment_delays.get(index, 0.0) + float(segment.get('avg_delay_min') or 0) * 60 * share
+    for segment in data.get('spillover_segments') or []:
+        for index in network.segment_indices([segment.get('segment_id')]):
+            segment_delays[index] = segment_delays.get(index, 0.0) + max(float(segment.get('added_delay_min') or 0), 0.0) * 60
+
+    closed_segments = network.segment_indices(data.get('closed_segments') or [])
+    return engine.edge_weights(segment_delays, closed_segments)
+
+
+def local_routes(data, alternatives=0):
+    """
+    Routes on the local road graph
+
+    Returns:
+        dict or None: Described routes (best first), the undisrupted best
+        route and query time; None when an end is outside the graph or
+        both ends snap to the same node
+    """
+    engine = routing_engine()
+    if engine is None:
+        return None
+    source = engine.snap(*parse_lat_lng(data['origin']), ROUTING_SNAP_M)
+    target = engine.snap(*parse_lat_lng(data['destination']), ROUTING_SNAP_M)
+    if source is None or target is None or source == target:
+        # Ends on the same node have no local route; Google answers those
+        return None
+
+    weights = disruption_edge_weights(engine, data)
+    started = time.perf_counter()
+    paths = engine.routes(source, target, weights, alternatives)
+    query_ms = (time.perf_counter() - started) * 1000
+
+    baseline = engine.shortest_path(source, target) if weights else None
+    return {
+        'routes': [engine.describe(path, weights) for path in paths],
+        'baseline_route': engine.describe(baseline) if baseline is not None else None,
+        'query_ms': round(query_ms, 2)
+    }
+
+
+@app.route('/api/routes/alternatives', methods=['POST'])
+def route_alternatives():
+    """
+    Best route and alternates around a disruption
+
+    Body: origin / destination ("lat,lng" or {"lat", "lng"}),
+    alternatives (default 2), and the simulated delays to route around:
+    affected_segments, spillover_segments, closed_segments, road_info.
+    Outside the local graph the request goes to Google Directions.
+    """
+    try:
+        data = request.get_json() or {}
+        if not data.get('origin') or not data.get('destination'):
+            return jsonify({'success': False, 'error': 'Missing origin or destination'}), 400
+        alternatives = max(min(int(data.get('alternatives', 2)), ROUTING_MAX_ALTERNATIVES), 0)
+
+        result = local_routes(data, alternatives)
+        if result is not None:
+            return jsonify({'success': bool(result['routes']), 'source': 'local', **result})
+
+        origin, destination = (('%s,%s' % parse_lat_lng(data[key])) for key in ('origin', 'destination'))
+        response = fetch_google_directions(origin, destination, alternatives=alternatives > 0)
+        if response.status_code != 200:
+            return jsonify({'success': False, 'source': 'google', 'error': f'Google API error: {response.status_code}'}), response.status_code
+        return jsonify({'success': True, 'source': 'google', 'directions': response.json()})
+
+    except (ValueError, TypeError, KeyError) as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid origin or destination: {str(e)}'
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+# ============================================================
+# Async Simulation Jobs
+# ============================================================
+
+# How often /api/jobs/<id>/events checks the job, and for how long at most
+JOB_EVENTS_POLL_S = float(os.getenv('JOB_EVENTS_POLL_S', '0.5'))
+JOB_EVENTS_TIMEOUT_S = float(os.getenv('JOB_EVENTS_TIMEOUT_S', '600'))
+
+
+def validate_simulation_payload(data):
+    """Up-front check for /api/simulate-disruption jobs (error message or None)"""
+    if not isinstance(data, dict):
+        return 'Payload must be a JSON object'
+    missing_fields = [field for field in SCENARIO_REQUIRED_FIELDS if not data.get(field)]
+    if missing_fields:
+        return f'Missing required fields: {", ".join(missing_fields)}'
+    try:
+        datetime.strptime(f"{data['start_date']} {data['start_time']}", "%Y-%m-%d %H:%M")
+        datetime.strptime(f"{data['end_date']} {data['end_time']}", "%Y-%m-%d %H:%M")
+        uncertainty_options(data.get('uncertainty'))
+    except (ValueError, TypeError, AttributeError) as e:
+        return str(e)
+    return None
+
+
+# Job kinds run the same functions as the synchronous routes
+register_job_handler(
+    'simulate-disruption-realtime',
+    lambda data: run_realtime_simulation(data)[:2],
+    validate=lambda data: parse_disruption_scenario(data)[1]
+)
+register_job_handler(
+    'simulate-disruption',
+    lambda data: run_simulation(data)[:2],
+    validate=validate_simulation_payload
+)
+register_job_handler(
+    'simulate-disruption-batch',
+    lambda data: run_batch_simulation(data)[:2],
+    validate=lambda data: batch_scenarios(data)[1]
+)
+
+# Forked workers must not inherit locks held by request threads
+register_worker_initializer(simulation_cache.reset_after_fork)
+register_worker_initializer(road_network.reset_after_fork)
+register_worker_initializer(http_client.reset_after_fork)
+register_worker_initializer(traffic_service.cache.reset_after_fork)
+register_worker_initializer(realtime_poller.reset_after_fork)
+register_worker_initializer(traffic_service.breaker.reset_after_fork)
+if predictor:
+    register_worker_initializer(predictor.reset_after_fork)
+
+job_queue = JobQueue()
+recovered_jobs = job_queue.recover()
+if recovered_jobs:
+    print(f"✓ Re-queued {recovered_jobs} interrupted simulation job(s)")
+
+
+def job_owner():
+    """
+    Who a job belongs to: the token's user, else the client address
+
+    A user_id in the query or body is not trusted here: anyone could send
+    someone else's and read or cancel their jobs.
+    """
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        token_payload = decode_token(auth_header.split(' ', 1)[1])
+        if token_payload:
+            return f"user:{token_payload['user_id']}"
+    return f"ip:{request.remote_addr}"
+
+
+def owned_job(job_id, with_result=False):
+    """The job if it belongs to the caller, else None (reported as 404)"""
+    job = job_queue.get(job_id, with_result=with_result)
+    if job is None or job['owner'] != job_owner():
+        return None
+    return job
+
+
+def job_links(job_id):
+    return {
+        'status': f'/api/jobs/{job_id}',
+        'events': f'/api/jobs/{job_id}/events',
+        'result': f'/api/jobs/{job_id}/result',
+        'cancel': f'/api/jobs/{job_id}/cancel'
+    }
+
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue a simulation and return its job ID right away (202)
+
+    Body: {"kind": "simulate-disruption-realtime" | "simulate-disruption" |
+    "simulate-disruption-batch", "payload": <body of that route>}. The
+    payload is validated before it is queued. The job belongs to the
+    bearer token's user (else the client address); only they can see it.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        kind = data.get('kind', 'simulate-disruption-realtime')
+
+        job = job_queue.submit(kind, data.get('payload'), job_owner())
+        return jsonify({
+            'success': True,
+            'job': job,
+            'links': job_links(job['job_id'])
+        }), 202
+
+    except JobLimitError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 429
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """Most recent jobs of the caller (?limit=, default 50)"""
+    try:
+        limit = min(request.args.get('limit', 50, type=int), 500)
+        return jsonify({
+            'success': True,
+            'jobs': job_queue.list(job_owner(), limit)
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status and timings (without the result)"""
+    job = owned_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job, 'links': job_links(job_id)})
+
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """
+    The finished job's response, with the status code the synchronous
+    route would have returned. 202 while the job is queued or running.
+    """
+    job = owned_job(job_id, with_result=True)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+
+    if job['status'] in ACTIVE_STATUSES:
+        return jsonify({
+            'success': False,
+            'status': job['status'],
+            'error': f"Job is {job['status']}",
+            'links': job_links(job_id)
+        }), 202
+
+    if job['status'] == CANCELLED:
+        return jsonify({'success': False, 'status': CANCELLED, 'error': 'Job was cancelled'}), 409
+
+    result = job['result'] or {'success': False, 'error': job['error'] or 'Job failed'}
+    return jsonify(result), job['http_status'] or (200 if job['status'] == SUCCEEDED else 500)
+
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """
+    Cancel a job. Queued jobs never run; a running job finishes in its
+    worker but its result is discarded.
+    """
+    if owned_job(job_id) is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job})
+
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Stream status changes of a job (SSE by default, ?stream=ndjson for
+    NDJSON) until it finishes; the last frame is 'done'
+    """
+    job = owned_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+
+    stream_format = requested_stream_format() or 'sse'
+
+    def generate_frames():
+        deadline = time.time() + JOB_EVENTS_TIMEOUT_S
+        last_status = None
+        while True:
+            current = job_queue.get(job_id)
+            if current is None:
+                # Purged while streaming
+                yield stream_frame(stream_format, 'done', {'job_id': job_id, 'status': None, 'error': 'Job not found'})
+                return
+            if current['status'] != last_status:
+                last_status = current['status']
+                yield stream_frame(stream_format, 'status', current)
+            if current['status'] in TERMINAL_STATUSES:
+                yield stream_frame(stream_format, 'done', {
+                    'job_id': job_id,
+                    'status': current['status'],
+                    'result': f'/api/jobs/{job_id}/result'
+                })
+                return
+            if time.time() > deadline:
+                yield stream_frame(stream_format, 'timeout', {'job_id': job_id, 'status': current['status']})
+                return
+            time.sleep(JOB_EVENTS_POLL_S)
+
+    return stream_response(stream_format, generate_frames())
+
+
 # ============================================================
 # (Data/Uploaded) ROUTE 1: List All Files
 # ============================================================
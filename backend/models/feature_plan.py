@@ -0,0 +1,267 @@
+import numpy as np
+import pandas as pd
+
+# Philippine holidays used in training (must match TrafficPredictor features)
+HOLIDAYS = [
+    '2024-01-01', '2024-04-09', '2024-05-01', '2024-06-12',
+    '2024-08-26', '2024-11-01', '2024-11-30', '2024-12-25', '2024-12-30',
+    '2025-01-01', '2025-04-18', '2025-05-01', '2025-06-12',
+    '2025-08-25', '2025-11-01', '2025-11-30', '2025-12-25', '2025-12-30'
+]
+
+AREAS = ['Bucal', 'Parian', 'Turbina']
+ROAD_CORRIDORS = ['Calamba_Pagsanjan', 'Maharlika_Parian', 'Maharlika_Turbina']
+DISRUPTION_TYPES = ['roadwork', 'incident', 'accident', 'weather', 'event']
+
+
+def _hour_table(rule):
+    """Evaluate a per-hour rule once for hours 0-23 (same scalar math as the dict builder)"""
+    return np.array([rule(hour) for hour in range(24)])
+
+
+# Hour-only features as 24-entry lookup tables
+HOUR_SIN = _hour_table(lambda hour: np.sin(2 * np.pi * hour / 24))
+HOUR_COS = _hour_table(lambda hour: np.cos(2 * np.pi * hour / 24))
+IS_MORNING_RUSH = _hour_table(lambda hour: 6 <= hour <= 9).astype(np.uint8)
+IS_EVENING_RUSH = _hour_table(lambda hour: 16 <= hour <= 19).astype(np.uint8)
+IS_RUSH_HOUR = IS_MORNING_RUSH | IS_EVENING_RUSH
+IS_PEAK_RUSH = _hour_table(lambda hour: hour in [7, 8, 17, 18]).astype(np.uint8)
+IS_SUPER_PEAK = _hour_table(lambda hour: hour in [8, 18]).astype(np.uint8)
+TIME_MORNING = _hour_table(lambda hour: 6 <= hour <= 11).astype(np.uint8)
+TIME_AFTERNOON = _hour_table(lambda hour: 12 <= hour <= 17).astype(np.uint8)
+TIME_NIGHT = 1 - TIME_MORNING - TIME_AFTERNOON
+
+
+class FeaturePlan:
+    """
+    Compiled feature builder for a fixed feature_names order
+
+    Produces the same values as TrafficPredictor.prepare_features, but for
+    whole columns at once and straight into a preallocated NumPy matrix.
+    Built once at model load; features the plan does not know about stay 0
+    (same as the per-row builder).
+    """
+
+    def __init__(self, feature_names):
+        self.feature_names = list(feature_names)
+
+        # Resolve every training column to a builder once
+        self.columns = [
+            (index, name) for index, name in enumerate(self.feature_names)
+            if name in FEATURE_BUILDERS
+        ]
+        self.missing = [name for name in self.feature_names if name not in FEATURE_BUILDERS]
+
+    def build(self, dates, hours, areas, road_corridors, disruption_types,
+              total_volumes=None, has_real_status=None, has_disruption=None):
+        """
+        Build the feature matrix for N rows
+
+        Args:
+            dates: N dates (datetime64, datetime/Timestamp or 'YYYY-MM-DD' strings)
+            hours: N ints (0-23)
+            areas: N area names
+            road_corridors: N corridor names
+            disruption_types: N disruption types (None for no disruption)
+            total_volumes: N floats (default 0)
+            has_real_status: N ints (default 0)
+            has_disruption: N ints (default 0)
+
+        Returns:
+            np.ndarray: C-contiguous float32 matrix (N x len(feature_names))
+        """
+        hours = np.asarray(hours, dtype=np.int64)
+        n = len(hours)
+
+        columns = _base_columns(
+            _to_days(dates),
+            hours,
+            np.asarray(areas, dtype=object),
+            np.asarray(road_corridors, dtype=object),
+            np.asarray(disruption_types, dtype=object),
+            _column(total_volumes, n, np.float64),
+            _column(has_real_status, n, np.int64),
+            _column(has_disruption, n, np.int64),
+        )
+
+        # float32 is what the sklearn trees compare against
+        matrix = np.zeros((n, len(self.feature_names)), dtype=np.float32)
+        for index, name in self.columns:
+            matrix[:, index] = FEATURE_BUILDERS[name](columns)
+
+        return matrix
+
+    def build_from_inputs(self, inputs):
+        """Build the feature matrix from a list of predictor input dicts"""
+        return self.build(
+            dates=[input_data['date'] for input_data in inputs],
+            hours=[input_data['hour'] for input_data in inputs],
+            areas=[input_data.get('area', 'Bucal') for input_data in inputs],
+            road_corridors=[input_data.get('road_corridor', 'Calamba_Pagsanjan') for input_data in inputs],
+            disruption_types=[input_data.get('disruption_type', None) for input_data in inputs],
+            total_volumes=[input_data.get('total_volume', 0) for input_data in inputs],
+            has_real_status=[input_data.get('has_real_status', 0) for input_data in inputs],
+            has_disruption=[input_data.get('has_disruption', 0) for input_data in inputs],
+        )
+
+
+def _column(values, n, dtype):
+    """Input column as an array, zeros when not given"""
+    if values is None:
+        return np.zeros(n, dtype=dtype)
+    return np.asarray(values, dtype=dtype)
+
+
+def _to_days(dates):
+    """Convert dates to a datetime64[D] array"""
+    if isinstance(dates, np.ndarray) and np.issubdtype(dates.dtype, np.datetime64):
+        return dates.astype('datetime64[D]')
+    try:
+        return np.array(dates, dtype='datetime64[D]')
+    except (ValueError, TypeError):
+        # Unusual string formats, let pandas parse them
+        return pd.to_datetime(list(dates)).values.astype('datetime64[D]')
+
+
+_HOLIDAY_DAYS = np.array(HOLIDAYS, dtype='datetime64[D]')
+
+
+def _base_columns(days, hours, areas, road_corridors, disruption_types,
+                  total_volumes, has_real_status, has_disruption):
+    """Raw columns every feature builder reads from"""
+    months = days.astype('datetime64[M]')
+    # 1970-01-01 was a Thursday (dayofweek 3)
+    day_of_week = (days.astype(np.int64) + 3) % 7
+    is_holiday = np.isin(days, _HOLIDAY_DAYS).astype(np.uint8)
+
+    return {
+        'hours': hours,
+        'month': months.astype(np.int64) % 12 + 1,
+        'day_of_month': (days - months.astype('datetime64[D]')).astype(np.int64) + 1,
+        'day_of_week': day_of_week,
+        'is_weekend': (day_of_week >= 5).astype(np.uint8),
+        'is_holiday': is_holiday,
+        'is_workday': ((day_of_week < 5) & (is_holiday == 0)).astype(np.uint8),
+        'is_rush_hour': IS_RUSH_HOUR[hours],
+        'is_morning_rush': IS_MORNING_RUSH[hours],
+        'is_evening_rush': IS_EVENING_RUSH[hours],
+        'is_peak_rush': IS_PEAK_RUSH[hours],
+        'is_super_peak': IS_SUPER_PEAK[hours],
+        'time_morning': TIME_MORNING[hours],
+        'time_afternoon': TIME_AFTERNOON[hours],
+        'time_night': TIME_NIGHT[hours],
+        'total_volume': total_volumes,
+        'has_volume_data': (total_volumes > 0).astype(np.uint8),
+        'has_real_status': has_real_status,
+        'has_disruption': has_disruption,
+        'area': {area: (areas == area).astype(np.uint8) for area in AREAS},
+        'road': {road: (road_corridors == road).astype(np.uint8) for road in ROAD_CORRIDORS},
+        'disruption': {kind: (disruption_types == kind).astype(np.uint8) for kind in DISRUPTION_TYPES},
+    }
+
+
+def _product(*keys):
+    """Interaction feature: product of base columns"""
+    def build(columns):
+        result = _lookup(columns, keys[0])
+        for key in keys[1:]:
+            result = result * _lookup(columns, key)
+        return result
+    return build
+
+
+def _lookup(columns, key):
+    """Resolve 'group:name' keys into the nested one-hot columns"""
+    if ':' in key:
+        group, name = key.split(':', 1)
+        return columns[group][name]
+    return columns[key]
+
+
+def _day_flag(day):
+    return lambda columns: (columns['day_of_week'] == day).astype(np.uint8)
+
+
+# ============================================================
+# FEATURE BUILDERS (name -> column function)
+# Must stay in sync with TrafficPredictor._build_feature_dict
+# ============================================================
+
+FEATURE_BUILDERS = {
+    # Temporal
+    'hour': lambda columns: columns['hours'],
+    'hour_sin': lambda columns: HOUR_SIN[columns['hours']],
+    'hour_cos': lambda columns: HOUR_COS[columns['hours']],
+    'month': lambda columns: columns['month'],
+    'day_of_month': lambda columns: columns['day_of_month'],
+    'day_of_week_num': lambda columns: columns['day_of_week'],
+    'is_weekend': lambda columns: columns['is_weekend'],
+    'is_friday': _day_flag(4),
+    'is_monday': _day_flag(0),
+    'is_tuesday': _day_flag(1),
+    'is_wednesday': _day_flag(2),
+    'is_thursday': _day_flag(3),
+    'is_holiday': lambda columns: columns['is_holiday'],
+    'is_rush_hour': lambda columns: columns['is_rush_hour'],
+    'is_morning_rush': lambda columns: columns['is_morning_rush'],
+    'is_evening_rush': lambda columns: columns['is_evening_rush'],
+    'is_peak_rush': lambda columns: columns['is_peak_rush'],
+    'is_super_peak': lambda columns: columns['is_super_peak'],
+    'is_workday': lambda columns: columns['is_workday'],
+
+    # Traffic
+    'total_volume': lambda columns: columns['total_volume'],
+
+    # Disruption
+    'has_disruption': lambda columns: columns['has_disruption'],
+    'has_roadwork': lambda columns: columns['disruption']['roadwork'],
+    'has_incident': lambda columns: columns['disruption']['incident'],
+    'has_accident': lambda columns: columns['disruption']['accident'],
+    'has_weather': lambda columns: columns['disruption']['weather'],
+    'has_event': lambda columns: columns['disruption']['event'],
+
+    # Data quality
+    'has_real_status': lambda columns: columns['has_real_status'],
+    'has_imputed_status': lambda columns: 1 - columns['has_real_status'],
+    'has_volume_data': lambda columns: columns['has_volume_data'],
+    'data_completeness_score': lambda columns: (
+        columns['has_real_status'] + columns['has_volume_data'] + columns['has_disruption']
+    ),
+
+    # One-hot (road, time segment, area)
+    'road_Calamba_Pagsanjan': lambda columns: columns['road']['Calamba_Pagsanjan'],
+    'road_Maharlika_Parian': lambda columns: columns['road']['Maharlika_Parian'],
+    'road_Maharlika_Turbina': lambda columns: columns['road']['Maharlika_Turbina'],
+    'time_afternoon': lambda columns: columns['time_afternoon'],
+    'time_morning': lambda columns: columns['time_morning'],
+    'time_night': lambda columns: columns['time_night'],
+    'area_Bucal': lambda columns: columns['area']['Bucal'],
+    'area_Parian': lambda columns: columns['area']['Parian'],
+    'area_Turbina': lambda columns: columns['area']['Turbina'],
+
+    # Interactions
+    'rush_hour_with_disruption': _product('is_rush_hour', 'has_disruption'),
+    'weekend_event': _product('is_weekend', 'disruption:event'),
+    'morning_rush_roadwork': _product('is_morning_rush', 'disruption:roadwork'),
+    'evening_rush_roadwork': _product('is_evening_rush', 'disruption:roadwork'),
+    'holiday_disruption': _product('is_holiday', 'has_disruption'),
+    'peak_high_volume': _product('is_peak_rush', 'has_volume_data'),
+    'workday_morning_rush': _product('is_workday', 'is_morning_rush'),
+    'workday_evening_rush': _product('is_workday', 'is_evening_rush'),
+    'road_Maharlika_Parian_rush': _product('road:Maharlika_Parian', 'is_rush_hour'),
+    'road_Maharlika_Turbina_rush': _product('road:Maharlika_Turbina', 'is_rush_hour'),
+    'road_Calamba_Pagsanjan_rush': _product('road:Calamba_Pagsanjan', 'is_rush_hour'),
+    'area_Bucal_morning': _product('area:Bucal', 'is_morning_rush'),
+    'area_Parian_morning': _product('area:Parian', 'is_morning_rush'),
+    'area_Turbina_morning': _product('area:Turbina', 'is_morning_rush'),
+    'area_Bucal_disruption': _product('area:Bucal', 'has_disruption'),
+    'area_Parian_disruption': _product('area:Parian', 'has_disruption'),
+    'area_Turbina_disruption': _product('area:Turbina', 'has_disruption'),
+    'morning_roadwork': _product('time_morning', 'disruption:roadwork'),
+    'morning_accident': _product('time_morning', 'disruption:accident'),
+    'afternoon_event': _product('time_afternoon', 'disruption:event'),
+    'night_incident': _product('time_night', 'disruption:incident'),
+    'friday_rush': lambda columns: _day_flag(4)(columns) * columns['is_rush_hour'],
+    'super_peak_disruption': _product('is_super_peak', 'has_disruption'),
+    'super_peak_roadwork': _product('is_super_peak', 'disruption:roadwork'),
+}
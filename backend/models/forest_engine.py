@@ -0,0 +1,167 @@
+import json
+import os
+
+import numpy as np
+
+_ARRAY_NAMES = ['feature', 'threshold', 'children', 'value', 'roots']
+
+
+def forest_arrays_dir(model_path):
+    """Export folder for a model file (random_forest_model.pkl -> random_forest_arrays/)"""
+    name = os.path.splitext(os.path.basename(model_path))[0].replace('_model', '')
+    return os.path.join(os.path.dirname(os.path.abspath(model_path)), f'{name}_arrays')
+
+
+class ForestArrays:
+    """
+    Random Forest flattened into packed NumPy arrays
+
+    All trees' nodes are concatenated into one node table:
+        feature (int32), threshold (float64), children (int32, N x 2: left/right)
+        value (float64, N x n_classes: normalized leaf class distribution)
+    and roots (int32) holds each tree's first node. Leaves point to
+    themselves as both children, which is how the evaluator spots them.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, classes, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.classes_ = np.asarray(classes)
+        self.max_depth = int(max_depth)
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Export a fitted sklearn RandomForestClassifier"""
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+
+            left = np.where(is_leaf, node_ids, tree.children_left) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + offset
+
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0] = 1.0
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(tree.threshold.astype(np.float64))
+            children.append(np.stack([left, right], axis=1).astype(np.int32))
+            values.append(value / normalizer)
+            roots.append(offset)
+
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children=np.ascontiguousarray(np.concatenate(children)),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.array(roots, dtype=np.int32),
+            classes=model.classes_,
+            max_depth=max_depth,
+        )
+
+    def save(self, directory, **meta):
+        """Write every array as an uncompressed .npy file plus meta.json"""
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, 'meta.json')
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        for name in _ARRAY_NAMES:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+
+        meta = {
+            **meta,
+            'classes': self.classes_.tolist(),
+            'max_depth': self.max_depth,
+            'n_estimators': self.n_estimators,
+            'n_nodes': self.n_nodes,
+        }
+        # Meta is written last - a directory without it is incomplete
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, directory, mmap_mode=None):
+        """
+        Load exported arrays
+
+        Returns:
+            tuple: (ForestArrays, meta dict)
+        """
+        with open(os.path.join(directory, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+
+        arrays = {
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+            for name in _ARRAY_NAMES
+        }
+        return cls(classes=meta['classes'], max_depth=meta['max_depth'], **arrays), meta
+
+    def apply(self, X):
+        """
+        Leaf node reached in every tree, walking all trees level by level
+
+        Each step advances every (row, tree) pair that is not yet at a
+        leaf; pairs drop out of the active set as soon as they reach one.
+
+        Returns:
+            np.ndarray: (n_samples x n_estimators) global node indices
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        flat_X = X.ravel()
+        n_rows, n_trees = len(X), len(self.roots)
+        left, right = self.children[:, 0], self.children[:, 1]
+
+        nodes = np.tile(self.roots, n_rows)
+        row_offsets = np.repeat(np.arange(n_rows, dtype=np.intp) * X.shape[1], n_trees)
+
+        active = np.flatnonzero(left[nodes] != nodes)
+        while len(active):
+            current = nodes[active]
+            go_right = flat_X[row_offsets[active] + self.feature[current]] > self.threshold[current]
+            next_nodes = np.where(go_right, right[current], left[current])
+            nodes[active] = next_nodes
+            active = active[left[next_nodes] != next_nodes]
+
+        return nodes.reshape(n_rows, n_trees)
+
+    def predict_proba(self, X, chunk_size=2_000_000):
+        """
+        Class probabilities, averaged over trees (same as sklearn)
+
+        Rows are processed in chunks so the (rows x trees) node table
+        stays below chunk_size entries.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        proba = np.empty((len(X), self.value.shape[1]), dtype=np.float64)
+        step = max(1, chunk_size // max(1, self.n_estimators))
+
+        for start in range(0, len(X), step):
+            leaves = self.apply(X[start:start + step])
+            proba[start:start + step] = self.value[leaves].mean(axis=1)
+
+        return proba
+
+    def predict(self, X):
+        """Most likely class per row"""
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
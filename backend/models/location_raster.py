@@ -0,0 +1,143 @@
+import json
+import math
+import os
+
+import numpy as np
+
+from .spatial_index import METERS_PER_DEGREE_LAT, METERS_PER_DEGREE_LNG_EQUATOR
+
+# Raster file lives next to calamba_context.json's models folder
+RASTER_FILE = 'location_raster.npz'
+
+# Day types: the multiplier only distinguishes weekday, Friday and weekend
+DAY_TYPES = ['weekday', 'friday', 'weekend']
+DAY_TYPE_DOW = [0, 4, 5]
+
+
+def day_type_of(day_of_week):
+    """0 = weekday (Mon-Thu), 1 = Friday, 2 = weekend"""
+    return 1 if day_of_week == 4 else 2 if day_of_week >= 5 else 0
+
+
+class LocationRaster:
+    """
+    Precomputed location multipliers on a regular lat/lng grid
+
+    Shape (3 day types, 24 hours, rows, cols), stored as uint16 hundredths
+    (multipliers are already rounded to 2 decimals). Each cell holds the
+    multiplier at its center, so a lookup is pure array indexing. Points
+    outside the extent fall back to the LocationIndex.
+    """
+
+    def __init__(self, multipliers, meta, index):
+        self.multipliers = multipliers
+        self.meta = meta
+        self.index = index
+        self.lat_min = meta['lat_min']
+        self.lng_min = meta['lng_min']
+        self.dlat = meta['dlat']
+        self.dlng = meta['dlng']
+        self.n_rows, self.n_cols = multipliers.shape[2:]
+
+    @classmethod
+    def build(cls, index, context_sha256, resolution_m=25):
+        """
+        Score every cell center for all 24 hours x 3 day types
+
+        The extent covers every POI plus its largest impact radius - beyond
+        it only the Calamba-wide peak patterns apply. Returns None for a
+        context without POIs (there is no extent to cover).
+        """
+        if len(index.kind) == 0:
+            return None
+        reach = float(np.maximum(index.radius, index.cascade_radius).max()) + resolution_m
+        m_per_deg_lng = METERS_PER_DEGREE_LNG_EQUATOR * math.cos(math.radians(float(index.lat.mean())))
+        dlat = resolution_m / METERS_PER_DEGREE_LAT
+        dlng = resolution_m / m_per_deg_lng
+
+        lat_min = float(index.lat.min()) - reach / METERS_PER_DEGREE_LAT
+        lng_min = float(index.lng.min()) - reach / m_per_deg_lng
+        n_rows = int(math.ceil((float(index.lat.max()) + reach / METERS_PER_DEGREE_LAT - lat_min) / dlat))
+        n_cols = int(math.ceil((float(index.lng.max()) + reach / m_per_deg_lng - lng_min) / dlng))
+
+        lat_centers = lat_min + (np.arange(n_rows) + 0.5) * dlat
+        lng_centers = lng_min + (np.arange(n_cols) + 0.5) * dlng
+        lats, lngs = [axis.ravel() for axis in np.meshgrid(lat_centers, lng_centers, indexing='ij')]
+
+        multipliers = np.empty((len(DAY_TYPES), 24, n_rows, n_cols), dtype=np.uint16)
+        for day_type, dow in enumerate(DAY_TYPE_DOW):
+            for hour in range(24):
+                values = index.location_multipliers(
+                    lats, lngs, np.full(len(lats), hour), np.full(len(lats), dow)
+                )
+                multipliers[day_type, hour] = np.rint(values * 100).reshape(n_rows, n_cols)
+
+        meta = {
+            'context_sha256': context_sha256,
+            'resolution_m': resolution_m,
+            'lat_min': lat_min,
+            'lng_min': lng_min,
+            'dlat': dlat,
+            'dlng': dlng,
+        }
+        return cls(multipliers, meta, index)
+
+    def save(self, path):
+        """Write a compressed .npz (replaced atomically)"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, multipliers=self.multipliers, meta=np.array(json.dumps(self.meta)))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, index, context_sha256, resolution_m):
+        """
+        Open a saved raster if it matches this context and resolution
+
+        Returns:
+            LocationRaster or None (missing or stale raster)
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                meta = json.loads(str(data['meta']))
+                if meta.get('context_sha256') != context_sha256 or meta.get('resolution_m') != resolution_m:
+                    return None
+                multipliers = data['multipliers']
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠ Location raster could not be loaded: {e}")
+            return None
+        return cls(multipliers, meta, index)
+
+    def lookup(self, lats, lngs, hours, dows):
+        """
+        Multipliers for many rows (same result shape as location_multipliers)
+
+        Returns:
+            np.ndarray: N multipliers (1.0 = no change)
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        hours = np.asarray(hours, dtype=np.int64)
+        dows = np.asarray(dows, dtype=np.int64)
+
+        rows = np.floor((lats - self.lat_min) / self.dlat).astype(np.int64)
+        cols = np.floor((lngs - self.lng_min) / self.dlng).astype(np.int64)
+        day_types = np.where(dows == 4, 1, np.where(dows >= 5, 2, 0))
+        inside = (rows >= 0) & (rows < self.n_rows) & (cols >= 0) & (cols < self.n_cols) & (hours >= 0) & (hours <= 23)
+
+        result = np.empty(len(lats), dtype=np.float64)
+        result[inside] = self.multipliers[day_types[inside], hours[inside], rows[inside], cols[inside]] / 100
+        if not inside.all():
+            outside = ~inside
+            result[outside] = self.index.location_multipliers(lats[outside], lngs[outside], hours[outside], dows[outside])
+        return result
+
+    def lookup_one(self, lat, lng, hour, day_of_week):
+        """Scalar lookup (plain Python indexing, no array setup)"""
+        row = math.floor((lat - self.lat_min) / self.dlat)
+        col = math.floor((lng - self.lng_min) / self.dlng)
+        if 0 <= row < self.n_rows and 0 <= col < self.n_cols and 0 <= hour <= 23:
+            return int(self.multipliers[day_type_of(day_of_week), hour, row, col]) / 100
+        return self.index.location_multiplier(lat, lng, hour, day_of_week, day_of_week == 4)
@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU cache with hit/miss/eviction counters
+
+    Keys must be hashable (normalized input tuples). Values are stored as
+    given - callers copy mutable results on the way in and out.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the cached value (and mark it recently used) or default"""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all entries (counters are kept)"""
+        with self._lock:
+            self._data.clear()
+
+    def reset_after_fork(self):
+        """New lock in a forked child (the parent's may have been held at fork time)"""
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Counters for the health endpoint"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from .feature_plan import AREAS, ROAD_CORRIDORS, DISRUPTION_TYPES
+
+# Cube files live next to random_forest_model.pkl
+CUBE_SEVERITY_FILE = 'prediction_cube_severity.npy'
+CUBE_PROBABILITIES_FILE = 'prediction_cube_probabilities.npy'
+CUBE_META_FILE = 'prediction_cube_meta.json'
+
+# Only the model's hours are stored, nighttime is answered by rules
+CUBE_HOURS = list(range(6, 22))
+CUBE_DISRUPTIONS = [None] + DISRUPTION_TYPES
+CUBE_REAL_STATUS = [0, 1]
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PredictionCube:
+    """
+    Precomputed model output for every volume-free input combination
+
+    Axes: (day, hour 6-21, area, road corridor, disruption type, has_real_status).
+    Stores the raw model class (uint8) and class probabilities (float64, so
+    results match the live model exactly), memory-mapped from .npy files,
+    so a lookup is pure array indexing.
+    Business rules are still applied by TrafficPredictor on top.
+    """
+
+    def __init__(self, severity, probabilities, meta):
+        self.severity = severity
+        self.probabilities = probabilities
+        self.meta = meta
+        self.start_day = np.datetime64(meta['start_date'], 'D')
+        self.n_days = severity.shape[0]
+
+        self._area_index = {area: i for i, area in enumerate(AREAS)}
+        self._road_index = {road: i for i, road in enumerate(ROAD_CORRIDORS)}
+        self._disruption_index = {kind: i for i, kind in enumerate(CUBE_DISRUPTIONS)}
+
+    @classmethod
+    def load(cls, models_dir, model_path, feature_names):
+        """
+        Open the cube if it exists and was built for this exact model
+
+        Returns:
+            PredictionCube or None (missing or stale cube)
+        """
+        meta_path = os.path.join(models_dir, CUBE_META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+
+            if meta.get('model_sha256') != file_sha256(model_path):
+                print("⚠ Prediction cube is stale (model file changed) - ignoring it, rebuild with scripts/build_prediction_cube.py")
+                return None
+            if meta.get('feature_names') != list(feature_names):
+                print("⚠ Prediction cube was built for different features - ignoring it")
+                return None
+
+            severity = np.load(os.path.join(models_dir, CUBE_SEVERITY_FILE), mmap_mode='r')
+            probabilities = np.load(os.path.join(models_dir, CUBE_PROBABILITIES_FILE), mmap_mode='r')
+        except (OSError, ValueError) as e:
+            print(f"⚠ Prediction cube could not be loaded: {e}")
+            return None
+
+        cube = cls(severity, probabilities, meta)
+        print(f"✓ Prediction cube loaded ({meta['start_date']} to {meta['end_date']}, {cube.n_days} days)")
+        return cube
+
+    def lookup(self, inputs):
+        """
+        Look up model output for a list of predictor input dicts
+
+        Returns:
+            tuple: (covered mask, severity, probabilities) - severity and
+            probabilities only contain the covered rows, in input order
+        """
+        n = len(inputs)
+        covered = np.zeros(n, dtype=bool)
+        index = np.zeros((n, 6), dtype=np.int64)
+
+        for row, input_data in enumerate(inputs):
+            key = self._index(input_data)
+            if key is not None:
+                covered[row] = True
+                index[row] = key
+
+        index = index[covered]
+        cells = tuple(index.T)
+        return covered, np.asarray(self.severity[cells]), np.asarray(self.probabilities[cells])
+
+    def _index(self, input_data):
+        """Cube coordinates for one input, or None if it falls outside the cube"""
+        if input_data.get('total_volume', 0):
+            return None
+
+        hour = input_data.get('hour')
+        if hour not in CUBE_HOURS:
+            return None
+
+        disruption_type = input_data.get('disruption_type')
+        has_disruption = input_data.get('has_disruption', 0)
+        # The cube assumes has_disruption follows disruption_type
+        if disruption_type not in self._disruption_index or has_disruption != (0 if disruption_type is None else 1):
+            return None
+
+        area = self._area_index.get(input_data.get('area', 'Bucal'))
+        road = self._road_index.get(input_data.get('road_corridor', 'Calamba_Pagsanjan'))
+        real_status = input_data.get('has_real_status', 0)
+        if area is None or road is None or real_status not in CUBE_REAL_STATUS:
+            return None
+
+        try:
+            day = int((np.datetime64(input_data['date'], 'D') - self.start_day).astype(np.int64))
+        except (ValueError, TypeError):
+            return None
+        if not 0 <= day < self.n_days:
+            return None
+
+        return (day, hour - CUBE_HOURS[0], area, road, self._disruption_index[disruption_type], real_status)
+
+
+def build_prediction_cube(predictor, start_date, end_date, models_dir=None):
+    """
+    Run the model once for every cube cell and save the cube files
+
+    Args:
+        predictor (TrafficPredictor): Loaded predictor (model + feature plan)
+        start_date, end_date (str): Inclusive date range 'YYYY-MM-DD'
+        models_dir (str): Output folder (default: next to the model file)
+
+    Returns:
+        dict: Cube metadata
+    """
+    from numpy.lib.format import open_memmap
+
+    models_dir = models_dir or os.path.dirname(os.path.abspath(predictor.model_path))
+    days = np.arange(np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D') + 1)
+    if len(days) == 0:
+        raise ValueError('end_date must not be before start_date')
+
+    # Drop the old metadata first, so a half-written cube is never loaded
+    meta_path = os.path.join(models_dir, CUBE_META_FILE)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    shape = (len(days), len(CUBE_HOURS), len(AREAS), len(ROAD_CORRIDORS),
+             len(CUBE_DISRUPTIONS), len(CUBE_REAL_STATUS))
+
+    severity = open_memmap(os.path.join(models_dir, CUBE_SEVERITY_FILE), mode='w+', dtype=np.uint8, shape=shape)
+    probabilities = open_memmap(os.path.join(models_dir, CUBE_PROBABILITIES_FILE), mode='w+',
+                                dtype=np.float64, shape=shape + (3,))
+
+    # All non-date combinations for one day, in C order of the cube axes
+    grid = np.meshgrid(
+        np.array(CUBE_HOURS),
+        np.arange(len(AREAS)),
+        np.arange(len(ROAD_CORRIDORS)),
+        np.arange(len(CUBE_DISRUPTIONS)),
+        np.array(CUBE_REAL_STATUS),
+        indexing='ij'
+    )
+    hours, area_index, road_index, disruption_index, real_status = [axis.ravel() for axis in grid]
+    disruption_types = np.array(CUBE_DISRUPTIONS, dtype=object)[disruption_index]
+
+    for day_number, day in enumerate(days):
+        feature_matrix = predictor.feature_plan.build(
+            dates=np.full(len(hours), day),
+            hours=hours,
+            areas=np.array(AREAS, dtype=object)[area_index],
+            road_corridors=np.array(ROAD_CORRIDORS, dtype=object)[road_index],
+            disruption_types=disruption_types,
+            has_real_status=real_status,
+            has_disruption=(disruption_index > 0).astype(np.int64),
+        )
+        day_probabilities = predictor._predict_proba(feature_matrix)
+        day_severity = predictor.classes_.take(np.argmax(day_probabilities, axis=1))
+
+        severity[day_number] = day_severity.reshape(shape[1:])
+        probabilities[day_number] = day_probabilities[:, :3].reshape(shape[1:] + (3,))
+
+        if (day_number + 1) % 30 == 0:
+            print(f"   {day_number + 1}/{len(days)} days done")
+
+    severity.flush()
+    probabilities.flush()
+    del severity, probabilities
+
+    meta = {
+        'start_date': str(days[0]),
+        'end_date': str(days[-1]),
+        'shape': list(shape),
+        'model_sha256': file_sha256(predictor.model_path),
+        'feature_names': list(predictor.feature_names),
+        'built_at': datetime.now().isoformat()
+    }
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    return meta
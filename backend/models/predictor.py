@@ -4,6 +4,34 @@ import numpy as np
 import os
 from datetime import datetime
 import json
+import threading
+import time
+
+from .feature_plan import FeaturePlan, HOLIDAYS
+from .prediction_cube import PredictionCube, file_sha256
+from .forest_engine import ForestArrays, forest_arrays_dir
+from .lru_cache import LRUCache
+from .spatial_index import LocationIndex
+from .location_raster import LocationRaster, RASTER_FILE
+
+
+class LocationContext:
+    """
+    calamba_context.json with its spatial index and raster, built together
+    
+    Never changed after construction: a reload builds a new one and swaps
+    the predictor's reference, so readers see the old or the new context
+    and never a mix of the two.
+    """
+    
+    __slots__ = ('data', 'index', 'raster', 'mtime')
+    
+    def __init__(self, data=None, index=None, raster=None, mtime=None):
+        self.data = data
+        self.index = index
+        self.raster = raster
+        self.mtime = mtime
+
 
 class TrafficPredictor:
     """
@@ -13,33 +41,288 @@ class TrafficPredictor:
         road_data: List or DataFrame containing road segments.
         Expected keys: 'road_id', 'start_node_id', 'end_node_id', 'length_meters'
      """
-    def __init__(self):
-        """Load the trained model and feature names"""
-        current_dir = os.path.dirname(os.path.abspath(__file__))
+    def __init__(self, cache_size=None):
+        """
+        Load the trained model and feature names
         
-        model_path = os.path.join(current_dir, 'random_forest_model.pkl')
-        self.model = joblib.load(model_path)
+        Args:
+            cache_size (int): Max entries per memoized method (predict,
+                estimate_delay, get_location_multiplier). 0 disables the
+                cache. Default: PREDICTION_CACHE_SIZE env var (0 = off).
+        """
+        self.models_dir = os.path.dirname(os.path.abspath(__file__))
+        
+        if cache_size is None:
+            cache_size = int(os.getenv('PREDICTION_CACHE_SIZE', '0'))
+        self.caches = {}
+        if cache_size > 0:
+            self.caches = {
+                'predict': LRUCache(cache_size),
+                'estimate_delay': LRUCache(cache_size),
+                'get_location_multiplier': LRUCache(cache_size),
+            }
         
-        features_path = os.path.join(current_dir, 'feature_names.pkl')
-        self.feature_names = joblib.load(features_path)
+        # Seconds between checks of calamba_context.json's mtime
+        self.context_check_s = float(os.getenv('CONTEXT_CHECK_S', '5'))
+        self._context = LocationContext()
+        self._context_lock = threading.Lock()
+        self._context_checked_at = time.monotonic()
+        self._context_reloading = False
+        
+        self.load_model()
+        self.load_context()
+    
+    def load_model(self):
+        """
+        (Re)load the model, feature names and prediction cube
+        
+        MODEL_LOADING=mmap opens the exported tree arrays (see
+        scripts/export_forest_arrays.py) with mmap_mode='r' instead of
+        unpickling the forest, so all server workers share one page-cache
+        copy. Falls back to joblib when the export is missing or stale.
+        """
+        current_dir = self.models_dir
+        started = time.perf_counter()
         
         info_path = os.path.join(current_dir, 'model_info.pkl')
         self.model_info = joblib.load(info_path)
-
-        # Load Calamba context data for location-aware predictions
-        context_path = os.path.join(current_dir, 'data', 'calamba_context.json')
-        if os.path.exists(context_path):
-            with open(context_path, 'r') as f:
-                self.calamba_context = json.load(f)
-            print(f"✓ Calamba context loaded ({len(self.calamba_context.get('schools', []))} schools, {len(self.calamba_context.get('bottlenecks', []))} bottlenecks)")
-        else:
-            self.calamba_context = None
-            print(f"⚠ Calamba context not found at {context_path}")
         
-        print(f"✓ Model loaded successfully")
-        print(f"  Accuracy: {self.model_info['accuracy']*100:.2f}%")
+        # Full or compact forest, depending on MODEL_LATENCY_BUDGET_MS
+        self.model_variant = self._choose_model_variant()
+        model_file = 'random_forest_model_compact.pkl' if self.model_variant == 'compact' else 'random_forest_model.pkl'
+        model_path = os.path.join(current_dir, model_file)
+        self.model_path = model_path
+        
+        # Identifies the model file for result caches (variant, size, mtime)
+        model_stat = os.stat(model_path)
+        self.model_version = f"{self.model_variant}-{model_stat.st_size}-{int(model_stat.st_mtime)}"
+        self.loading_mode = os.getenv('MODEL_LOADING', 'joblib').lower()
+        
+        # Prediction engine: 'sklearn' (default) or 'numpy' (packed tree arrays)
+        self.engine = os.getenv('PREDICTION_ENGINE', 'sklearn').lower()
+        # The NumPy walker wins on small batches; sklearn's parallel tree loop
+        # wins on large ones (see scripts/check_forest_engine.py)
+        self.numpy_max_rows = int(os.getenv('NUMPY_ENGINE_MAX_ROWS', '256'))
+        self.model = None
+        self.forest = None
+        
+        if self.loading_mode == 'mmap':
+            self.forest = self._load_exported_forest(mmap_mode='r')
+            if self.forest is None:
+                print("⚠ Shared model arrays unavailable - run scripts/export_forest_arrays.py. Loading with joblib instead")
+                self.loading_mode = 'joblib'
+        
+        if self.forest is None:
+            self.model = joblib.load(model_path)
+            if self.engine == 'numpy':
+                self.forest = self._load_exported_forest()
+                if self.forest is None:
+                    self.forest = ForestArrays.from_sklearn(self.model)
+                    print(f"✓ NumPy forest engine ready ({self.forest.n_estimators} trees, {self.forest.n_nodes:,} nodes)")
+        
+        if self.forest is not None:
+            self.engine = 'numpy'
+        self.classes_ = self.forest.classes_ if self.forest is not None else self.model.classes_
+        
+        features_path = os.path.join(current_dir, 'feature_names.pkl')
+        self.feature_names = joblib.load(features_path)
+        
+        # Compile the vectorized feature builder once for this column order
+        self.feature_plan = FeaturePlan(self.feature_names)
+        if self.feature_plan.missing:
+            print(f"⚠ Features without a builder (always 0): {', '.join(self.feature_plan.missing)}")
+        
+        # Optional precomputed predictions (see scripts/build_prediction_cube.py)
+        self.prediction_cube = None
+        if os.getenv('USE_PREDICTION_CUBE', 'true').lower() == 'true':
+            self.prediction_cube = PredictionCube.load(current_dir, model_path, self.feature_names)
+        
+        # Cached results belong to the previous model
+        self.clear_caches()
+        
+        self.load_time_s = time.perf_counter() - started
+        
+        accuracy = self.model_info['compact']['accuracy'] if self.model_variant == 'compact' else self.model_info['accuracy']
+        
+        print(f"✓ Model loaded successfully ({self.model_variant} model, {self.loading_mode}, {self.engine} engine, {self.load_time_s:.2f}s)")
+        print(f"  Accuracy: {accuracy*100:.2f}%")
         print(f"  Features: {len(self.feature_names)}")
     
+    @property
+    def calamba_context(self):
+        return self._context.data
+    
+    @property
+    def location_index(self):
+        return self._context.index
+    
+    @property
+    def location_raster(self):
+        return self._context.raster
+    
+    def _context_path(self):
+        return os.path.join(self.models_dir, 'data', 'calamba_context.json')
+    
+    def load_context(self):
+        """(Re)load Calamba context data for location-aware predictions"""
+        context = self._build_context(self._context_path())
+        # Single reference swap: concurrent callers keep the context they read
+        self._context = context
+        
+        # Cached multipliers were computed from the previous context
+        self.clear_caches()
+        return context
+    
+    def _build_context(self, context_path):
+        """New LocationContext from the context file (nothing shared is touched)"""
+        if not os.path.exists(context_path):
+            print(f"⚠ Calamba context not found at {context_path}")
+            return LocationContext()
+        
+        mtime = os.path.getmtime(context_path)
+        with open(context_path, 'r') as f:
+            data = json.load(f)
+        index = LocationIndex(data)
+        print(f"✓ Calamba context loaded ({len(data.get('schools', []))} schools, {len(data.get('bottlenecks', []))} bottlenecks)")
+        
+        raster = None
+        if os.getenv('USE_LOCATION_RASTER', 'true').lower() == 'true':
+            raster = self._load_location_raster(context_path, index)
+        return LocationContext(data, index, raster, mtime)
+    
+    def _load_location_raster(self, context_path, location_index):
+        """
+        Open the location multiplier raster, rebuilding it when the context
+        file or LOCATION_RASTER_RESOLUTION_M changed
+        """
+        resolution_m = float(os.getenv('LOCATION_RASTER_RESOLUTION_M', '25'))
+        raster_path = os.path.join(self.models_dir, RASTER_FILE)
+        context_sha256 = file_sha256(context_path)
+        
+        raster = LocationRaster.load(raster_path, location_index, context_sha256, resolution_m)
+        if raster is not None:
+            print(f"✓ Location raster loaded ({raster.n_rows}x{raster.n_cols} cells, {resolution_m:g} m)")
+            return raster
+        
+        started = time.perf_counter()
+        raster = LocationRaster.build(location_index, context_sha256, resolution_m)
+        if raster is None:
+            print("⚠ Location raster skipped (context has no POIs)")
+            return None
+        try:
+            raster.save(raster_path)
+        except OSError as e:
+            print(f"⚠ Location raster could not be saved: {e}")
+        print(f"✓ Location raster built ({raster.n_rows}x{raster.n_cols} cells, {resolution_m:g} m, {time.perf_counter() - started:.1f}s)")
+        return raster
+    
+    def _reload_context_if_changed(self):
+        """
+        Pick up edits to calamba_context.json without a restart
+        
+        The mtime is checked at most every context_check_s seconds. A
+        changed file is rebuilt on a background thread (one at a time);
+        callers keep using the current context until the new one is swapped in.
+        """
+        now = time.monotonic()
+        if now - self._context_checked_at < self.context_check_s:
+            return
+        with self._context_lock:
+            if self._context_reloading or now - self._context_checked_at < self.context_check_s:
+                return
+            self._context_checked_at = now
+            try:
+                mtime = os.path.getmtime(self._context_path())
+            except OSError:
+                mtime = None
+            if mtime == self._context.mtime:
+                return
+            self._context_reloading = True
+        threading.Thread(target=self._reload_context, name='context-reload', daemon=True).start()
+    
+    def _reload_context(self):
+        try:
+            self.load_context()
+        except Exception as e:
+            print(f"⚠ Calamba context reload failed: {e}")
+        finally:
+            with self._context_lock:
+                self._context_reloading = False
+    
+    def _choose_model_variant(self):
+        """
+        'full' or 'compact' model for the MODEL_LATENCY_BUDGET_MS setting
+        
+        The budget is compared with the 720-row (30-day simulation) latency
+        measured by the training script and stored in model_info.pkl.
+        """
+        budget = os.getenv('MODEL_LATENCY_BUDGET_MS')
+        if not budget:
+            return 'full'
+        
+        budget_ms = float(budget)
+        full_ms = self.model_info.get('latency_ms', {}).get('rows_720')
+        compact = self.model_info.get('compact')
+        
+        if full_ms is None or full_ms <= budget_ms:
+            return 'full'
+        
+        if not compact or not os.path.exists(os.path.join(self.models_dir, 'random_forest_model_compact.pkl')):
+            print(f"⚠ Full model needs {full_ms:.1f} ms per 720 rows (budget {budget_ms:.0f} ms) but no compact model is available")
+            return 'full'
+        
+        compact_ms = compact['latency_ms']['rows_720']
+        if compact_ms > budget_ms:
+            print(f"⚠ Compact model also exceeds the latency budget ({compact_ms:.1f} ms > {budget_ms:.0f} ms), using it as the fastest option")
+        print(f"✓ Latency budget {budget_ms:.0f} ms: using compact model "
+              f"({compact_ms:.1f} ms vs {full_ms:.1f} ms, accuracy {compact['accuracy_diff']*100:+.2f}%)")
+        return 'compact'
+    
+    def _load_exported_forest(self, mmap_mode=None):
+        """Exported tree arrays for this model file, or None if missing/stale"""
+        arrays_dir = forest_arrays_dir(self.model_path)
+        if not os.path.exists(os.path.join(arrays_dir, 'meta.json')):
+            return None
+        
+        forest, meta = ForestArrays.load(arrays_dir, mmap_mode=mmap_mode)
+        if meta.get('model_sha256') != file_sha256(self.model_path):
+            print("⚠ Exported forest arrays are stale (model file changed) - ignoring them")
+            return None
+        
+        print(f"✓ NumPy forest engine loaded ({forest.n_estimators} trees, {forest.n_nodes:,} nodes"
+              f"{', memory-mapped' if mmap_mode else ''})")
+        return forest
+    
+    def load_stats(self):
+        """How the model was loaded, for the health endpoint"""
+        return {
+            'model_variant': self.model_variant,
+            'model_version': self.model_version,
+            'loading_mode': self.loading_mode,
+            'engine': self.engine,
+            'numpy_max_rows': self.numpy_max_rows if self.forest is not None and self.model is not None else None,
+            'load_time_s': round(self.load_time_s, 3),
+            'pid': os.getpid()
+        }
+    
+    def clear_caches(self):
+        """Drop all memoized results"""
+        for cache in self.caches.values():
+            cache.clear()
+    
+    def cache_stats(self):
+        """Hit/miss/eviction counters per memoized method (None when disabled)"""
+        if not self.caches:
+            return None
+        return {name: cache.stats() for name, cache in self.caches.items()}
+    
+    def reset_after_fork(self):
+        """Make the memoization caches and context reload safe to use in a forked worker process"""
+        for cache in self.caches.values():
+            cache.reset_after_fork()
+        self._context_lock = threading.Lock()
+        self._context_reloading = False
+    
     def prepare_features(self, input_data):
         """
         Prepare input data to match training features (INCLUDING INTERACTIONS!)
@@ -58,6 +341,81 @@ class TrafficPredictor:
         Returns:
             pd.DataFrame: Features ready for prediction
         """
+        features = self._build_feature_dict(input_data)
+        
+        # ============================================================
+        # CREATE DATAFRAME WITH CORRECT COLUMN ORDER
+        # ============================================================
+        
+        df = pd.DataFrame([features])
+        
+        # Ensure all training features are present
+        for feature in self.feature_names:
+            if feature not in df.columns:
+                df[feature] = 0
+        
+        # Reorder columns to match training
+        df = df[self.feature_names]
+        
+        return df
+    
+    def prepare_features_batch(self, inputs):
+        """
+        Prepare many inputs at once (same features as prepare_features)
+        
+        Args:
+            inputs (list): List of input dicts (see prepare_features)
+        
+        Returns:
+            pd.DataFrame: One row per input, columns in training order
+        """
+        return pd.DataFrame(self.feature_plan.build_from_inputs(inputs), columns=self.feature_names)
+    
+    def _predict_proba(self, feature_matrix):
+        """
+        Class probabilities for a feature matrix built by the feature plan
+        
+        With the numpy engine, batches above numpy_max_rows still go to
+        sklearn when the pickled model is loaded (not in mmap mode).
+        """
+        if self.forest is not None and (self.model is None or len(feature_matrix) <= self.numpy_max_rows):
+            return self.forest.predict_proba(feature_matrix)
+        if hasattr(self.model, 'feature_names_in_'):
+            # Model was fitted on a DataFrame, keep the column names to avoid warnings
+            feature_matrix = pd.DataFrame(feature_matrix, columns=self.feature_names, copy=False)
+        return self.model.predict_proba(feature_matrix)
+    
+    def _model_predict(self, inputs):
+        """
+        Raw model class and probabilities for daytime inputs
+        
+        Answered from the prediction cube when an input falls inside it,
+        otherwise from the Random Forest.
+        
+        Returns:
+            tuple: (classes array, probabilities array N x 3)
+        """
+        n = len(inputs)
+        predictions = np.zeros(n, dtype=np.int64)
+        probabilities = np.zeros((n, 3), dtype=np.float64)
+        
+        covered = np.zeros(n, dtype=bool)
+        if self.prediction_cube is not None:
+            covered, cube_predictions, cube_probabilities = self.prediction_cube.lookup(inputs)
+            predictions[covered] = cube_predictions
+            probabilities[covered] = cube_probabilities
+        
+        if not covered.all():
+            model_index = np.flatnonzero(~covered)
+            feature_matrix = self.feature_plan.build_from_inputs([inputs[i] for i in model_index])
+            model_probabilities = self._predict_proba(feature_matrix)
+            predictions[model_index] = self.classes_.take(np.argmax(model_probabilities, axis=1))
+            probabilities[model_index] = model_probabilities[:, :3]
+        
+        return predictions, probabilities
+    
+    def _build_feature_dict(self, input_data):
+        """Build the raw feature dict for one input (see prepare_features)"""
         
         # Convert date
         if isinstance(input_data['date'], str):
@@ -89,13 +447,7 @@ class TrafficPredictor:
         features['is_thursday'] = 1 if date.dayofweek == 3 else 0
         
         # Holidays
-        holidays = [
-            '2024-01-01', '2024-04-09', '2024-05-01', '2024-06-12', 
-            '2024-08-26', '2024-11-01', '2024-11-30', '2024-12-25', '2024-12-30',
-            '2025-01-01', '2025-04-18', '2025-05-01', '2025-06-12',
-            '2025-08-25', '2025-11-01', '2025-11-30', '2025-12-25', '2025-12-30'
-        ]
-        features['is_holiday'] = 1 if date.strftime('%Y-%m-%d') in holidays else 0
+        features['is_holiday'] = 1 if date.strftime('%Y-%m-%d') in HOLIDAYS else 0
         
         # ✅ Rush hour features (EXPANDED)
         features['is_rush_hour'] = 1 if (6 <= hour <= 9) or (16 <= hour <= 19) else 0
@@ -227,21 +579,7 @@ class TrafficPredictor:
         features['super_peak_disruption'] = features['is_super_peak'] * features['has_disruption']
         features['super_peak_roadwork'] = features['is_super_peak'] * features['has_roadwork']
         
-        # ============================================================
-        # CREATE DATAFRAME WITH CORRECT COLUMN ORDER
-        # ============================================================
-        
-        df = pd.DataFrame([features])
-        
-        # Ensure all training features are present
-        for feature in self.feature_names:
-            if feature not in df.columns:
-                df[feature] = 0
-        
-        # Reorder columns to match training
-        df = df[self.feature_names]
-        
-        return df
+        return features
     
     def predict(self, input_data):
         """
@@ -249,6 +587,35 @@ class TrafficPredictor:
         
         IMPORTANT: Training data only has hours 6-21, so we apply rules for 22-5
         """
+        cache = self.caches.get('predict')
+        if cache is None:
+            return self._predict(input_data)
+        
+        key = self._predict_key(input_data)
+        result = cache.get(key)
+        if result is None:
+            result = self._predict(input_data)
+            cache.put(key, result)
+        return {**result, 'probabilities': dict(result['probabilities'])}
+    
+    def _predict_key(self, input_data):
+        """Normalized cache key for predict() inputs"""
+        date = input_data['date']
+        if not isinstance(date, str) or len(date) != 10:
+            date = pd.to_datetime(date).strftime('%Y-%m-%d')
+        return (
+            date,
+            int(input_data.get('hour')),
+            input_data.get('area', 'Bucal'),
+            input_data.get('road_corridor', 'Calamba_Pagsanjan'),
+            int(input_data.get('has_disruption', 0)),
+            input_data.get('disruption_type'),
+            float(input_data.get('total_volume', 0) or 0),
+            int(input_data.get('has_real_status', 0)),
+        )
+    
+    def _predict(self, input_data):
+        """Uncached predict()"""
         hour = input_data.get('hour')
         has_disruption = input_data.get('has_disruption', 0)
         disruption_type = input_data.get('disruption_type')
@@ -336,10 +703,9 @@ class TrafficPredictor:
         # ============================================================
         # NORMAL PREDICTION FOR HOURS 6-21 (IN TRAINING DATA)
         # ============================================================
-        features_df = self.prepare_features(input_data)
-        
-        prediction = self.model.predict(features_df)[0]
-        probabilities = self.model.predict_proba(features_df)[0]
+        predictions, probabilities = self._model_predict([input_data])
+        prediction = int(predictions[0])
+        probabilities = probabilities[0]
         
         # ✅ Apply business rules for edge cases
         original_prediction = prediction
@@ -378,8 +744,147 @@ class TrafficPredictor:
             }
         }
     
+    def predict_batch(self, inputs):
+        """
+        Make predictions for many inputs in one model call
+        
+        Same rules and output as calling predict() on each input, but the
+        feature matrix is built once, predict_proba runs once, and the
+        nighttime / override rules are applied as array masks.
+        
+        Args:
+            inputs (list): List of input dicts (see prepare_features)
+        
+        Returns:
+            list: One result dict per input, in the same order
+        """
+        n = len(inputs)
+        if n == 0:
+            return []
+        
+        hours = np.array([input_data.get('hour') for input_data in inputs], dtype=np.int64)
+        has_disruption = np.array([input_data.get('has_disruption', 0) for input_data in inputs])
+        disruption_types = np.array([input_data.get('disruption_type') for input_data in inputs], dtype=object)
+        dates = pd.to_datetime(pd.Series([input_data['date'] for input_data in inputs]))
+        is_weekend = dates.dt.dayofweek.to_numpy() >= 5
+        
+        predictions = np.zeros(n, dtype=np.int64)
+        probabilities = np.zeros((n, 3), dtype=np.float64)
+        confidences = np.zeros(n, dtype=np.float64)
+        
+        no_disruption = has_disruption == 0
+        is_roadwork = disruption_types == 'roadwork'
+        is_accident = disruption_types == 'accident'
+        is_event = disruption_types == 'event'
+        
+        # ============================================================
+        # HANDLE NIGHTTIME (22:00-05:00) - NOT IN TRAINING DATA
+        # ============================================================
+        night = (hours >= 22) | (hours <= 5)
+        
+        if night.any():
+            # Same decision table as predict(), first matching rule wins
+            conditions = [
+                no_disruption,
+                is_roadwork & (hours <= 3),
+                is_roadwork,
+                is_accident & (hours <= 2),
+                is_accident,
+                is_event & ((hours >= 22) | (hours <= 1)),
+                is_event,
+            ]
+            night_prediction = np.select(conditions, [0, 0, 0, 0, 1, 1, 0], default=0)
+            night_confidence = np.select(conditions, [0.90, 0.80, 0.75, 0.75, 0.70, 0.70, 0.80], default=0.80)
+            
+            # Synthetic probabilities (only Light and Moderate occur at night)
+            night_probabilities = np.where(
+                (night_prediction == 0)[:, None],
+                np.stack([night_confidence, 1 - night_confidence, np.zeros(n)], axis=1),
+                np.stack([np.full(n, 0.15), night_confidence, 1 - night_confidence - 0.15], axis=1)
+            )
+            
+            predictions[night] = night_prediction[night]
+            confidences[night] = night_confidence[night]
+            probabilities[night] = night_probabilities[night]
+            print(f"⚠️  {int(night.sum())} nighttime hour(s) handled with domain knowledge rules")
+        
+        # ============================================================
+        # NORMAL PREDICTION FOR HOURS 6-21 (IN TRAINING DATA)
+        # ============================================================
+        day = ~night
+        
+        if day.any():
+            day_index = np.flatnonzero(day)
+            day_prediction, day_probabilities = self._model_predict([inputs[i] for i in day_index])
+            original_prediction = day_prediction.copy()
+            
+            day_hours = hours[day_index]
+            day_no_disruption = no_disruption[day_index]
+            day_weekend = is_weekend[day_index]
+            light_probability = day_probabilities[:, 0]
+            
+            # RULE 1: Off-peak weekday (10-11 AM, 2-3 PM) with no disruption
+            rule_1 = (day_no_disruption & ~day_weekend & np.isin(day_hours, [10, 11, 14, 15])
+                      & (light_probability > 0.35))
+            day_prediction[rule_1] = 0
+            
+            # RULE 2: Weekend mid-day with no disruption
+            rule_2 = (day_weekend & day_no_disruption & (day_hours >= 10) & (day_hours <= 15)
+                      & (light_probability > 0.30))
+            day_prediction[rule_2] = 0
+            
+            # RULE 3: Rush hour with major disruption should be at least Moderate
+            rule_3 = ((has_disruption[day_index] == 1) & (is_roadwork | is_accident)[day_index]
+                      & np.isin(day_hours, [7, 8, 17, 18]) & (day_prediction == 0))
+            day_prediction[rule_3] = 1
+            
+            adjusted = int((original_prediction != day_prediction).sum())
+            if adjusted:
+                print(f"   🔄 {adjusted} prediction(s) adjusted by business rules")
+            
+            predictions[day_index] = day_prediction
+            probabilities[day_index] = day_probabilities
+            confidences[day_index] = day_probabilities[np.arange(len(day_index)), day_prediction]
+        
+        severity_labels = {0: 'Light', 1: 'Moderate', 2: 'Heavy'}
+        
+        return [
+            {
+                'severity': int(prediction),
+                'severity_label': severity_labels[prediction],
+                'confidence': float(confidence),
+                'probabilities': {
+                    'Light': float(row[0]),
+                    'Moderate': float(row[1]),
+                    'Heavy': float(row[2])
+                }
+            }
+            for prediction, confidence, row in zip(predictions.tolist(), confidences.tolist(), probabilities.tolist())
+        ]
+    
     def estimate_delay(self, severity, base_travel_time_minutes, road_length_km, 
-                   impact_factor=0.6, realtime_speed_factor=None):
+                   impact_factor=0.6, realtime_speed_factor=None, location_multiplier=1.0):
+        """
+        Calculate delay using the BPR function (see _estimate_delay)
+        """
+        cache = self.caches.get('estimate_delay')
+        if cache is None:
+            return self._estimate_delay(severity, base_travel_time_minutes, road_length_km,
+                                        impact_factor, realtime_speed_factor, location_multiplier)
+        
+        key = (
+            type(severity).__name__, severity, base_travel_time_minutes, road_length_km,
+            impact_factor, realtime_speed_factor, location_multiplier
+        )
+        result = cache.get(key)
+        if result is None:
+            result = self._estimate_delay(severity, base_travel_time_minutes, road_length_km,
+                                          impact_factor, realtime_speed_factor, location_multiplier)
+            cache.put(key, result)
+        return dict(result)
+    
+    def _estimate_delay(self, severity, base_travel_time_minutes, road_length_km,
+                        impact_factor=0.6, realtime_speed_factor=None, location_multiplier=1.0):
         """
         Calculate delay using BPR (Bureau of Public Roads) function
         
@@ -423,7 +928,6 @@ class TrafficPredictor:
         v_c_ratio = v_c_ratio * (1 + impact_factor * 0.5)
         
         # Apply location-based multiplier if coordinates provided
-        location_multiplier = getattr(self, '_current_location_multiplier', 1.0)
         v_c_ratio = v_c_ratio * location_multiplier
         
         # BPR function parameters
@@ -481,9 +985,165 @@ class TrafficPredictor:
             'realtime_adjusted': realtime_speed_factor is not None,
         }
     
+    def estimate_delay_many(self, severities, base_travel_time_minutes, road_length_km,
+                            impact_factor=0.6, realtime_speed_factor=None, location_multiplier=1.0):
+        """
+        Vectorized estimate_delay: BPR delays for many rows in one call
+        
+        Every argument may be a scalar or an array (broadcast to the length
+        of severities). Integer severity arrays use the integer V/C map,
+        float arrays the piecewise mapping - same as estimate_delay.
+        
+        Args:
+            severities: Predicted severities
+            base_travel_time_minutes, road_length_km, impact_factor: Road inputs
+            realtime_speed_factor: Speed factors, NaN (or None) = no real-time data
+            location_multiplier: V/C multipliers (see location_multipliers)
+        
+        Returns:
+            dict: Column name -> np.ndarray. Values are unrounded except
+            additional_delay_min; delay_records() rounds them into dicts.
+        """
+        severities = np.asarray(severities)
+        n = len(severities)
+        
+        def column(values):
+            return np.broadcast_to(np.asarray(values, dtype=np.float64), (n,)).copy()
+        
+        base = column(base_travel_time_minutes)
+        length = column(road_length_km)
+        impact = column(impact_factor)
+        location = column(location_multiplier)
+        realtime = column(np.nan if realtime_speed_factor is None else realtime_speed_factor)
+        has_realtime = ~np.isnan(realtime)
+        
+        # Validate inputs
+        base = np.where(base <= 0, (length / 40) * 60, base)  # Assume 40 km/h default
+        length = np.where(length <= 0, 1.0, length)
+        
+        # Map severity to Volume/Capacity ratio (HCM 2016 LOS thresholds)
+        if np.issubdtype(severities.dtype, np.integer):
+            v_c_ratio = np.select([severities == 0, severities == 1, severities == 2], [0.55, 0.82, 1.08], default=0.82)
+        else:
+            severities = severities.astype(np.float64)
+            v_c_ratio = np.select(
+                [severities < 0.5, severities < 1.5],
+                [0.40 + (severities * 0.6), 0.70 + ((severities - 0.5) * 0.25)],
+                default=np.minimum(0.95 + ((severities - 1.5) * 0.167), 1.20)
+            )
+        
+        v_c_ratio = v_c_ratio * (1 + impact * 0.5)
+        v_c_ratio = v_c_ratio * location
+        
+        # BPR under capacity, hypercongestion (Daganzo 2007) above it
+        alpha = 0.15
+        beta = 4
+        multiplier = np.where(v_c_ratio <= 1.0, 1 + alpha * (v_c_ratio ** beta), 1 + alpha + (v_c_ratio - 1.0) * 2.5)
+        
+        # Blend predicted and real-time (70/30 weight)
+        blend = has_realtime & (realtime > 0)
+        realtime_multiplier = np.clip(2 - realtime, 1.0, 3.0)
+        multiplier = np.where(blend, (multiplier * 0.70) + (realtime_multiplier * 0.30), multiplier)
+        
+        expected_travel_time = base * multiplier
+        additional_delay = expected_travel_time - base
+        
+        # Minimum realistic delays per severity
+        additional_delay_min = np.rint(additional_delay).astype(np.int64)
+        minimum = np.select([severities < 0.5, severities < 1.5], [1, 2], default=5)
+        additional_delay_min = np.maximum(additional_delay_min, minimum)
+        
+        normal_speed = (length / base) * 60
+        reduced_speed = (length / expected_travel_time) * 60
+        reduced_speed = np.where(has_realtime, np.maximum(5, reduced_speed * realtime), reduced_speed)
+        
+        return {
+            'base_travel_time_min': base,
+            'expected_travel_time_min': expected_travel_time,
+            'additional_delay_min': additional_delay_min,
+            'delay_percentage': (additional_delay / np.maximum(base, 1)) * 100,
+            'normal_speed_kmh': normal_speed,
+            'reduced_speed_kmh': reduced_speed,
+            'speed_reduction_kmh': normal_speed - reduced_speed,
+            'v_c_ratio': v_c_ratio,
+            'bpr_multiplier': multiplier,
+            'realtime_adjusted': has_realtime,
+        }
+
+    def estimate_class_delays(self, n_hours, base_travel_time_minutes, road_length_km,
+                              impact_factor=0.6, realtime_speed_factor=None, location_multiplier=1.0):
+        """
+        Additional delay of every hour as if it were Light, Moderate or Heavy
+
+        Uses the same float severity mapping (0.0 / 1.0 / 2.0) as the point
+        estimates, so a sampled class reproduces the delay of a prediction
+        of that class. Arguments broadcast like estimate_delay_many.
+
+        Returns:
+            np.ndarray: 3 x n_hours delays in minutes
+        """
+        def tiled(values):
+            return np.tile(np.broadcast_to(np.asarray(values, dtype=np.float64), (n_hours,)), 3)
+
+        delays = self.estimate_delay_many(
+            severities=np.repeat(np.array([0.0, 1.0, 2.0]), n_hours),
+            base_travel_time_minutes=tiled(base_travel_time_minutes),
+            road_length_km=tiled(road_length_km),
+            impact_factor=tiled(impact_factor),
+            realtime_speed_factor=tiled(np.nan if realtime_speed_factor is None else realtime_speed_factor),
+            location_multiplier=tiled(location_multiplier)
+        )
+        return delays['additional_delay_min'].reshape(3, n_hours)
+
+    @staticmethod
+    def delay_records(delays):
+        """
+        Turn estimate_delay_many columns into estimate_delay-style dicts
+        
+        Meant for the serialization edge (JSON responses) only.
+        """
+        columns = {name: values.tolist() for name, values in delays.items()}
+        return [
+            {
+                'base_travel_time_min': round(base, 1),
+                'expected_travel_time_min': round(expected, 1),
+                'additional_delay_min': delay,
+                'delay_percentage': round(percentage, 1),
+                'normal_speed_kmh': round(normal, 1),
+                'reduced_speed_kmh': round(reduced, 1),
+                'speed_reduction_kmh': round(reduction, 1),
+                'v_c_ratio': round(v_c, 2),
+                'bpr_multiplier': round(bpr, 2),
+                'realtime_adjusted': realtime,
+            }
+            for base, expected, delay, percentage, normal, reduced, reduction, v_c, bpr, realtime in zip(
+                columns['base_travel_time_min'], columns['expected_travel_time_min'],
+                columns['additional_delay_min'], columns['delay_percentage'],
+                columns['normal_speed_kmh'], columns['reduced_speed_kmh'],
+                columns['speed_reduction_kmh'], columns['v_c_ratio'],
+                columns['bpr_multiplier'], columns['realtime_adjusted']
+            )
+        ]
+    
     def get_location_multiplier(self, lat, lng, hour, day_of_week, is_friday=False):
+        """
+        Delay multiplier for a location and time (see _get_location_multiplier)
+        """
+        cache = self.caches.get('get_location_multiplier')
+        if cache is None:
+            return self._get_location_multiplier(lat, lng, hour, day_of_week, is_friday)
+        
+        key = (float(lat), float(lng), int(hour), int(day_of_week), bool(is_friday))
+        multiplier = cache.get(key)
+        if multiplier is None:
+            multiplier = self._get_location_multiplier(lat, lng, hour, day_of_week, is_friday)
+            cache.put(key, multiplier)
+        return multiplier
+    
+    def _get_location_multiplier(self, lat, lng, hour, day_of_week, is_friday=False):
         """
         Calculate delay multiplier based on proximity to schools, bottlenecks, traffic lights, etc.
+        Only POIs sharing the location's grid cell in the LocationIndex are checked.
         
         Args:
             lat, lng: Coordinates of the disruption
@@ -494,103 +1154,29 @@ class TrafficPredictor:
         Returns:
             float: Multiplier to apply to delay (1.0 = no change)
         """
-        if not self.calamba_context:
+        context = self._context
+        if not context.data:
             return 1.0
         
-        multiplier = 1.0
-        
-        def haversine_distance(lat1, lng1, lat2, lng2):
-            """Calculate distance in meters between two coordinates"""
-            from math import radians, sin, cos, sqrt, atan2
-            R = 6371000  # Earth's radius in meters
-            lat1, lng1, lat2, lng2 = map(radians, [lat1, lng1, lat2, lng2])
-            dlat = lat2 - lat1
-            dlng = lng2 - lng1
-            a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlng/2)**2
-            c = 2 * atan2(sqrt(a), sqrt(1-a))
-            return R * c
-        
-        # Check proximity to schools
-        # Check proximity to schools
-        for school in self.calamba_context.get('schools', []):
-            if school.get('lat', 0) == 0:
-                continue
-            distance = haversine_distance(lat, lng, school['lat'], school['lng'])
-            
-            # ✅ CHECK BOTH DISMISSAL AND MORNING RUSH
-            if distance <= school.get('impact_radius_m', 300):
-                # Check dismissal time
-                dismissal_hours = school.get('friday_dismissal_hours' if is_friday else 'dismissal_hours', [])
-                if hour in dismissal_hours:
-                    school_mult = school.get('delay_multiplier', 1.3)
-                    multiplier = max(multiplier, school_mult)
-                
-                # ✅ ADD THIS: Check morning rush
-                morning_hours = school.get('morning_rush_hours', [])
-                if hour in morning_hours:
-                    morning_mult = school.get('morning_multiplier', 1.5)
-                    multiplier = max(multiplier, morning_mult)
-            
-            # ✅ ADD THIS: Check extended cascade zone
-            cascade_radius = school.get('cascade_radius_m', 0)
-            if cascade_radius > 0 and distance <= cascade_radius:
-                if hour in dismissal_hours or hour in morning_hours:
-                    # Still affected but slightly less
-                    multiplier = max(multiplier, school_mult * 0.75)
-        
-        # Check proximity to bottlenecks
-        for bottleneck in self.calamba_context.get('bottlenecks', []):
-            if bottleneck.get('lat', 0) == 0:
-                continue
-            distance = haversine_distance(lat, lng, bottleneck['lat'], bottleneck['lng'])
-            if distance <= bottleneck.get('impact_radius_m', 300):
-                peak_hours = bottleneck.get('friday_peak_hours' if is_friday else 'peak_hours', [])
-                if hour in peak_hours:
-                    bn_mult = bottleneck.get('friday_multiplier' if is_friday else 'delay_multiplier', 1.3)
-                    multiplier = max(multiplier, bn_mult)
-        
-        # Check proximity to malls
-        for mall in self.calamba_context.get('malls_commercial', []):
-            if mall.get('lat', 0) == 0:
-                continue
-            distance = haversine_distance(lat, lng, mall['lat'], mall['lng'])
-            if distance <= mall.get('impact_radius_m', 400):
-                is_weekend = day_of_week >= 5
-                peak_hours = mall.get('weekend_peak_hours' if is_weekend else 'peak_hours', [])
-                if hour in peak_hours:
-                    if is_friday:
-                        mall_mult = mall.get('friday_multiplier', 1.4)
-                    elif is_weekend:
-                        mall_mult = mall.get('weekend_multiplier', 1.3)
-                    else:
-                        mall_mult = mall.get('delay_multiplier', 1.2)
-                    multiplier = max(multiplier, mall_mult)
-        
-        # Check proximity to traffic lights (adds base delay)
-        for light in self.calamba_context.get('traffic_lights', []):
-            if light.get('lat', 0) == 0:
-                continue
-            distance = haversine_distance(lat, lng, light['lat'], light['lng'])
-            if distance <= light.get('impact_radius_m', 100):
-                # Traffic lights add ~10-20% during peak hours
-                if 7 <= hour <= 9 or 16 <= hour <= 19:
-                    multiplier = max(multiplier, multiplier * 1.15)
-        
-        # Apply Calamba-wide peak patterns
-        peak_patterns = self.calamba_context.get('calamba_peak_patterns', {})
-        
-        if is_friday and 17 <= hour <= 21:
-            friday_pattern = peak_patterns.get('friday_evening_special', {})
-            multiplier = max(multiplier, friday_pattern.get('multiplier', 1.5))
-        elif day_of_week < 5:  # Weekday
-            if 7 <= hour <= 9:
-                multiplier = max(multiplier, peak_patterns.get('weekday_morning_rush', {}).get('multiplier', 1.3))
-            elif 17 <= hour <= 19:
-                multiplier = max(multiplier, peak_patterns.get('weekday_evening_rush', {}).get('multiplier', 1.4))
-            elif 16 <= hour <= 17:
-                multiplier = max(multiplier, peak_patterns.get('school_dismissal', {}).get('multiplier', 1.4))
-        
-        return round(multiplier, 2)
+        return context.index.location_multiplier(lat, lng, hour, day_of_week, is_friday)
+    
+    def location_multipliers(self, lats, lngs, hours, dows, is_friday=None):
+        """
+        Vectorized get_location_multiplier for many (location, hour, day) rows
+        
+        Args:
+            lats, lngs: Arrays of coordinates
+            hours: Array of hours (0-23)
+            dows: Array of days of week (0=Monday, 6=Sunday)
+            is_friday: Optional boolean array (default: dows == 4)
+        
+        Returns:
+            np.ndarray: Multipliers rounded to 2 decimals (1.0 = no change)
+        """
+        context = self._context
+        if not context.data:
+            return np.ones(len(lats))
+        return context.index.location_multipliers(lats, lngs, hours, dows, is_friday)
 
     def estimate_delay_with_location(self, severity, base_travel_time_minutes, road_length_km,
                                       impact_factor=0.6, realtime_speed_factor=None,
@@ -603,27 +1189,33 @@ class TrafficPredictor:
             lat, lng: Coordinates of disruption location
             hour: Hour of day (0-23)
             day_of_week: 0=Monday, 6=Sunday
+        
+        The multiplier comes from the precomputed location raster (cell
+        center value) when it is enabled, otherwise from the spatial index.
         """
         # Calculate location multiplier if coordinates provided
+        location_multiplier = 1.0
         if lat is not None and lng is not None and hour is not None:
-            is_friday = (day_of_week == 4) if day_of_week is not None else False
-            self._current_location_multiplier = self.get_location_multiplier(
-                lat, lng, hour, day_of_week or 0, is_friday
-            )
-        else:
-            self._current_location_multiplier = 1.0
+            self._reload_context_if_changed()
+            raster = self.location_raster
+            if raster is not None:
+                location_multiplier = raster.lookup_one(
+                    lat, lng, hour, day_of_week or 0
+                )
+            else:
+                is_friday = (day_of_week == 4) if day_of_week is not None else False
+                location_multiplier = self.get_location_multiplier(
+                    lat, lng, hour, day_of_week or 0, is_friday
+                )
         
-        # Call original estimate_delay
+        # Call original estimate_delay (the multiplier is passed, not stored on self)
         result = self.estimate_delay(
             severity, base_travel_time_minutes, road_length_km,
-            impact_factor, realtime_speed_factor
+            impact_factor, realtime_speed_factor, location_multiplier
         )
         
         # Add location info to result
-        result['location_multiplier'] = self._current_location_multiplier
-        result['location_adjusted'] = self._current_location_multiplier != 1.0
-        
-        # Reset for next call
-        self._current_location_multiplier = 1.0
+        result['location_multiplier'] = location_multiplier
+        result['location_adjusted'] = location_multiplier != 1.0
         
         return result
\ No newline at end of file
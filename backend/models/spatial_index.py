@@ -0,0 +1,352 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000
+METERS_PER_DEGREE_LAT = 110540
+METERS_PER_DEGREE_LNG_EQUATOR = 111320
+
+# Traffic lights add ~15% during these hours (any day)
+TRAFFIC_LIGHT_HOURS = [7, 8, 9, 16, 17, 18, 19]
+TRAFFIC_LIGHT_FACTOR = 1.15
+
+POI_SCHOOL, POI_BOTTLENECK, POI_MALL, POI_LIGHT = range(4)
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Distance in meters between coordinate arrays"""
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    dlat = lat2 - lat1
+    dlng = lng2 - lng1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def _haversine_scalar(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return EARTH_RADIUS_M * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def _cell_key(cx, cy):
+    """Single int64 key for a grid cell (works on scalars and arrays)"""
+    return cx * 1_000_003 + cy
+
+
+def hour_mask(hours):
+    """24-bit mask with one bit per listed hour"""
+    mask = 0
+    for hour in hours or []:
+        if 0 <= hour <= 23:
+            mask |= 1 << int(hour)
+    return mask
+
+
+class LocationIndex:
+    """
+    Grid spatial index over the POIs in calamba_context.json
+
+    Every POI (school, bottleneck, mall, traffic light) becomes one row in
+    flat arrays: coordinates, radii, multipliers and 24-bit hour masks.
+    POIs are registered in every grid cell their impact circle touches, so
+    scoring a point only measures distances to the POIs in its cell.
+    Scoring follows TrafficPredictor's location multiplier rules.
+    """
+
+    def __init__(self, context, cell_size_m=500):
+        self.cell_size_m = cell_size_m
+        self.peak_patterns = context.get('calamba_peak_patterns', {})
+        self._build_poi_table(context)
+        self._build_grid()
+
+    # ============================================================
+    # BUILD
+    # ============================================================
+
+    def _build_poi_table(self, context):
+        rows = []
+
+        for school in context.get('schools', []):
+            if school.get('lat', 0) == 0:
+                continue
+            rows.append({
+                'kind': POI_SCHOOL, 'lat': school['lat'], 'lng': school['lng'],
+                'radius': school.get('impact_radius_m', 300),
+                'cascade_radius': school.get('cascade_radius_m', 0),
+                'hours': hour_mask(school.get('dismissal_hours', [])),
+                'friday_hours': hour_mask(school.get('friday_dismissal_hours', [])),
+                'morning_hours': hour_mask(school.get('morning_rush_hours', [])),
+                'multiplier': school.get('delay_multiplier', 1.3),
+                'friday_multiplier': school.get('delay_multiplier', 1.3),
+                'morning_multiplier': school.get('morning_multiplier', 1.5),
+            })
+
+        for bottleneck in context.get('bottlenecks', []):
+            if bottleneck.get('lat', 0) == 0:
+                continue
+            rows.append({
+                'kind': POI_BOTTLENECK, 'lat': bottleneck['lat'], 'lng': bottleneck['lng'],
+                'radius': bottleneck.get('impact_radius_m', 300),
+                'hours': hour_mask(bottleneck.get('peak_hours', [])),
+                'friday_hours': hour_mask(bottleneck.get('friday_peak_hours', [])),
+                'multiplier': bottleneck.get('delay_multiplier', 1.3),
+                'friday_multiplier': bottleneck.get('friday_multiplier', 1.3),
+            })
+
+        for mall in context.get('malls_commercial', []):
+            if mall.get('lat', 0) == 0:
+                continue
+            rows.append({
+                'kind': POI_MALL, 'lat': mall['lat'], 'lng': mall['lng'],
+                'radius': mall.get('impact_radius_m', 400),
+                'hours': hour_mask(mall.get('peak_hours', [])),
+                'weekend_hours': hour_mask(mall.get('weekend_peak_hours', [])),
+                'multiplier': mall.get('delay_multiplier', 1.2),
+                'friday_multiplier': mall.get('friday_multiplier', 1.4),
+                'weekend_multiplier': mall.get('weekend_multiplier', 1.3),
+            })
+
+        for light in context.get('traffic_lights', []):
+            if light.get('lat', 0) == 0:
+                continue
+            rows.append({
+                'kind': POI_LIGHT, 'lat': light['lat'], 'lng': light['lng'],
+                'radius': light.get('impact_radius_m', 100),
+                'hours': hour_mask(TRAFFIC_LIGHT_HOURS),
+            })
+
+        self._rows = rows
+
+        def column(name, dtype, default=0):
+            return np.array([row.get(name, default) for row in rows], dtype=dtype)
+
+        self.kind = column('kind', np.int8)
+        self.lat = column('lat', np.float64)
+        self.lng = column('lng', np.float64)
+        self.radius = column('radius', np.float64)
+        self.cascade_radius = column('cascade_radius', np.float64)
+        self.hours = column('hours', np.int64)
+        self.friday_hours = column('friday_hours', np.int64)
+        self.weekend_hours = column('weekend_hours', np.int64)
+        self.morning_hours = column('morning_hours', np.int64)
+        self.multiplier = column('multiplier', np.float64, 1.0)
+        self.friday_multiplier = column('friday_multiplier', np.float64, 1.0)
+        self.weekend_multiplier = column('weekend_multiplier', np.float64, 1.0)
+        self.morning_multiplier = column('morning_multiplier', np.float64, 1.0)
+
+    def _build_grid(self):
+        """Register every POI in the grid cells its (largest) radius reaches"""
+        n_pois = len(self.kind)
+        self.origin_lat = float(self.lat.mean()) if n_pois else 0.0
+        self.origin_lng = float(self.lng.mean()) if n_pois else 0.0
+        self._m_per_deg_lng = METERS_PER_DEGREE_LNG_EQUATOR * math.cos(math.radians(self.origin_lat))
+
+        x, y = self._project(self.lat, self.lng)
+        # Small margin so projection error never drops a POI from a cell
+        reach = np.maximum(self.radius, self.cascade_radius) * 1.02 + 10
+
+        cells = {}
+        for poi in range(n_pois):
+            min_cx, max_cx = np.floor((x[poi] - reach[poi]) / self.cell_size_m), np.floor((x[poi] + reach[poi]) / self.cell_size_m)
+            min_cy, max_cy = np.floor((y[poi] - reach[poi]) / self.cell_size_m), np.floor((y[poi] + reach[poi]) / self.cell_size_m)
+            for cx in range(int(min_cx), int(max_cx) + 1):
+                for cy in range(int(min_cy), int(max_cy) + 1):
+                    cells.setdefault((cx, cy), []).append(poi)
+
+        self._cells = {_cell_key(*cell): pois for cell, pois in cells.items()}
+
+        # CSR layout: sorted cell keys, each owning a slice of cell_pois
+        ordered = sorted(cells, key=lambda cell: _cell_key(*cell))
+        self._cell_keys = np.array([_cell_key(*cell) for cell in ordered], dtype=np.int64)
+        counts = np.array([len(cells[cell]) for cell in ordered], dtype=np.int64)
+        self._cell_start = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self._cell_pois = np.array([poi for cell in ordered for poi in cells[cell]], dtype=np.int64)
+
+    def _project(self, lat, lng):
+        """Local equirectangular projection in meters"""
+        x = (np.asarray(lng, dtype=np.float64) - self.origin_lng) * self._m_per_deg_lng
+        y = (np.asarray(lat, dtype=np.float64) - self.origin_lat) * METERS_PER_DEGREE_LAT
+        return x, y
+
+    # ============================================================
+    # QUERY
+    # ============================================================
+
+    def candidate_pairs(self, lats, lngs):
+        """
+        (point, POI) pairs that share a grid cell
+
+        Returns:
+            tuple: (point indices, POI indices)
+        """
+        x, y = self._project(lats, lngs)
+        cx = np.floor(x / self.cell_size_m).astype(np.int64)
+        cy = np.floor(y / self.cell_size_m).astype(np.int64)
+        keys = _cell_key(cx, cy)
+
+        if len(self._cell_keys) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        # Cell keys are sorted, so each point's cell is a binary search away
+        position = np.searchsorted(self._cell_keys, keys)
+        position = np.minimum(position, len(self._cell_keys) - 1)
+        found = self._cell_keys[position] == keys
+
+        starts = np.where(found, self._cell_start[position], 0)
+        counts = np.where(found, self._cell_start[position + 1] - self._cell_start[position], 0)
+
+        points = np.repeat(np.arange(len(keys)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        pois = self._cell_pois[np.repeat(starts, counts) + offsets]
+        return points, pois
+
+    def location_multiplier(self, lat, lng, hour, day_of_week, is_friday=False):
+        """
+        Scalar location_multipliers for a single row
+
+        Same rules in plain Python - NumPy call overhead dominates for one
+        point. scripts/check_location_index.py keeps both paths in sync.
+        """
+        x = (lng - self.origin_lng) * self._m_per_deg_lng
+        y = (lat - self.origin_lat) * METERS_PER_DEGREE_LAT
+        key = _cell_key(math.floor(x / self.cell_size_m), math.floor(y / self.cell_size_m))
+        hour_bit = 1 << hour if 0 <= hour <= 23 else 0
+        is_weekend = day_of_week >= 5
+
+        multiplier = 1.0
+        light_count = 0
+        for poi in self._cells.get(key, []):
+            row = self._rows[poi]
+            distance = _haversine_scalar(lat, lng, row['lat'], row['lng'])
+            in_radius = distance <= row['radius']
+            kind = row['kind']
+
+            if kind == POI_SCHOOL or kind == POI_BOTTLENECK:
+                scheduled = bool((row['friday_hours'] if is_friday else row['hours']) & hour_bit)
+                if in_radius and scheduled:
+                    multiplier = max(multiplier, row['friday_multiplier'] if is_friday else row['multiplier'])
+                if kind == POI_SCHOOL:
+                    morning = bool(row['morning_hours'] & hour_bit)
+                    if in_radius and morning:
+                        multiplier = max(multiplier, row['morning_multiplier'])
+                    cascade_radius = row.get('cascade_radius', 0)
+                    if cascade_radius > 0 and distance <= cascade_radius and (scheduled or morning):
+                        multiplier = max(multiplier, row['multiplier'] * 0.75)
+            elif kind == POI_MALL:
+                if in_radius and (row['weekend_hours'] if is_weekend else row['hours']) & hour_bit:
+                    if is_friday:
+                        mall_multiplier = row['friday_multiplier']
+                    elif is_weekend:
+                        mall_multiplier = row['weekend_multiplier']
+                    else:
+                        mall_multiplier = row['multiplier']
+                    multiplier = max(multiplier, mall_multiplier)
+            elif in_radius and row['hours'] & hour_bit:
+                light_count += 1
+
+        for _ in range(light_count):
+            multiplier = max(multiplier, multiplier * TRAFFIC_LIGHT_FACTOR)
+
+        patterns = self.peak_patterns
+        if is_friday and 17 <= hour <= 21:
+            multiplier = max(multiplier, patterns.get('friday_evening_special', {}).get('multiplier', 1.5))
+        elif day_of_week < 5:
+            if 7 <= hour <= 9:
+                multiplier = max(multiplier, patterns.get('weekday_morning_rush', {}).get('multiplier', 1.3))
+            elif 17 <= hour <= 19:
+                multiplier = max(multiplier, patterns.get('weekday_evening_rush', {}).get('multiplier', 1.4))
+            elif hour == 16:
+                multiplier = max(multiplier, patterns.get('school_dismissal', {}).get('multiplier', 1.4))
+
+        return round(multiplier, 2)
+
+    def location_multipliers(self, lats, lngs, hours, dows, is_friday=None):
+        """
+        Location delay multipliers for many (point, hour, day) rows at once
+
+        Args:
+            lats, lngs: N coordinates
+            hours: N hours (0-23)
+            dows: N days of week (0=Monday, 6=Sunday)
+            is_friday: N booleans (default: dows == 4)
+
+        Returns:
+            np.ndarray: N multipliers rounded to 2 decimals (1.0 = no change)
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        hours = np.asarray(hours, dtype=np.int64)
+        dows = np.asarray(dows, dtype=np.int64)
+        is_friday = (dows == 4) if is_friday is None else np.asarray(is_friday, dtype=bool)
+        is_weekend = dows >= 5
+
+        multiplier = np.ones(len(lats), dtype=np.float64)
+
+        points, pois = self.candidate_pairs(lats, lngs)
+        distance = haversine_m(lats[points], lngs[points], self.lat[pois], self.lng[pois])
+        kind = self.kind[pois]
+        hour_bit = np.left_shift(1, np.clip(hours[points], 0, 63))
+        valid_hour = (hours[points] >= 0) & (hours[points] <= 23)
+        friday = is_friday[points]
+        weekend = is_weekend[points]
+        in_radius = distance <= self.radius[pois]
+
+        def active(masks):
+            return valid_hour & ((masks & hour_bit) != 0)
+
+        def raise_to(condition, values):
+            np.maximum.at(multiplier, points[condition], values[condition])
+
+        # Schools and bottlenecks swap to their Friday hours on Fridays
+        scheduled = active(np.where(friday, self.friday_hours[pois], self.hours[pois]))
+
+        # Schools: dismissal / morning rush inside the radius, 75% in the cascade zone
+        school = kind == POI_SCHOOL
+        morning = active(self.morning_hours[pois])
+        raise_to(school & in_radius & scheduled, self.multiplier[pois])
+        raise_to(school & in_radius & morning, self.morning_multiplier[pois])
+        cascade = school & (self.cascade_radius[pois] > 0) & (distance <= self.cascade_radius[pois])
+        raise_to(cascade & (scheduled | morning), self.multiplier[pois] * 0.75)
+
+        # Bottlenecks: peak hours (Friday hours and multiplier on Fridays)
+        bottleneck = kind == POI_BOTTLENECK
+        raise_to(bottleneck & in_radius & scheduled,
+                 np.where(friday, self.friday_multiplier[pois], self.multiplier[pois]))
+
+        # Malls: weekday or weekend peak hours
+        mall = kind == POI_MALL
+        mall_peak = active(np.where(weekend, self.weekend_hours[pois], self.hours[pois]))
+        mall_multiplier = np.where(friday, self.friday_multiplier[pois],
+                                   np.where(weekend, self.weekend_multiplier[pois], self.multiplier[pois]))
+        raise_to(mall & in_radius & mall_peak, mall_multiplier)
+
+        # Traffic lights compound: +15% per light in range at peak hours
+        light = (kind == POI_LIGHT) & in_radius & active(self.hours[pois])
+        light_counts = np.bincount(points[light], minlength=len(lats))
+        for step in range(int(light_counts.max()) if len(light_counts) else 0):
+            compounding = light_counts > step
+            multiplier[compounding] = np.maximum(multiplier[compounding], multiplier[compounding] * TRAFFIC_LIGHT_FACTOR)
+
+        # Calamba-wide peak patterns
+        patterns = self.peak_patterns
+        friday_evening = is_friday & (hours >= 17) & (hours <= 21)
+        weekday = ~friday_evening & (dows < 5)
+        pattern_multiplier = np.select(
+            [
+                friday_evening,
+                weekday & (hours >= 7) & (hours <= 9),
+                weekday & (hours >= 17) & (hours <= 19),
+                weekday & (hours >= 16) & (hours <= 17),
+            ],
+            [
+                patterns.get('friday_evening_special', {}).get('multiplier', 1.5),
+                patterns.get('weekday_morning_rush', {}).get('multiplier', 1.3),
+                patterns.get('weekday_evening_rush', {}).get('multiplier', 1.4),
+                patterns.get('school_dismissal', {}).get('multiplier', 1.4),
+            ],
+            default=1.0
+        )
+        multiplier = np.maximum(multiplier, pattern_multiplier)
+
+        # Same rounding as the scalar builtin round(x, 2)
+        return np.array([round(value, 2) for value in multiplier.tolist()])
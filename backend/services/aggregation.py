@@ -0,0 +1,207 @@
+# backend/services/aggregation.py
+
+import numpy as np
+from datetime import timedelta
+
+SEVERITY_LABELS = ['Light', 'Moderate', 'Heavy']
+SEVERITY_KEYS = ['light', 'moderate', 'heavy']
+TIME_SEGMENTS = ['morning', 'afternoon', 'night']
+
+
+def severity_classes(severities):
+    """0 = light (< 0.5), 1 = moderate (< 1.5), 2 = heavy"""
+    severities = np.asarray(severities, dtype=np.float64)
+    return np.where(severities < 0.5, 0, np.where(severities < 1.5, 1, 2))
+
+
+def time_segment_classes(hours):
+    """0 = morning (6-11), 1 = afternoon (12-17), 2 = night"""
+    hours = np.asarray(hours, dtype=np.int64)
+    return np.where((hours >= 6) & (hours <= 11), 0, np.where((hours >= 12) & (hours <= 17), 1, 2))
+
+
+def severity_label(severity):
+    return 'Light' if severity < 0.5 else ('Moderate' if severity < 1.5 else 'Heavy')
+
+
+class SimulationAggregate:
+    """
+    Daily (or any grouping) and overall statistics for hourly simulation output
+
+    Takes columns (hour, group index, severity, delay) and computes every
+    per-group and total statistic with grouped NumPy reductions - one pass
+    over the data instead of rescanning the hourly list for every day.
+
+    Peak rows of a group have a severity within peak_margin of the group
+    maximum (or at least peak_ratio x the maximum when peak_ratio is
+    given); their hours form the group's peak-hour set.
+    """
+
+    def __init__(self, hours, groups, severities, delays, n_groups=None,
+                 realtime_adjusted=None, peak_margin=0.1, peak_ratio=None):
+        self.hours = np.asarray(hours, dtype=np.int64)
+        self.groups = np.asarray(groups, dtype=np.int64)
+        self.severities = np.asarray(severities, dtype=np.float64)
+        self.delays = np.asarray(delays, dtype=np.float64)
+        n = len(self.hours)
+        self.n_groups = int(n_groups if n_groups is not None else (self.groups.max() + 1 if n else 0))
+
+        classes = severity_classes(self.severities)
+        segments = time_segment_classes(self.hours)
+
+        # Totals
+        self.total_hours = n
+        self.severity_counts = np.bincount(classes, minlength=3)
+        self.severity_sum = float(self.severities.sum())
+        self.delay_sum = float(self.delays.sum())
+        self.hours_adjusted = int(np.count_nonzero(realtime_adjusted)) if realtime_adjusted is not None else 0
+        self.time_segment_counts = np.bincount(segments * 3 + classes, minlength=9).reshape(3, 3)
+
+        # Per group
+        g = self.n_groups
+        self.group_hours = np.bincount(self.groups, minlength=g)
+        self.group_severity_sum = np.bincount(self.groups, weights=self.severities, minlength=g)
+        self.group_delay_sum = np.bincount(self.groups, weights=self.delays, minlength=g)
+        self.group_class_counts = np.bincount(self.groups * 3 + classes, minlength=g * 3).reshape(g, 3)
+
+        self.group_max_severity = np.full(g, -np.inf)
+        np.maximum.at(self.group_max_severity, self.groups, self.severities)
+        self.group_max_delay = np.full(g, -np.inf)
+        np.maximum.at(self.group_max_delay, self.groups, self.delays)
+        # First row holding each group's max delay (callers can echo its original value)
+        at_max_delay = self.delays == self.group_max_delay[self.groups]
+        self.group_max_delay_row = np.full(g, n, dtype=np.int64)
+        np.minimum.at(self.group_max_delay_row, self.groups[at_max_delay], np.flatnonzero(at_max_delay))
+
+        # Peak rows (severity at or near the group maximum)
+        peak_threshold = self.group_max_severity * peak_ratio if peak_ratio is not None else self.group_max_severity - peak_margin
+        self.peak_mask = self.severities >= peak_threshold[self.groups]
+        self.group_peak_count = np.bincount(self.groups[self.peak_mask], minlength=g)
+        self.group_peak_delay_sum = np.bincount(self.groups[self.peak_mask], weights=self.delays[self.peak_mask], minlength=g)
+
+        # Peak-hour sets (24-bit masks) and every row whose hour is in its group's set
+        hour_bits = np.left_shift(1, self.hours % 24)
+        self.group_peak_hour_bits = np.zeros(g, dtype=np.int64)
+        np.bitwise_or.at(self.group_peak_hour_bits, self.groups[self.peak_mask], hour_bits[self.peak_mask])
+        in_peak_hours = (self.group_peak_hour_bits[self.groups] & hour_bits) != 0
+        self.group_peak_hour_count = np.bincount(self.groups[in_peak_hours], minlength=g)
+        self.group_peak_hour_delay_sum = np.bincount(self.groups[in_peak_hours], weights=self.delays[in_peak_hours], minlength=g)
+
+        # First / second half mean severity (row order within each group)
+        starts = np.concatenate([[0], np.cumsum(self.group_hours)[:-1]]) if g else np.zeros(0, dtype=np.int64)
+        order = np.argsort(self.groups, kind='stable')
+        position = np.empty(n, dtype=np.int64)
+        position[order] = np.arange(n) - np.repeat(starts, self.group_hours)
+        first_half = position < (self.group_hours // 2)[self.groups]
+        self.group_first_half_sum = np.bincount(self.groups[first_half], weights=self.severities[first_half], minlength=g)
+        self.group_second_half_sum = np.bincount(self.groups[~first_half], weights=self.severities[~first_half], minlength=g)
+
+    @classmethod
+    def from_hourly_predictions(cls, hourly_predictions, start_date, end_date=None, **kwargs):
+        """
+        Aggregate route-style hourly prediction dicts by calendar day
+
+        Args:
+            hourly_predictions: Dicts with 'date', 'hour', 'severity', 'delay_info'
+            start_date, end_date: First / last day (datetime.date) - group 0 is start_date
+        """
+        dates = np.array([p['date'] for p in hourly_predictions], dtype='datetime64[D]')
+        groups = (dates - np.datetime64(start_date, 'D')).astype(np.int64)
+        n_groups = (end_date - start_date).days + 1 if end_date is not None else None
+        return cls(
+            hours=[p['hour'] for p in hourly_predictions],
+            groups=groups,
+            severities=[p['severity'] for p in hourly_predictions],
+            delays=[p['delay_info']['additional_delay_min'] for p in hourly_predictions],
+            n_groups=n_groups,
+            realtime_adjusted=[p.get('realtime_adjusted', False) for p in hourly_predictions],
+            **kwargs
+        )
+
+    # ============================================================
+    # OUTPUT SECTIONS
+    # ============================================================
+
+    @property
+    def avg_severity(self):
+        return self.severity_sum / max(self.total_hours, 1)
+
+    @property
+    def avg_delay(self):
+        return self.delay_sum / max(self.total_hours, 1)
+
+    def group_peak_hours(self):
+        """Sorted hours of the peak rows for every group (list of lists)"""
+        peak_groups = self.groups[self.peak_mask]
+        peak_hours = self.hours[self.peak_mask]
+        order = np.lexsort((peak_hours, peak_groups))
+        splits = np.cumsum(self.group_peak_count)[:-1]
+        return [hours.tolist() for hours in np.split(peak_hours[order], splits)]
+
+    def summary(self, duration_days, severity_digits=1, delay_digits=None):
+        """Summary block of the simulation responses"""
+        light, moderate, heavy = self.severity_counts.tolist()
+        total = self.total_hours
+        return {
+            'total_hours': total,
+            'duration_days': duration_days,
+            'light_hours': light,
+            'moderate_hours': moderate,
+            'heavy_hours': heavy,
+            'light_percentage': round(light / total * 100, 1),
+            'moderate_percentage': round(moderate / total * 100, 1),
+            'heavy_percentage': round(heavy / total * 100, 1),
+            'avg_severity': round(self.avg_severity, severity_digits),
+            'avg_severity_label': severity_label(self.avg_severity),
+            'avg_delay_minutes': round(self.avg_delay, delay_digits),
+            'total_delay_hours': round(self.delay_sum / 60, 1)
+        }
+
+    def time_segments(self):
+        """{'morning': {'light': n, 'moderate': n, 'heavy': n}, ...}"""
+        return {
+            segment: dict(zip(SEVERITY_KEYS, counts))
+            for segment, counts in zip(TIME_SEGMENTS, self.time_segment_counts.tolist())
+        }
+
+    def daily_map_data(self, start_date):
+        """Day-by-day aggregates for the map (days without hours are skipped)"""
+        daily_aggregates = []
+        peak_hours = self.group_peak_hours()
+        columns = zip(
+            self.group_hours.tolist(), self.group_severity_sum.tolist(), self.group_delay_sum.tolist(),
+            self.group_class_counts.tolist(), self.group_max_severity.tolist(),
+            self.group_peak_count.tolist(), self.group_peak_delay_sum.tolist(), peak_hours
+        )
+
+        for day, (count, severity_sum, delay_sum, class_counts, max_severity,
+                  peak_count, peak_delay_sum, peak_hours_list) in enumerate(columns):
+            if count == 0:
+                continue
+
+            current_date = start_date + timedelta(days=day)
+            severity_counts = dict(zip(SEVERITY_LABELS, class_counts))
+            peak_delay = peak_delay_sum / peak_count if peak_count else 0
+
+            # Format peak hour display
+            if len(peak_hours_list) == 1:
+                peak_hour_display = peak_hours_list[0]
+            else:
+                peak_hour_display = f"{peak_hours_list[0]}-{peak_hours_list[-1]}"
+
+            daily_aggregates.append({
+                'date': current_date.strftime('%Y-%m-%d'),
+                'day_name': current_date.strftime('%A'),
+                'avg_severity': round(severity_sum / count, 2),
+                'avg_severity_label': max(severity_counts, key=severity_counts.get),
+                'avg_delay_min': round(delay_sum / count),
+                'hour_count': count,
+                'severity_breakdown': severity_counts,
+                'peak_hour': peak_hour_display,
+                'peak_hours': peak_hours_list,
+                'peak_severity': round(max_severity, 2),
+                'peak_delay': round(peak_delay),
+                'avg_peak_delay': round(peak_delay)
+            })
+
+        return daily_aggregates
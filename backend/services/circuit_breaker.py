@@ -0,0 +1,165 @@
+# backend/services/circuit_breaker.py
+
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Call rejected without trying: the upstream is considered down"""
+
+
+class CircuitBreaker:
+    """
+    Failure-rate / slow-call circuit breaker for an upstream API
+
+    Closed: calls go through and their outcome lands in a sliding window
+    of the last `window` calls. Once at least `min_calls` are in it and
+    either the failure rate or the share of calls slower than slow_call_s
+    reaches its threshold, the breaker opens.
+
+    Open: calls are rejected immediately (CircuitOpenError) for open_s.
+
+    Half-open: up to half_open_probes calls are let through; one success
+    closes the breaker with a fresh window, a failure re-opens it.
+    """
+
+    def __init__(self, name, window=None, min_calls=None, failure_rate=None, slow_call_s=None,
+                 slow_rate=None, open_s=None, half_open_probes=None):
+        self.name = name
+        self.window = window or int(os.getenv('TRAFFIC_BREAKER_WINDOW', '20'))
+        self.min_calls = min_calls or int(os.getenv('TRAFFIC_BREAKER_MIN_CALLS', '5'))
+        self.failure_rate = failure_rate or float(os.getenv('TRAFFIC_BREAKER_FAILURE_RATE', '0.5'))
+        self.slow_call_s = slow_call_s or float(os.getenv('TRAFFIC_BREAKER_SLOW_CALL_S', '3'))
+        self.slow_rate = slow_rate or float(os.getenv('TRAFFIC_BREAKER_SLOW_RATE', '0.8'))
+        self.open_s = open_s or float(os.getenv('TRAFFIC_BREAKER_OPEN_S', '30'))
+        self.half_open_probes = half_open_probes or int(os.getenv('TRAFFIC_BREAKER_PROBES', '1'))
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=self.window)  # (failed, slow)
+        self._state = CLOSED
+        self._opened_at = None
+        self._probes = 0
+        self.rejected = 0
+        self.trips = 0
+        self.last_trip_reason = None
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        """State with the open -> half-open timeout applied (lock held)"""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_s:
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def allow(self):
+        """Whether a call may go out now (counts a probe when half-open)"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, success, elapsed_s):
+        """Outcome of a call that allow() let through"""
+        slow = elapsed_s >= self.slow_call_s
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if success and not slow:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._trip('probe failed' if not success else 'probe slow')
+                return
+
+            self._outcomes.append((not success, slow))
+            if self._state != CLOSED or len(self._outcomes) < self.min_calls:
+                return
+            failures = sum(failed for failed, _ in self._outcomes) / len(self._outcomes)
+            slow_calls = sum(slow for _, slow in self._outcomes) / len(self._outcomes)
+            if failures >= self.failure_rate:
+                self._trip(f'failure rate {failures:.0%}')
+            elif slow_calls >= self.slow_rate:
+                self._trip(f'slow call rate {slow_calls:.0%}')
+
+    def release(self):
+        """A let-through call ended without a verdict (e.g. our own rate limit)"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def _trip(self, reason):
+        """Open the breaker (lock held)"""
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.trips += 1
+        self.last_trip_reason = reason
+        print(f"⚠️ {self.name} circuit opened: {reason}")
+
+    def call(self, fn, neutral=()):
+        """
+        Run fn() through the breaker
+
+        Args:
+            fn: Zero-argument callable doing the upstream request
+            neutral: Exception types that say nothing about the upstream's
+                health (neither success nor failure)
+
+        Raises:
+            CircuitOpenError: Breaker open (fn not called)
+            Whatever fn() raised
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit open")
+        started = time.monotonic()
+        try:
+            result = fn()
+        except neutral:
+            self.release()
+            raise
+        except Exception:
+            self.record(False, time.monotonic() - started)
+            raise
+        self.record(True, time.monotonic() - started)
+        return result
+
+    def reset_after_fork(self):
+        self._lock = threading.Lock()
+
+    def stats(self):
+        with self._lock:
+            state = self._current_state()
+            calls = len(self._outcomes)
+            return {
+                'state': state,
+                'window_calls': calls,
+                'failure_rate': round(sum(failed for failed, _ in self._outcomes) / calls, 3) if calls else 0.0,
+                'slow_rate': round(sum(slow for _, slow in self._outcomes) / calls, 3) if calls else 0.0,
+                'retry_in_s': round(max(self.open_s - (time.monotonic() - self._opened_at), 0), 1) if state == OPEN else None,
+                'trips': self.trips,
+                'rejected': self.rejected,
+                'last_trip_reason': self.last_trip_reason,
+                'thresholds': {
+                    'failure_rate': self.failure_rate,
+                    'slow_call_s': self.slow_call_s,
+                    'slow_rate': self.slow_rate,
+                    'min_calls': self.min_calls,
+                    'open_s': self.open_s
+                }
+            }
@@ -904,6 +904,41 @@ class DatabaseService:
             if conn:
                 conn.close()
     
+    def get_road_segments(self) -> List[Dict]:
+        """Road segments with GeoJSON geometry (for the affected-segment engine)"""
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cursor.execute("""
+                SELECT 
+                    segment_id,
+                    segment_name,
+                    ST_AsGeoJSON(geometry) as geometry,
+                    length_meters,
+                    num_lanes,
+                    road_type,
+                    free_flow_speed,
+                    capacity
+                FROM segments
+            """)
+            
+            segments = []
+            for row in cursor.fetchall():
+                segment = dict(row)
+                segment['geometry'] = json.loads(segment['geometry'])
+                segments.append(segment)
+            return segments
+            
+        except Exception as e:
+            print(f"✗ Error retrieving road segments: {e}")
+            return []
+            
+        finally:
+            if conn:
+                conn.close()
+    
     # ============================================================
     # Tracks publisher email and organization
     # ============================================================
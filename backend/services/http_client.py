@@ -0,0 +1,318 @@
+# backend/services/http_client.py
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes worth another attempt (rate limit and transient server errors)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+def parse_host_timeouts(value):
+    """'api.tomtom.com=3:10,maps.googleapis.com=3:10' -> {host: (connect, read)}"""
+    timeouts = {}
+    for entry in (value or '').split(','):
+        if '=' not in entry:
+            continue
+        host, limits = entry.split('=', 1)
+        connect, _, read = limits.partition(':')
+        timeouts[host.strip().lower()] = (float(connect), float(read or connect))
+    return timeouts
+
+
+def parse_host_rates(value):
+    """'api.tomtom.com=5' -> {host: requests per second}"""
+    rates = {}
+    for entry in (value or '').split(','):
+        if '=' in entry:
+            host, rate = entry.split('=', 1)
+            rates[host.strip().lower()] = float(rate)
+    return rates
+
+
+class RateLimited(requests.exceptions.RequestException):
+    """No request token could be had before the caller's deadline"""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket
+
+    Refills at `rate` tokens per second up to `capacity`; acquire() blocks
+    until a token is free, or gives up once `deadline` would be passed.
+    The default capacity of one spaces requests evenly, so no one-second
+    window sees more than rate + 1 of them.
+    """
+
+    def __init__(self, rate, capacity=1.0):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline=None):
+        """
+        Take one token
+
+        Args:
+            deadline: time.monotonic() value to give up at (None = wait)
+
+        Returns:
+            bool: False if the deadline would pass before a token is free
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def reset_after_fork(self):
+        self._lock = threading.Lock()
+
+
+class HttpClient:
+    """
+    Shared keep-alive HTTP client for outbound API calls
+
+    One requests.Session with a sized connection pool per host, so calls
+    to TomTom and Google reuse open TCP/TLS connections instead of
+    handshaking every time. Each host has its own connect / read timeout;
+    idempotent requests are retried on connection errors, timeouts and
+    429 / 5xx responses with exponential backoff and full jitter. Hosts
+    with a QPS limit share a token bucket across all threads.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=16, host_timeouts=None, default_timeout=(3.05, 10.0),
+                 retries=2, backoff_s=0.2, backoff_max_s=2.0, host_rates=None):
+        """
+        Args:
+            pool_connections: Number of host pools kept
+            pool_maxsize: Open connections kept per host
+            host_timeouts: {host: (connect seconds, read seconds)}
+            default_timeout: (connect, read) for other hosts
+            retries: Extra attempts after the first one
+            backoff_s: Backoff base; attempt n waits up to backoff_s * 2^n
+            backoff_max_s: Backoff cap
+            host_rates: {host: requests per second} (every attempt counts)
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.host_timeouts = dict(host_timeouts or {})
+        self.default_timeout = default_timeout
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.backoff_max_s = backoff_max_s
+        self.limiters = {host: TokenBucket(rate) for host, rate in (host_rates or {}).items()}
+
+        self._lock = threading.Lock()
+        self._hosts = {}
+        self._session = self._new_session()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            pool_connections=int(os.getenv('HTTP_POOL_CONNECTIONS', '10')),
+            pool_maxsize=int(os.getenv('HTTP_POOL_MAXSIZE', '16')),
+            host_timeouts={
+                'api.tomtom.com': (3.05, 10.0),
+                'maps.googleapis.com': (3.05, 10.0),
+                **parse_host_timeouts(os.getenv('HTTP_HOST_TIMEOUTS'))
+            },
+            default_timeout=(float(os.getenv('HTTP_CONNECT_TIMEOUT_S', '3.05')), float(os.getenv('HTTP_READ_TIMEOUT_S', '10'))),
+            retries=int(os.getenv('HTTP_RETRIES', '2')),
+            backoff_s=float(os.getenv('HTTP_BACKOFF_S', '0.2')),
+            backoff_max_s=float(os.getenv('HTTP_BACKOFF_MAX_S', '2')),
+            host_rates={
+                'api.tomtom.com': float(os.getenv('TOMTOM_QPS', '5')),
+                **parse_host_rates(os.getenv('HTTP_HOST_QPS'))
+            }
+        )
+
+    def _new_session(self):
+        session = requests.Session()
+        # Retries are handled in request() so they can be jittered and counted
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def timeout_for(self, host, read_timeout=None):
+        connect, read = self.host_timeouts.get(host, self.default_timeout)
+        return (connect, read if read_timeout is None else read_timeout)
+
+    def _backoff(self, attempt, response=None):
+        """Full jitter: uniform(0, min(cap, base * 2^attempt)); Retry-After wins when given"""
+        if response is not None and response.headers.get('Retry-After', '').isdigit():
+            return min(float(response.headers['Retry-After']), self.backoff_max_s)
+        return random.uniform(0, min(self.backoff_max_s, self.backoff_s * (2 ** attempt)))
+
+    def request(self, method, url, timeout=None, retries=None, deadline=None, **kwargs):
+        """
+        Send a request through the pool
+
+        Args:
+            timeout: Read timeout override (connect timeout stays per host)
+            retries: Retry override; non-idempotent methods are not retried
+            deadline: time.monotonic() value the whole call (rate limit
+                waits, attempts and backoff) must finish by
+
+        Returns:
+            requests.Response: Last response (may be a retryable status
+            once retries are used up)
+
+        Raises:
+            requests.exceptions.RequestException: Last connection error
+            RateLimited: Deadline reached before a request could be sent
+        """
+        method = method.upper()
+        host = (urlsplit(url).hostname or '').lower()
+        retries = (self.retries if retries is None else retries) if method in RETRY_METHODS else 0
+        request_timeout = self.timeout_for(host, timeout)
+        limiter = self.limiters.get(host)
+
+        for attempt in range(retries + 1):
+            if limiter is not None and not limiter.acquire(deadline):
+                self._count(host, 'rate_limited')
+                raise RateLimited(f"No {host} request slot before deadline")
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise requests.exceptions.Timeout(f"Deadline passed before {host} request")
+                request_timeout = tuple(min(limit, remaining) for limit in request_timeout)
+
+            started = time.perf_counter()
+            try:
+                response = self._session.request(method, url, timeout=request_timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self._record(host, time.perf_counter() - started, error=type(e).__name__)
+                delay = self._backoff(attempt)
+                if attempt == retries or self._past(deadline, delay):
+                    raise
+                self._count(host, 'retries')
+                time.sleep(delay)
+                continue
+
+            self._record(host, time.perf_counter() - started, status=response.status_code)
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return response
+            delay = self._backoff(attempt, response)
+            if self._past(deadline, delay):
+                return response
+            self._count(host, 'retries')
+            time.sleep(delay)
+
+    @staticmethod
+    def _past(deadline, delay):
+        return deadline is not None and time.monotonic() + delay >= deadline
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    # ============================================================
+    # METRICS
+    # ============================================================
+
+    def _host(self, host):
+        metrics = self._hosts.get(host)
+        if metrics is None:
+            metrics = self._hosts[host] = {
+                'requests': 0, 'errors': 0, 'retries': 0, 'rate_limited': 0, 'statuses': {},
+                'total_s': 0.0, 'max_s': 0.0, 'recent_s': deque(maxlen=500)
+            }
+        return metrics
+
+    def _record(self, host, elapsed, status=None, error=None):
+        with self._lock:
+            metrics = self._host(host)
+            metrics['requests'] += 1
+            metrics['total_s'] += elapsed
+            metrics['max_s'] = max(metrics['max_s'], elapsed)
+            metrics['recent_s'].append(elapsed)
+            key = str(status) if status is not None else error
+            metrics['statuses'][key] = metrics['statuses'].get(key, 0) + 1
+            if error is not None or status >= 500:
+                metrics['errors'] += 1
+
+    def _count(self, host, counter):
+        with self._lock:
+            self._host(host)[counter] += 1
+
+    def _connection_counts(self):
+        """{host: (connections opened, requests sent)} from the urllib3 pools"""
+        counts = {}
+        for adapter in set(self._session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    opened, sent = counts.get(pool.host, (0, 0))
+                    counts[pool.host] = (opened + pool.num_connections, sent + pool.num_requests)
+        return counts
+
+    def stats(self):
+        connections = self._connection_counts()
+        with self._lock:
+            hosts = {}
+            for host, metrics in self._hosts.items():
+                recent = sorted(metrics['recent_s'])
+                opened, sent = connections.get(host, (0, 0))
+                hosts[host] = {
+                    'requests': metrics['requests'],
+                    'errors': metrics['errors'],
+                    'retries': metrics['retries'],
+                    'rate_limited': metrics['rate_limited'],
+                    'statuses': dict(metrics['statuses']),
+                    'connections_opened': opened,
+                    'connection_reuse_pct': round((1 - opened / sent) * 100, 1) if sent else None,
+                    'avg_ms': round(metrics['total_s'] / metrics['requests'] * 1000, 1) if metrics['requests'] else None,
+                    'p50_ms': round(recent[len(recent) // 2] * 1000, 1) if recent else None,
+                    'p95_ms': round(recent[min(int(len(recent) * 0.95), len(recent) - 1)] * 1000, 1) if recent else None,
+                    'max_ms': round(metrics['max_s'] * 1000, 1),
+                    'timeout_s': list(self.timeout_for(host)),
+                    'qps_limit': self.limiters[host].rate if host in self.limiters else None
+                }
+        return {
+            'pool_connections': self.pool_connections,
+            'pool_maxsize': self.pool_maxsize,
+            'retries': self.retries,
+            'hosts': hosts
+        }
+
+    def reset_after_fork(self):
+        """New session and lock in a forked worker (sockets must not be shared)"""
+        self._lock = threading.Lock()
+        self._session = self._new_session()
+        for limiter in self.limiters.values():
+            limiter.reset_after_fork()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """The process-wide client (configured from the environment)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient.from_env()
+    return _client
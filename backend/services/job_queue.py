@@ -0,0 +1,517 @@
+# backend/services/job_queue.py
+
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+TERMINAL_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'jobs.sqlite3')
+
+# kind -> (handler, validate); handler(payload) -> (result dict, http status)
+_handlers = {}
+# Run in every pool worker right after it starts (e.g. reset locks inherited by fork)
+_worker_initializers = []
+
+
+class JobLimitError(Exception):
+    """The owner already has the maximum number of active jobs"""
+
+
+def register_job_handler(kind, handler, validate=None):
+    """
+    Make a job kind available to the queue
+
+    Args:
+        kind: Job kind name (e.g. 'simulate-disruption-realtime')
+        handler: handler(payload) -> (result dict, http status)
+        validate: Optional validate(payload) -> error message or None,
+            run at submit time so bad payloads are rejected up front
+    """
+    _handlers[kind] = (handler, validate)
+
+
+def register_worker_initializer(initializer):
+    """Call initializer() in every pool worker before it runs jobs"""
+    _worker_initializers.append(initializer)
+
+
+def job_kinds():
+    return sorted(_handlers)
+
+
+def _init_worker():
+    for initializer in _worker_initializers:
+        initializer()
+
+
+class JobStore:
+    """
+    SQLite persistence for jobs (one short-lived connection per operation)
+
+    Safe to use from the web process and from pool workers at the same
+    time - the database runs in WAL mode and writers wait on each other.
+
+    Active jobs belong to the queue instance that submitted (or last
+    recovered) them and carry a lease that instance keeps renewing; a job
+    whose lease ran out belongs to a process that is gone.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    http_status INTEGER,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    submitter_pid INTEGER,
+                    worker_pid INTEGER,
+                    instance_id TEXT,
+                    lease_until REAL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            # Databases created before leases existed
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (('instance_id', 'TEXT'), ('lease_until', 'REAL')):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_owner_status ON jobs (owner, status)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create(self, kind, payload, owner, max_active, instance_id=None, lease_s=0):
+        """
+        Insert a queued job unless the owner is at max_active
+
+        The job is leased to instance_id for lease_s seconds.
+
+        Raises:
+            JobLimitError: Owner already has max_active queued/running jobs
+        """
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            # IMMEDIATE: count and insert atomically across processes
+            conn.execute("BEGIN IMMEDIATE")
+            active = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE owner = ? AND status IN (?, ?)",
+                (owner, *ACTIVE_STATUSES)
+            ).fetchone()[0]
+            if max_active > 0 and active >= max_active:
+                conn.execute("ROLLBACK")
+                raise JobLimitError(f'Too many active jobs ({active}), limit is {max_active} per user')
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, owner, status, payload, submitter_pid, instance_id, lease_until, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, owner, QUEUED, json.dumps(payload, default=str), os.getpid(),
+                 instance_id, time.time() + lease_s, time.time())
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return job_id
+
+    def get(self, job_id, with_result=False):
+        """Job as a dict (None if unknown); result only when with_result"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._to_dict(row, with_result) if row else None
+
+    def list(self, owner=None, limit=50):
+        """Newest jobs first (without results)"""
+        conn = self._connect()
+        try:
+            if owner is None:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE owner = ? ORDER BY created_at DESC LIMIT ?", (owner, limit)
+                ).fetchall()
+        finally:
+            conn.close()
+        return [self._to_dict(row) for row in rows]
+
+    def mark_running(self, job_id):
+        """Claim a queued job for this worker; False if it was cancelled meanwhile"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, worker_pid = ?, started_at = ? "
+                "WHERE job_id = ? AND status IN (?, ?) AND cancel_requested = 0",
+                (RUNNING, os.getpid(), time.time(), job_id, *ACTIVE_STATUSES)
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def finish(self, job_id, status, result=None, error=None, http_status=None):
+        """Record a terminal status (a job that already finished is left alone)"""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, http_status = ?, finished_at = ? "
+                "WHERE job_id = ? AND status IN (?, ?)",
+                (status, json.dumps(result, default=str) if result is not None else None,
+                 error, http_status, time.time(), job_id, *ACTIVE_STATUSES)
+            )
+        finally:
+            conn.close()
+
+    def request_cancel(self, job_id):
+        """
+        Cancel a job: queued jobs are cancelled immediately, running jobs
+        are flagged and their result is discarded when they finish
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, cancel_requested = 1 WHERE job_id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED)
+            )
+            conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = ?",
+                (job_id, RUNNING)
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return self.get(job_id)
+
+    def cancel_requested(self, job_id):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return bool(row and row[0])
+
+    def renew_leases(self, instance_id, lease_s):
+        """Extend the lease on every active job of instance_id; returns how many"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE instance_id = ? AND status IN (?, ?)",
+                (time.time() + lease_s, instance_id, *ACTIVE_STATUSES)
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def claim_orphans(self, instance_id, lease_s):
+        """
+        Active jobs of other instances whose lease has expired (their
+        process is gone, e.g. after a restart), re-queued under
+        instance_id. Returns [(job_id, kind, payload)].
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT job_id, kind, payload, instance_id, cancel_requested FROM jobs "
+                "WHERE status IN (?, ?) AND instance_id IS NOT ? AND (lease_until IS NULL OR lease_until < ?)",
+                (*ACTIVE_STATUSES, instance_id, now)
+            ).fetchall()
+            claimed = []
+            for row in rows:
+                if row['cancel_requested']:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, finished_at = ? WHERE job_id = ? AND status IN (?, ?)",
+                        (CANCELLED, now, row['job_id'], *ACTIVE_STATUSES)
+                    )
+                    continue
+                # Conditional on the old owner so two instances can't both claim it
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = ?, submitter_pid = ?, instance_id = ?, lease_until = ?, "
+                    "worker_pid = NULL, started_at = NULL "
+                    "WHERE job_id = ? AND instance_id IS ? AND (lease_until IS NULL OR lease_until < ?)",
+                    (QUEUED, os.getpid(), instance_id, now + lease_s, row['job_id'], row['instance_id'], now)
+                )
+                if cursor.rowcount == 1:
+                    claimed.append((row['job_id'], row['kind'], json.loads(row['payload'])))
+            return claimed
+        finally:
+            conn.close()
+
+    def purge(self, older_than_s):
+        """Delete finished jobs older than older_than_s seconds"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?) AND finished_at < ?",
+                (*TERMINAL_STATUSES, time.time() - older_than_s)
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def counts(self):
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        finally:
+            conn.close()
+        return {status: count for status, count in rows}
+
+    @staticmethod
+    def _to_dict(row, with_result=False):
+        job = {
+            'job_id': row['job_id'],
+            'kind': row['kind'],
+            'owner': row['owner'],
+            'status': row['status'],
+            'error': row['error'],
+            'http_status': row['http_status'],
+            'cancel_requested': bool(row['cancel_requested']),
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+            'queue_seconds': round(row['started_at'] - row['created_at'], 3) if row['started_at'] else None,
+            'run_seconds': (
+                round(row['finished_at'] - row['started_at'], 3)
+                if row['started_at'] and row['finished_at'] else None
+            )
+        }
+        if with_result:
+            job['result'] = json.loads(row['result']) if row['result'] else None
+        return job
+
+
+def run_job(job_id, kind, payload, db_path):
+    """
+    Pool entry point: run one job and write its outcome to the store
+
+    Results go straight to SQLite from the worker, so only the final
+    status string travels back to the web process.
+    """
+    store = JobStore(db_path)
+    if not store.mark_running(job_id):
+        return CANCELLED
+
+    try:
+        handler, _ = _handlers[kind]
+        result, http_status = handler(payload)
+    except Exception as e:
+        store.finish(job_id, FAILED, error=str(e), http_status=500)
+        return FAILED
+
+    if store.cancel_requested(job_id):
+        store.finish(job_id, CANCELLED)
+        return CANCELLED
+
+    status = SUCCEEDED if http_status < 400 else FAILED
+    error = result.get('error') if status == FAILED and isinstance(result, dict) else None
+    store.finish(job_id, status, result=result, error=error, http_status=http_status)
+    return status
+
+
+class JobQueue:
+    """
+    Persistent job queue executed on a local worker pool
+
+    Jobs are rows in a SQLite table (queued -> running -> succeeded /
+    failed / cancelled) and run on a thread pool (JOB_EXECUTOR=thread,
+    the default) or a process pool (JOB_EXECUTOR=process). Process workers
+    are forked from the web process so they inherit the loaded model and
+    the registered handlers. The fork happens when the first job is
+    submitted and copies every lock held by the web process's other
+    threads at that moment (urllib3 pools, stdout, ...), which can
+    deadlock a worker; process mode is therefore opt-in, for deployments
+    that keep those background threads off. Without fork support the
+    queue falls back to threads.
+
+    Each owner may have at most max_active_per_user queued or running
+    jobs. Every queue instance has a random instance_id and renews the
+    lease on its active jobs every lease_s / 3 seconds; jobs of an
+    instance whose lease expired are re-queued by recover(), which also
+    runs on every renewal.
+    """
+
+    def __init__(self, db_path=None, workers=None, executor=None,
+                 max_active_per_user=None, retention_s=None, lease_s=None):
+        self.db_path = db_path or os.getenv('JOB_DB_PATH', DEFAULT_DB_PATH)
+        self.workers = workers or int(os.getenv('JOB_WORKERS', '2'))
+        self.executor_kind = executor or os.getenv('JOB_EXECUTOR', 'thread').lower()
+        self.max_active_per_user = (
+            max_active_per_user if max_active_per_user is not None
+            else int(os.getenv('JOB_MAX_ACTIVE_PER_USER', '3'))
+        )
+        self.retention_s = retention_s if retention_s is not None else float(os.getenv('JOB_RETENTION_HOURS', '24')) * 3600
+        self.lease_s = lease_s or float(os.getenv('JOB_LEASE_S', '60'))
+        # Identifies this process's jobs (PIDs get reused, e.g. PID 1 in containers)
+        self.instance_id = uuid.uuid4().hex
+
+        if self.executor_kind == 'process' and 'fork' not in multiprocessing.get_all_start_methods():
+            print("⚠ Job queue: fork start method unavailable, using threads")
+            self.executor_kind = 'thread'
+
+        self.store = JobStore(self.db_path)
+        self._executor = None
+        self._futures = {}
+        self._heartbeat = None
+        self.submitted = 0
+        self.rejected = 0
+        self.recovered = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.executor_kind == 'process':
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('fork'),
+                    initializer=_init_worker
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+        return self._executor
+
+    def validate(self, kind, payload):
+        """Error message for an unknown kind or an invalid payload, else None"""
+        if kind not in _handlers:
+            return f"Unknown job kind '{kind}' (available: {', '.join(job_kinds())})"
+        _, validate = _handlers[kind]
+        return validate(payload) if validate else None
+
+    def submit(self, kind, payload, owner):
+        """
+        Queue a job
+
+        Returns:
+            dict: The queued job
+
+        Raises:
+            ValueError: Unknown kind or invalid payload
+            JobLimitError: Owner is at the active job limit
+        """
+        error = self.validate(kind, payload)
+        if error:
+            raise ValueError(error)
+
+        try:
+            job_id = self.store.create(
+                kind, payload, owner, self.max_active_per_user, instance_id=self.instance_id, lease_s=self.lease_s
+            )
+        except JobLimitError:
+            self.rejected += 1
+            raise
+
+        self._dispatch(job_id, kind, payload)
+        self.submitted += 1
+
+        if self.retention_s > 0 and self.submitted % 100 == 0:
+            self.store.purge(self.retention_s)
+        return self.store.get(job_id)
+
+    def _dispatch(self, job_id, kind, payload):
+        try:
+            future = self._get_executor().submit(run_job, job_id, kind, payload, self.db_path)
+        except Exception as e:
+            self.store.finish(job_id, FAILED, error=f'Could not start job: {e}', http_status=500)
+            return
+        self._futures[job_id] = future
+        future.add_done_callback(lambda f, job_id=job_id: self._on_done(job_id, f))
+
+    def _on_done(self, job_id, future):
+        self._futures.pop(job_id, None)
+        if future.cancelled():
+            return
+        exception = future.exception()
+        if exception is not None:
+            # Worker crashed before it could record anything
+            self.store.finish(job_id, FAILED, error=f'Worker failed: {exception}', http_status=500)
+
+    def get(self, job_id, with_result=False):
+        return self.store.get(job_id, with_result)
+
+    def list(self, owner=None, limit=50):
+        return self.store.list(owner, limit)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job (None if unknown)"""
+        future = self._futures.get(job_id)
+        if future is not None:
+            future.cancel()
+        return self.store.request_cancel(job_id)
+
+    def recover(self):
+        """
+        Re-queue jobs orphaned by a previous process and keep this
+        instance's leases alive from now on; returns how many were claimed
+        """
+        orphans = self.store.claim_orphans(self.instance_id, self.lease_s)
+        for job_id, kind, payload in orphans:
+            if kind in _handlers:
+                self._dispatch(job_id, kind, payload)
+            else:
+                self.store.finish(job_id, FAILED, error=f"Unknown job kind '{kind}'", http_status=500)
+        self.recovered += len(orphans)
+        self._start_heartbeat()
+        return len(orphans)
+
+    def _start_heartbeat(self):
+        if self._heartbeat is None or not self._heartbeat.is_alive():
+            self._heartbeat = threading.Thread(target=self._renew_loop, name='job-lease', daemon=True)
+            self._heartbeat.start()
+
+    def _renew_loop(self):
+        while True:
+            time.sleep(self.lease_s / 3)
+            try:
+                self.store.renew_leases(self.instance_id, self.lease_s)
+                # Jobs of a previous process whose lease was still running at startup
+                self.recover()
+            except Exception as e:
+                print(f"⚠ Job queue lease renewal failed: {e}")
+
+    def stats(self):
+        """Counters for the health endpoint"""
+        return {
+            'executor': self.executor_kind,
+            'workers': self.workers,
+            'max_active_per_user': self.max_active_per_user,
+            'in_flight': len(self._futures),
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'recovered': self.recovered,
+            'lease_s': self.lease_s,
+            'jobs': self.store.counts(),
+            'kinds': job_kinds()
+        }
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,311 @@
+# backend/services/realtime_poller.py
+
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from types import MappingProxyType
+
+from services.tile_cache import tile_key
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_LOCK_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'realtime_poller.lock')
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'realtime_snapshot.json')
+
+
+def parse_bounds(value):
+    """'min_lat,min_lng,max_lat,max_lng' -> tuple of floats"""
+    min_lat, min_lng, max_lat, max_lng = map(float, value.split(','))
+    return min_lat, min_lng, max_lat, max_lng
+
+
+def grid_points(bounds, size):
+    """Cell centres of a size x size grid over bounds"""
+    min_lat, min_lng, max_lat, max_lng = bounds
+    lat_step = (max_lat - min_lat) / size
+    lng_step = (max_lng - min_lng) / size
+    return [
+        (min_lat + (i + 0.5) * lat_step, min_lng + (j + 0.5) * lng_step)
+        for i in range(size)
+        for j in range(size)
+    ]
+
+
+def distance_m(lat1, lng1, lat2, lng2):
+    """Equirectangular distance in meters (fine at city scale)"""
+    x = math.radians(lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return 6371000.0 * math.hypot(x, y)
+
+
+def try_lock(handle):
+    """Non-blocking exclusive lock on an open file (released when the process exits)"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+class CitySnapshot:
+    """
+    Immutable flow data for the whole city at one point in time
+
+    Built once by the poller and then only read: handlers grab the current
+    reference and never see a half-updated snapshot.
+    """
+
+    __slots__ = ('taken_at', 'zoom', 'flows', 'segments', 'failed')
+
+    def __init__(self, taken_at, zoom, flows, failed=0):
+        """
+        Args:
+            taken_at: Epoch seconds the poll finished
+            zoom: Tile zoom the segments are keyed by
+            flows: [((lat, lng), flowSegmentData)] for every polled point
+            failed: Points that could not be fetched
+        """
+        frozen = tuple(((lat, lng), MappingProxyType(dict(flow))) for (lat, lng), flow in flows)
+        segments = {tile_key(lat, lng, zoom): flow for (lat, lng), flow in frozen}
+        object.__setattr__(self, 'taken_at', taken_at)
+        object.__setattr__(self, 'zoom', zoom)
+        object.__setattr__(self, 'flows', frozen)
+        object.__setattr__(self, 'segments', MappingProxyType(segments))
+        object.__setattr__(self, 'failed', failed)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('CitySnapshot is immutable')
+
+    def age_s(self):
+        return time.time() - self.taken_at
+
+    def get(self, lat, lng, max_age_s=None, match_m=0):
+        """
+        flowSegmentData for the tile containing a point, else for the
+        nearest polled point within match_m meters, or None
+        """
+        if max_age_s is not None and self.age_s() > max_age_s:
+            return None
+        flow = self.segments.get(tile_key(lat, lng, self.zoom))
+        if flow is not None or match_m <= 0:
+            return flow
+        nearest, nearest_m = None, match_m
+        for (point_lat, point_lng), point_flow in self.flows:
+            meters = distance_m(lat, lng, point_lat, point_lng)
+            if meters <= nearest_m:
+                nearest, nearest_m = point_flow, meters
+        return nearest
+
+    def within(self, min_lat, min_lng, max_lat, max_lng):
+        """[((lat, lng), flowSegmentData)] for polled points inside a box"""
+        return [
+            ((lat, lng), flow) for (lat, lng), flow in self.flows
+            if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+        ]
+
+    def __len__(self):
+        return len(self.segments)
+
+    def to_dict(self):
+        return {
+            'taken_at': self.taken_at,
+            'zoom': self.zoom,
+            'failed': self.failed,
+            'flows': [[lat, lng, dict(flow)] for (lat, lng), flow in self.flows]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        flows = [((lat, lng), flow) for lat, lng, flow in data['flows']]
+        return cls(data['taken_at'], data['zoom'], flows, data.get('failed', 0))
+
+
+class RealtimePoller:
+    """
+    Background thread that keeps a CitySnapshot of TomTom flow data
+
+    Every cycle fetches the corridor points plus a grid over the city
+    extent (through the shared, rate-limited HTTP client), publishes a new
+    snapshot with a single reference swap, then sleeps for an interval
+    that depends on the hour: short at rush hour, long at night.
+
+    Under a multi-process server every worker runs a poller, but only one
+    polls TomTom: the leader, which holds an exclusive lock on lock_path
+    and writes each snapshot to snapshot_path. The others follow, loading
+    that file when it changes. If the leader dies its lock goes with it
+    and a follower takes over on its next check.
+    """
+
+    def __init__(self, traffic_service, corridor_points=(), bounds=None, grid=None,
+                 peak_interval_s=None, offpeak_interval_s=None, night_interval_s=None,
+                 lock_path=None, snapshot_path=None, follow_interval_s=None):
+        """
+        Args:
+            traffic_service: TrafficAPIService whose get_flow_segment is polled
+            corridor_points: [(lat, lng)] always polled
+            bounds: (min_lat, min_lng, max_lat, max_lng) of the city grid
+            grid: Grid points per side (0 = corridor points only)
+            peak_interval_s: Seconds between polls at 6-9 and 17-19
+            offpeak_interval_s: Seconds between polls during the day
+            night_interval_s: Seconds between polls from 22 to 5
+            lock_path: File whose lock makes a worker the leader
+            snapshot_path: File the leader shares its snapshot through
+            follow_interval_s: Seconds between a follower's checks
+        """
+        if bounds is None:
+            bounds = parse_bounds(os.getenv('REALTIME_POLL_BOUNDS', '14.15,121.10,14.26,121.20'))
+        if grid is None:
+            grid = int(os.getenv('REALTIME_POLL_GRID', '6'))
+        self.traffic_service = traffic_service
+        self.bounds = bounds
+        self.grid = grid
+        self.points = list(dict.fromkeys(list(corridor_points) + (grid_points(bounds, grid) if grid > 0 else [])))
+        self.peak_interval_s = peak_interval_s or float(os.getenv('REALTIME_POLL_PEAK_S', '60'))
+        self.offpeak_interval_s = offpeak_interval_s or float(os.getenv('REALTIME_POLL_OFFPEAK_S', '180'))
+        self.night_interval_s = night_interval_s or float(os.getenv('REALTIME_POLL_NIGHT_S', '600'))
+        self.lock_path = lock_path or os.getenv('REALTIME_POLLER_LOCK', DEFAULT_LOCK_PATH)
+        self.snapshot_path = snapshot_path or os.getenv('REALTIME_SNAPSHOT_FILE', DEFAULT_SNAPSHOT_PATH)
+        self.follow_interval_s = follow_interval_s or float(os.getenv('REALTIME_FOLLOW_S', '10'))
+
+        self.snapshot = None
+        self.leader = False
+        self._lock_file = None
+        self._loaded_mtime = None
+        self.polls = 0
+        self.last_poll_s = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def interval_s(self, now=None):
+        """Seconds until the next poll, by hour of day"""
+        hour = (now or datetime.now()).hour
+        if 6 <= hour <= 9 or 17 <= hour <= 19:
+            return self.peak_interval_s
+        if hour >= 22 or hour <= 5:
+            return self.night_interval_s
+        return self.offpeak_interval_s
+
+    def start(self):
+        """Start the polling thread once (later calls are no-ops)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='realtime-poller', daemon=True)
+            self._thread.start()
+            print(f"✓ Realtime poller started ({len(self.points)} points)")
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.leader or self._try_lead():
+                    self.poll_once()
+                else:
+                    self.load_shared()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"⚠️ Realtime poll failed: {e}")
+            self._stop.wait(self.interval_s() if self.leader else self.follow_interval_s)
+
+    def _try_lead(self):
+        """Take the leader lock if no other process holds it"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+        handle = open(self.lock_path, 'a+')
+        if not try_lock(handle):
+            handle.close()
+            return False
+        # Kept open for the life of the process: closing it drops the lock
+        self._lock_file = handle
+        self.leader = True
+        print(f"✓ Realtime poller leading (pid {os.getpid()})")
+        return True
+
+    def load_shared(self):
+        """Follower: publish the leader's snapshot file if it changed"""
+        try:
+            mtime = os.stat(self.snapshot_path).st_mtime
+        except OSError:
+            return self.snapshot
+        if mtime == self._loaded_mtime:
+            return self.snapshot
+        with open(self.snapshot_path, encoding='utf-8') as f:
+            snapshot = CitySnapshot.from_dict(json.load(f))
+        self._loaded_mtime = mtime
+        self.snapshot = snapshot
+        self.traffic_service.snapshot = snapshot
+        return snapshot
+
+    def _share(self, snapshot):
+        """Leader: write the snapshot for followers (atomic rename)"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.snapshot_path)), exist_ok=True)
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot.to_dict(), f)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def poll_once(self):
+        """Fetch every point and publish a new snapshot"""
+        started = time.monotonic()
+        flows = []
+        failed = 0
+        last_error = None
+        for lat, lng in self.points:
+            try:
+                flow = self.traffic_service.get_flow_segment(lat, lng, refresh=True)
+            except Exception as e:
+                failed += 1
+                last_error = str(e)
+                continue
+            if flow:
+                flows.append(((lat, lng), flow))
+
+        if flows:
+            # Single reference swap: readers see the old or the new snapshot
+            self.snapshot = CitySnapshot(time.time(), self.traffic_service.cache_zoom, flows, failed)
+            self.traffic_service.snapshot = self.snapshot
+            self._share(self.snapshot)
+        self.polls += 1
+        self.last_poll_s = time.monotonic() - started
+        self.last_error = last_error
+        return self.snapshot
+
+    def reset_after_fork(self):
+        """Forked workers keep the inherited snapshot but run no thread (and never lead)"""
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.leader = False
+        self._lock_file = None
+
+    def stats(self):
+        snapshot = self.snapshot
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'role': 'leader' if self.leader else 'follower',
+            'points': len(self.points),
+            'polls': self.polls,
+            'interval_s': self.interval_s(),
+            'last_poll_s': round(self.last_poll_s, 2) if self.last_poll_s is not None else None,
+            'last_error': self.last_error,
+            'snapshot_segments': len(snapshot) if snapshot else 0,
+            'snapshot_failed': snapshot.failed if snapshot else None,
+            'snapshot_age_s': round(snapshot.age_s(), 1) if snapshot else None
+        }
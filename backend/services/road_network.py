@@ -0,0 +1,483 @@
+# backend/services/road_network.py
+
+import json
+import math
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from models.spatial_index import METERS_PER_DEGREE_LAT, METERS_PER_DEGREE_LNG_EQUATOR
+
+DEFAULT_NETWORK_FILE = os.path.join(os.path.dirname(__file__), '..', 'models', 'data', 'calamba_roads.geojson')
+
+# OSM highway values kept from an extract (footways, tracks etc. are skipped)
+ROAD_HIGHWAY_TYPES = {
+    'motorway', 'trunk', 'primary', 'secondary', 'tertiary', 'unclassified', 'residential', 'service',
+    'motorway_link', 'trunk_link', 'primary_link', 'secondary_link', 'tertiary_link', 'living_street'
+}
+
+# segments table types and OSM link roads -> road_type_factors keys
+ROAD_TYPE_ALIASES = {
+    'arterial': 'primary',
+    'collector': 'secondary',
+    'local': 'residential',
+    'motorway_link': 'motorway',
+    'trunk_link': 'trunk',
+    'primary_link': 'primary',
+    'secondary_link': 'secondary',
+    'tertiary_link': 'tertiary',
+    'living_street': 'residential',
+}
+
+
+# Free-flow speed when the extract has no maxspeed tag (km/h)
+DEFAULT_SPEED_KMH = {
+    'motorway': 80, 'trunk': 60, 'primary': 50, 'secondary': 40,
+    'tertiary': 30, 'unclassified': 30, 'residential': 20, 'service': 15,
+}
+
+
+def normalize_road_type(road_type):
+    road_type = str(road_type or 'unclassified').strip().lower()
+    return ROAD_TYPE_ALIASES.get(road_type, road_type)
+
+
+def _number(value, default=None):
+    """Leading number of an OSM tag value ('2', '40 km/h', '2;3'), else default"""
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        digits = ''
+        for char in str(value):
+            if char.isdigit() or (char == '.' and digits):
+                digits += char
+            elif digits:
+                break
+        return float(digits) if digits else default
+
+
+def _oneway(value, highway=None):
+    """OSM oneway tag (motorways are one-way unless tagged otherwise)"""
+    if value is None:
+        return highway in ('motorway', 'motorway_link')
+    return str(value).lower() in ('yes', 'true', '1')
+
+
+class RoadNetwork:
+    """
+    Road segments with a grid index for radius queries
+
+    Every segment polyline is split into straight pieces; each piece is
+    registered in the grid cells its bounding box touches (CSR layout like
+    LocationIndex). A radius query gathers the pieces of the cells around
+    the point, computes point-to-piece distances in one array pass and
+    keeps the closest piece per segment.
+    """
+
+    def __init__(self, segments, cell_size_m=250, source=None):
+        """
+        Args:
+            segments: Dicts with 'segment_id', 'name', 'road_type',
+                'coordinates' ([(lat, lng), ...], at least 2 points) and
+                optional 'lanes', 'max_speed' (km/h) and 'oneway'
+            cell_size_m: Grid cell size in meters
+            source: Where the segments came from (reported in stats)
+        """
+        self.cell_size_m = cell_size_m
+        self.source = source
+        segments = [s for s in segments if len(s.get('coordinates') or []) >= 2]
+
+        self.segment_id = np.array([str(s['segment_id']) for s in segments], dtype=object)
+        self.name = np.array([s.get('name') or 'Unnamed Road' for s in segments], dtype=object)
+        self.road_types = sorted({normalize_road_type(s.get('road_type')) for s in segments})
+        type_code = {road_type: code for code, road_type in enumerate(self.road_types)}
+        self.road_type_code = np.array(
+            [type_code[normalize_road_type(s.get('road_type'))] for s in segments], dtype=np.int64
+        )
+        self.lanes = np.array([_number(s.get('lanes'), 0) or 0 for s in segments], dtype=np.float64)
+        self.max_speed = np.array([_number(s.get('max_speed'), 0) or 0 for s in segments], dtype=np.float64)
+        self.oneway = np.array([bool(s.get('oneway')) for s in segments], dtype=bool)
+
+        # Flat point arrays; segment i owns points point_start[i]:point_start[i + 1]
+        counts = np.array([len(s['coordinates']) for s in segments], dtype=np.int64)
+        self.point_start = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        points = np.array([point for s in segments for point in s['coordinates']], dtype=np.float64).reshape(-1, 2)
+        self.lat = points[:, 0]
+        self.lng = points[:, 1]
+
+        n_points = len(points)
+        self.origin_lat = float(self.lat.mean()) if n_points else 0.0
+        self.origin_lng = float(self.lng.mean()) if n_points else 0.0
+        self._m_per_deg_lng = METERS_PER_DEGREE_LNG_EQUATOR * math.cos(math.radians(self.origin_lat))
+        x, y = self._project(self.lat, self.lng)
+
+        # Pieces: consecutive points of the same segment
+        is_last = np.zeros(n_points, dtype=bool)
+        is_last[self.point_start[1:] - 1] = True
+        first = np.flatnonzero(~is_last)
+        self.piece_segment = np.repeat(np.arange(len(segments)), counts - 1)
+        self.ax, self.ay = x[first], y[first]
+        self.bx, self.by = x[first + 1], y[first + 1]
+
+        self.length_m = np.bincount(
+            self.piece_segment, weights=np.hypot(self.bx - self.ax, self.by - self.ay), minlength=len(segments)
+        )
+        self._build_grid()
+        self._build_topology()
+
+    def _project(self, lat, lng):
+        """Local equirectangular projection in meters"""
+        x = (np.asarray(lng, dtype=np.float64) - self.origin_lng) * self._m_per_deg_lng
+        y = (np.asarray(lat, dtype=np.float64) - self.origin_lat) * METERS_PER_DEGREE_LAT
+        return x, y
+
+    def _build_grid(self):
+        """Register every piece in each cell of its bounding box (vectorized)"""
+        size = self.cell_size_m
+        min_cx = np.floor(np.minimum(self.ax, self.bx) / size).astype(np.int64)
+        max_cx = np.floor(np.maximum(self.ax, self.bx) / size).astype(np.int64)
+        min_cy = np.floor(np.minimum(self.ay, self.by) / size).astype(np.int64)
+        max_cy = np.floor(np.maximum(self.ay, self.by) / size).astype(np.int64)
+        width = max_cx - min_cx + 1
+        cells_per_piece = width * (max_cy - min_cy + 1)
+
+        pieces = np.repeat(np.arange(len(self.ax)), cells_per_piece)
+        offset = np.arange(cells_per_piece.sum()) - np.repeat(np.cumsum(cells_per_piece) - cells_per_piece, cells_per_piece)
+        cx = min_cx[pieces] + offset % width[pieces]
+        cy = min_cy[pieces] + offset // width[pieces]
+        keys = cx * 1_000_003 + cy
+
+        order = np.argsort(keys, kind='stable')
+        self._cell_keys, starts = np.unique(keys[order], return_index=True)
+        self._cell_start = np.concatenate([starts, [len(keys)]]).astype(np.int64)
+        self._cell_pieces = pieces[order]
+
+    def _build_topology(self):
+        """
+        Graph nodes and links
+
+        Nodes are segment end points and points shared by several segments
+        (same coordinates to 1e-6 degrees); a link is the part of a segment
+        between two consecutive nodes. piece_link maps pieces to links.
+        """
+        n_points = len(self.lat)
+        point_segment = np.repeat(np.arange(self.n_segments), np.diff(self.point_start))
+        keys = np.rint(self.lat * 1e6).astype(np.int64) * 1_000_000_000 + np.rint(self.lng * 1e6).astype(np.int64)
+        _, location = np.unique(keys, return_inverse=True)
+
+        # Points used by more than one segment are intersections
+        pairs = np.unique(np.column_stack([location, point_segment]), axis=0)
+        shared = np.bincount(pairs[:, 0], minlength=location.max() + 1 if n_points else 0) > 1
+        is_node = shared[location]
+        is_node[self.point_start[:-1]] = True
+        is_node[self.point_start[1:] - 1] = True
+
+        node_points = np.flatnonzero(is_node)
+        node_locations, self.point_node = np.unique(location[node_points], return_inverse=True)
+        first_point = np.zeros(len(node_locations), dtype=np.int64)
+        first_point[self.point_node[::-1]] = node_points[::-1]
+        self.node_lat, self.node_lng = self.lat[first_point], self.lng[first_point]
+
+        # Distance along the segment of every point
+        step = np.zeros(n_points)
+        step[np.flatnonzero(~np.isin(np.arange(n_points), self.point_start[:-1]))] = np.hypot(self.bx - self.ax, self.by - self.ay)
+        along = np.cumsum(step)
+        along -= np.repeat(along[self.point_start[:-1]], np.diff(self.point_start))
+
+        same_segment = point_segment[node_points[1:]] == point_segment[node_points[:-1]]
+        self.link_from = self.point_node[:-1][same_segment]
+        self.link_to = self.point_node[1:][same_segment]
+        self.link_segment = point_segment[node_points[:-1]][same_segment]
+        self.link_length_m = np.maximum((along[node_points[1:]] - along[node_points[:-1]])[same_segment], 1.0)
+        self.link_first_point = node_points[:-1][same_segment]
+        self.link_last_point = node_points[1:][same_segment]
+
+        # Piece -> link: last node at or before the piece start
+        link_of_pair = np.cumsum(same_segment) - 1
+        piece_start = np.flatnonzero(~np.isin(np.arange(n_points), self.point_start[1:] - 1))
+        self.piece_link = link_of_pair[np.searchsorted(node_points, piece_start, side='right') - 1]
+
+    @property
+    def n_segments(self):
+        return len(self.segment_id)
+
+    # ============================================================
+    # QUERY
+    # ============================================================
+
+    def segments_within(self, lat, lng, radius_m):
+        """
+        Segments with any point within radius_m of (lat, lng)
+
+        Returns:
+            tuple: (segment indices, distances in meters), nearest first
+        """
+        pieces, distances = self.pieces_within(lat, lng, radius_m)
+        segments = self.piece_segment[pieces]
+
+        # Closest piece per segment
+        order = np.lexsort((distances, segments))
+        segments, distances = segments[order], distances[order]
+        first = np.concatenate([[True], segments[1:] != segments[:-1]]) if len(segments) else np.zeros(0, dtype=bool)
+        segments, distances = segments[first], distances[first]
+
+        nearest = np.argsort(distances, kind='stable')
+        return segments[nearest], distances[nearest]
+
+    def pieces_within(self, lat, lng, radius_m):
+        """Pieces within radius_m of (lat, lng) and their distances in meters"""
+        if len(self._cell_keys) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        px, py = self._project(lat, lng)
+        px, py = float(px), float(py)
+        reach = int(math.ceil(radius_m / self.cell_size_m))
+        center_cx, center_cy = math.floor(px / self.cell_size_m), math.floor(py / self.cell_size_m)
+        cx, cy = np.meshgrid(
+            np.arange(center_cx - reach, center_cx + reach + 1),
+            np.arange(center_cy - reach, center_cy + reach + 1),
+            indexing='ij'
+        )
+        keys = (cx * 1_000_003 + cy).ravel()
+
+        position = np.minimum(np.searchsorted(self._cell_keys, keys), len(self._cell_keys) - 1)
+        found = self._cell_keys[position] == keys
+        position = position[found]
+        if len(position) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        pieces = np.unique(np.concatenate([
+            self._cell_pieces[start:end]
+            for start, end in zip(self._cell_start[position], self._cell_start[position + 1])
+        ]))
+
+        # Point-to-piece distance (projection clamped to the piece)
+        ax, ay, bx, by = self.ax[pieces], self.ay[pieces], self.bx[pieces], self.by[pieces]
+        dx, dy = bx - ax, by - ay
+        length_sq = dx * dx + dy * dy
+        t = np.clip(np.divide((px - ax) * dx + (py - ay) * dy, length_sq, out=np.zeros_like(dx), where=length_sq > 0), 0, 1)
+        distances = np.hypot(ax + t * dx - px, ay + t * dy - py)
+
+        within = distances <= radius_m
+        return pieces[within], distances[within]
+
+    def segment_speed_kmh(self):
+        """Free-flow speed of every segment (tagged, else by road type)"""
+        defaults = np.array([DEFAULT_SPEED_KMH.get(road_type, 30) for road_type in self.road_types] or [30], dtype=np.float64)
+        return np.where(self.max_speed > 0, self.max_speed, defaults[self.road_type_code])
+
+    def directed_links(self):
+        """
+        Every link forward, two-way links also backward
+
+        Returns:
+            tuple: (link, forward, from node, to node) per directed link
+        """
+        backward = np.flatnonzero(~self.oneway[self.link_segment])
+        link = np.concatenate([np.arange(len(self.link_from)), backward])
+        forward = np.concatenate([np.ones(len(self.link_from), dtype=bool), np.zeros(len(backward), dtype=bool)])
+        link_from = np.where(forward, self.link_from[link], self.link_to[link])
+        link_to = np.where(forward, self.link_to[link], self.link_from[link])
+        return link, forward, link_from, link_to
+
+    def segment_indices(self, segment_ids):
+        """Segment index of every known ID (unknown IDs are skipped)"""
+        if not hasattr(self, '_segment_lookup'):
+            self._segment_lookup = {segment_id: i for i, segment_id in enumerate(self.segment_id.tolist())}
+        return [self._segment_lookup[str(segment_id)] for segment_id in segment_ids if str(segment_id) in self._segment_lookup]
+
+    def link_coordinates(self, link, forward=True):
+        """[[lat, lng], ...] of one link, in travel direction"""
+        points = slice(self.link_first_point[link], self.link_last_point[link] + 1)
+        coordinates = np.column_stack([self.lat[points], self.lng[points]])
+        return coordinates if forward else coordinates[::-1]
+
+    def road_type_of(self, segments):
+        return [self.road_types[code] for code in self.road_type_code[segments].tolist()]
+
+    def road_type_factors(self, segments, factors, default=0.8):
+        """road_type_factors value of every segment (one lookup per road type)"""
+        table = np.array([factors.get(road_type, default) for road_type in self.road_types] or [default])
+        return table[self.road_type_code[segments]]
+
+    def coordinates(self, segment):
+        """[[lat, lng], ...] of one segment"""
+        start, end = self.point_start[segment], self.point_start[segment + 1]
+        return np.column_stack([self.lat[start:end], self.lng[start:end]]).round(6).tolist()
+
+    def stats(self):
+        return {
+            'source': self.source,
+            'segments': self.n_segments,
+            'pieces': len(self.ax),
+            'nodes': len(self.node_lat),
+            'links': len(self.link_from),
+            'grid_cells': len(self._cell_keys),
+            'cell_size_m': self.cell_size_m,
+            'total_length_km': round(float(self.length_m.sum()) / 1000, 1)
+        }
+
+    # ============================================================
+    # LOADING
+    # ============================================================
+
+    @classmethod
+    def from_geojson(cls, path, **kwargs):
+        """LineString / MultiLineString features (e.g. an OSM extract exported as GeoJSON)"""
+        with open(path, 'r', encoding='utf-8') as f:
+            collection = json.load(f)
+
+        segments = []
+        for number, feature in enumerate(collection.get('features', [])):
+            geometry = feature.get('geometry') or {}
+            properties = feature.get('properties') or {}
+            road_type = properties.get('highway') or properties.get('road_type')
+            if 'highway' in properties and properties['highway'] not in ROAD_HIGHWAY_TYPES:
+                continue
+
+            if geometry.get('type') == 'LineString':
+                lines = [geometry['coordinates']]
+            elif geometry.get('type') == 'MultiLineString':
+                lines = geometry['coordinates']
+            else:
+                continue
+
+            segment_id = feature.get('id') or properties.get('@id') or properties.get('osm_id') or properties.get('segment_id') or number
+            for part, line in enumerate(lines):
+                segments.append({
+                    'segment_id': segment_id if len(lines) == 1 else f"{segment_id}-{part}",
+                    'name': properties.get('name') or properties.get('segment_name'),
+                    'road_type': road_type,
+                    'lanes': properties.get('lanes') or properties.get('num_lanes'),
+                    'max_speed': properties.get('maxspeed') or properties.get('free_flow_speed'),
+                    'oneway': _oneway(properties.get('oneway'), road_type),
+                    'coordinates': [(point[1], point[0]) for point in line]
+                })
+        return cls(segments, source=f'file:{os.path.basename(path)}', **kwargs)
+
+    @classmethod
+    def from_osm_xml(cls, path, **kwargs):
+        """Highway ways of a raw .osm extract"""
+        nodes = {}
+        segments = []
+        for _, element in ET.iterparse(path, events=('end',)):
+            if element.tag == 'node':
+                nodes[element.get('id')] = (float(element.get('lat')), float(element.get('lon')))
+                element.clear()
+            elif element.tag == 'way':
+                tags = {tag.get('k'): tag.get('v') for tag in element.findall('tag')}
+                if tags.get('highway') in ROAD_HIGHWAY_TYPES:
+                    coordinates = [nodes[nd.get('ref')] for nd in element.findall('nd') if nd.get('ref') in nodes]
+                    segments.append({
+                        'segment_id': f"way/{element.get('id')}",
+                        'name': tags.get('name'),
+                        'road_type': tags['highway'],
+                        'lanes': tags.get('lanes'),
+                        'max_speed': tags.get('maxspeed'),
+                        'oneway': _oneway(tags.get('oneway'), tags['highway']),
+                        'coordinates': coordinates
+                    })
+                element.clear()
+        return cls(segments, source=f'file:{os.path.basename(path)}', **kwargs)
+
+    @classmethod
+    def from_database(cls, db, **kwargs):
+        """Rows of the segments table (DatabaseService.get_road_segments)"""
+        segments = [
+            {
+                'segment_id': row['segment_id'],
+                'name': row.get('segment_name'),
+                'road_type': row.get('road_type'),
+                'lanes': row.get('num_lanes'),
+                'max_speed': row.get('free_flow_speed'),
+                'coordinates': [(point[1], point[0]) for point in (row.get('geometry') or {}).get('coordinates', [])]
+            }
+            for row in db.get_road_segments()
+        ]
+        return cls(segments, source='database:segments', **kwargs)
+
+
+def load_road_network(db=None):
+    """
+    Road network for affected-segment scoring, or None when unavailable
+
+    ROAD_NETWORK_SOURCE: 'auto' (default: file if present, else the
+    segments table), 'file', 'database' or 'none'. ROAD_NETWORK_FILE
+    points to a .geojson or .osm extract.
+    """
+    source = os.getenv('ROAD_NETWORK_SOURCE', 'auto').lower()
+    path = os.getenv('ROAD_NETWORK_FILE', DEFAULT_NETWORK_FILE)
+    cell_size_m = float(os.getenv('ROAD_NETWORK_CELL_M', '250'))
+
+    if source == 'none':
+        return None
+
+    network = None
+    try:
+        if source in ('auto', 'file') and os.path.exists(path):
+            if path.lower().endswith('.osm'):
+                network = RoadNetwork.from_osm_xml(path, cell_size_m=cell_size_m)
+            else:
+                network = RoadNetwork.from_geojson(path, cell_size_m=cell_size_m)
+        elif source == 'file':
+            print(f"⚠ Road network file not found at {path}")
+        if network is None and source in ('auto', 'database') and db is not None:
+            network = RoadNetwork.from_database(db, cell_size_m=cell_size_m)
+    except (OSError, ValueError, KeyError, ET.ParseError) as e:
+        print(f"⚠ Road network could not be loaded: {e}")
+        return None
+
+    if network is None or network.n_segments == 0:
+        return None
+    print(f"✓ Road network loaded ({network.n_segments:,} segments from {network.source})")
+    return network
+
+
+class RoadNetworkLoader:
+    """
+    Loads the network once, on first use
+
+    A failed or empty load (e.g. the database was briefly unreachable) is
+    not remembered for good: get() returns None and tries again once
+    retry_s has passed.
+    """
+
+    def __init__(self, db=None, retry_s=None):
+        self.db = db
+        self.retry_s = retry_s if retry_s is not None else float(os.getenv('ROAD_NETWORK_RETRY_S', '60'))
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._network = None
+        self._retry_at = 0.0
+        self.failures = 0
+
+    def get(self):
+        if self._network is None and time.monotonic() >= self._retry_at:
+            with self._lock:
+                if self._network is None and time.monotonic() >= self._retry_at:
+                    self._network = load_road_network(self.db)
+                    self._loaded = True
+                    if self._network is None:
+                        self.failures += 1
+                        self._retry_at = time.monotonic() + self.retry_s
+        return self._network
+
+    def reset_after_fork(self):
+        """Fresh lock in a forked worker (the parent may have held it)"""
+        self._lock = threading.Lock()
+
+    def stats(self):
+        if not self._loaded:
+            return {'loaded': False}
+        if self._network is None:
+            return {
+                'loaded': True,
+                'available': False,
+                'failures': self.failures,
+                'retry_in_s': round(max(self._retry_at - time.monotonic(), 0), 1)
+            }
+        return {'loaded': True, 'available': True, **self._network.stats()}
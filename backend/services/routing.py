@@ -0,0 +1,362 @@
+# backend/services/routing.py
+
+import heapq
+import math
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
+
+
+def encode_polyline(coordinates):
+    """Google encoded polyline of [[lat, lng], ...]"""
+    encoded = []
+    previous_lat = previous_lng = 0
+    for lat, lng in coordinates:
+        lat, lng = int(round(lat * 1e5)), int(round(lng * 1e5))
+        for delta in (lat - previous_lat, lng - previous_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                encoded.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            encoded.append(chr(value + 63))
+        previous_lat, previous_lng = lat, lng
+    return ''.join(encoded)
+
+
+class RoutingEngine:
+    """
+    Point-to-point routing on a RoadNetwork (A* with landmarks, ALT)
+
+    Shortest travel times from and to a few far-apart landmarks are
+    computed once with scipy csgraph; by the triangle inequality they give
+    a lower bound on the remaining time from any node, which steers A*
+    straight at the destination. The bounds stay valid while edge weights
+    only grow, so the same index serves disruption delays, closures and
+    the penalties used to find alternate routes without re-preprocessing.
+    """
+
+    def __init__(self, network, n_landmarks=16, active_landmarks=4):
+        """
+        Args:
+            network: RoadNetwork
+            n_landmarks: Landmarks in the index
+            active_landmarks: Landmarks used per query (best bounds at the origin)
+        """
+        self.network = network
+        self.active_landmarks = active_landmarks
+        link, forward, link_from, link_to = network.directed_links()
+        speed_ms = network.segment_speed_kmh()[network.link_segment[link]] / 3.6
+        travel_time = np.maximum(network.link_length_m[link] / speed_ms, 0.01)
+        n = len(network.node_lat)
+
+        # Largest strongly connected part: every node reaches every other
+        graph = csr_matrix((travel_time, (link_from, link_to)), shape=(n, n))
+        _, component = connected_components(graph, directed=True, connection='strong')
+        self.in_graph = component == np.argmax(np.bincount(component)) if n else np.zeros(0, dtype=bool)
+        keep = np.flatnonzero(self.in_graph[link_from] & self.in_graph[link_to])
+
+        # Edges grouped by start node (CSR)
+        keep = keep[np.argsort(link_from[keep], kind='stable')]
+        self.edge_link = link[keep]
+        self.edge_forward = forward[keep]
+        self.edge_segment = network.link_segment[self.edge_link]
+        self.edge_time = travel_time[keep]
+        self.edge_start = np.concatenate([[0], np.cumsum(np.bincount(link_from[keep], minlength=n))])
+
+        # Python lists: the A* loop indexes them element by element
+        self._start = self.edge_start.tolist()
+        self._from = link_from[keep].tolist()
+        self._to = link_to[keep].tolist()
+        self._time = self.edge_time.tolist()
+
+        self._build_landmarks(n_landmarks, link_from[keep], link_to[keep])
+
+    def _build_landmarks(self, n_landmarks, edge_from, edge_to):
+        """Farthest-point landmarks and travel times from / to each of them"""
+        n = len(self.network.node_lat)
+        graph = csr_matrix((self.edge_time, (edge_from, edge_to)), shape=(n, n))
+        nodes = np.flatnonzero(self.in_graph)
+        if len(nodes) == 0:
+            self.landmarks = np.zeros(0, dtype=np.int64)
+            self._from_landmark = self._to_landmark = np.zeros((0, n))
+            return
+
+        landmarks = []
+        closest = np.full(n, np.inf)
+        closest[~self.in_graph] = -np.inf
+        candidate = nodes[0]
+        for _ in range(min(n_landmarks, len(nodes))):
+            distances = dijkstra(graph, directed=False, indices=candidate)
+            if not landmarks:
+                # Start from the node farthest from an arbitrary one
+                candidate = int(np.argmax(np.where(self.in_graph, distances, -np.inf)))
+                distances = dijkstra(graph, directed=False, indices=candidate)
+            landmarks.append(candidate)
+            closest = np.minimum(closest, distances)
+            candidate = int(np.argmax(closest))
+
+        self.landmarks = np.array(landmarks, dtype=np.int64)
+        unreachable = ~self.in_graph
+        self._from_landmark = dijkstra(graph, directed=True, indices=self.landmarks)
+        self._to_landmark = dijkstra(graph.T.tocsr(), directed=True, indices=self.landmarks)
+        self._from_landmark[:, unreachable] = 0
+        self._to_landmark[:, unreachable] = 0
+
+    # ============================================================
+    # QUERY
+    # ============================================================
+
+    def snap(self, lat, lng, max_distance_m):
+        """Routable node nearest to (lat, lng) within max_distance_m, else None"""
+        network = self.network
+        pieces, distances = network.pieces_within(lat, lng, max_distance_m)
+        if len(pieces) == 0:
+            return None
+
+        # End nodes of the closest links, nearest routable one wins
+        links = network.piece_link[pieces[np.argsort(distances, kind='stable')[:8]]]
+        nodes = np.unique(np.concatenate([network.link_from[links], network.link_to[links]]))
+        nodes = nodes[self.in_graph[nodes]]
+        if len(nodes) == 0:
+            return None
+        x, y = network._project(network.node_lat[nodes], network.node_lng[nodes])
+        px, py = network._project(lat, lng)
+        return int(nodes[np.argmin(np.hypot(x - px, y - py))])
+
+    def edge_weights(self, segment_delays=None, closed_segments=()):
+        """
+        Edge weight overrides for a disruption
+
+        Args:
+            segment_delays: {segment index: added seconds per traversal},
+                spread over the segment's links by length
+            closed_segments: Segment indices that cannot be used
+
+        Returns:
+            dict: {edge: travel time in seconds} for the changed edges
+        """
+        weights = {}
+        if segment_delays:
+            segments = np.fromiter(segment_delays.keys(), dtype=np.int64)
+            delays = np.fromiter(segment_delays.values(), dtype=np.float64)
+            edges = np.flatnonzero(np.isin(self.edge_segment, segments))
+            position = np.searchsorted(np.sort(segments), self.edge_segment[edges])
+            delays = delays[np.argsort(segments)][position]
+            share = self.network.link_length_m[self.edge_link[edges]] / self.network.length_m[self.edge_segment[edges]]
+            weights.update(zip(edges.tolist(), (self.edge_time[edges] + delays * np.minimum(share, 1.0)).tolist()))
+        if len(closed_segments):
+            weights.update(dict.fromkeys(np.flatnonzero(np.isin(self.edge_segment, list(closed_segments))).tolist(), math.inf))
+        return weights
+
+    def _heuristic(self, source, target):
+        """Lower bound on the travel time to target, per node (closure)"""
+        to_target = self._to_landmark[:, target]
+        from_target = self._from_landmark[:, target]
+        bounds = np.maximum(self._to_landmark[:, source] - to_target, from_target - self._from_landmark[:, source])
+        active = np.argsort(-bounds)[:self.active_landmarks]
+
+        rows = [
+            (memoryview(self._to_landmark[i]), float(to_target[i]), memoryview(self._from_landmark[i]), float(from_target[i]))
+            for i in active.tolist()
+        ]
+
+        def heuristic(node):
+            best = 0.0
+            for to_landmark, to_target_i, from_landmark, from_target_i in rows:
+                bound = to_landmark[node] - to_target_i
+                if bound > best:
+                    best = bound
+                bound = from_target_i - from_landmark[node]
+                if bound > best:
+                    best = bound
+            return best
+
+        return heuristic
+
+    def shortest_path(self, source, target, weights=None):
+        """
+        A* from source to target
+
+        Args:
+            weights: Edge weight overrides (edge_weights); must not be below
+                the free-flow times or the landmark bounds stop holding
+
+        Returns:
+            list or None: Edge indices of the path, None if unreachable
+        """
+        if source == target:
+            return []
+        weights = weights or {}
+        start, to, base_time = self._start, self._to, self._time
+        heuristic = self._heuristic(source, target)
+        push, pop = heapq.heappush, heapq.heappop
+
+        best = {source: 0.0}
+        via_edge = {}
+        settled = set()
+        heap = [(heuristic(source), 0.0, source)]
+        while heap:
+            _, cost, node = pop(heap)
+            if node == target:
+                break
+            if node in settled:
+                continue
+            settled.add(node)
+
+            for edge in range(start[node], start[node + 1]):
+                weight = weights.get(edge, base_time[edge]) if weights else base_time[edge]
+                next_node = to[edge]
+                next_cost = cost + weight
+                if next_cost < best.get(next_node, math.inf):
+                    best[next_node] = next_cost
+                    via_edge[next_node] = edge
+                    push(heap, (next_cost + heuristic(next_node), next_cost, next_node))
+        else:
+            return None
+
+        path = []
+        node = target
+        while node != source:
+            edge = via_edge[node]
+            path.append(edge)
+            node = self._from[edge]
+        return path[::-1]
+
+    def routes(self, source, target, weights=None, alternatives=0, max_stretch=1.4, max_overlap=0.7,
+               penalty=1.4, max_attempts=8):
+        """
+        Best route plus up to `alternatives` alternate routes
+
+        Alternates come from the penalty method: the edges of every route
+        found get `penalty` times heavier and the search is repeated. A
+        candidate is kept when it is at most max_stretch slower than the
+        best route and shares at most max_overlap of its length with
+        every route already kept.
+
+        Returns:
+            list: Edge lists, best first (empty if unreachable)
+        """
+        weights = weights or {}
+        best = self.shortest_path(source, target, weights)
+        if best is None:
+            return []
+        if not best:
+            # Source and target are the same node: nothing to route around
+            return [best]
+        found = [best]
+        best_time = self.path_time(best, weights)
+        penalized = dict(weights)
+        link_length = self.network.link_length_m
+
+        candidate = best
+        for _ in range(max_attempts):
+            if len(found) > alternatives:
+                break
+            for edge in candidate:
+                penalized[edge] = penalized.get(edge, self._time[edge]) * penalty
+            candidate = self.shortest_path(source, target, penalized)
+            if candidate is None or self.path_time(candidate, weights) > best_time * max_stretch:
+                break
+
+            candidate_links = set(self.edge_link[candidate].tolist())
+            length = sum(link_length[link] for link in candidate_links)
+            if length <= 0:
+                continue
+            overlap = max(
+                sum(link_length[link] for link in candidate_links & set(self.edge_link[route].tolist())) / length
+                for route in found
+            )
+            if overlap <= max_overlap:
+                found.append(candidate)
+        return found
+
+    def path_time(self, path, weights=None):
+        """Travel time (seconds) of an edge list under the given overrides"""
+        weights = weights or {}
+        return sum(weights.get(edge, self._time[edge]) for edge in path)
+
+    def describe(self, path, weights=None):
+        """Geometry, distance, times and road names of a path"""
+        network = self.network
+        weights = weights or {}
+        edges = np.asarray(path, dtype=np.int64)
+        links, forward = self.edge_link[edges], self.edge_forward[edges]
+
+        pieces = [network.link_coordinates(link, direction) for link, direction in zip(links.tolist(), forward.tolist())]
+        coordinates = np.concatenate([pieces[0]] + [piece[1:] for piece in pieces[1:]]) if pieces else np.zeros((0, 2))
+
+        free_flow_s = float(self.edge_time[edges].sum())
+        duration_s = float(self.path_time(path, weights))
+
+        # Consecutive edges on the same road form one step
+        names = network.name[self.edge_segment[edges]].tolist()
+        lengths = network.link_length_m[links].tolist()
+        times = [weights.get(edge, self._time[edge]) for edge in path]
+        steps = []
+        for name, length, travel_time, piece in zip(names, lengths, times, pieces):
+            if steps and steps[-1]['road_name'] == name:
+                steps[-1]['distance_m'] += length
+                steps[-1]['duration_s'] += travel_time
+                steps[-1]['coordinates'].extend(piece[1:].tolist())
+            else:
+                steps.append({'road_name': name, 'distance_m': length, 'duration_s': travel_time, 'coordinates': piece.tolist()})
+
+        via = sorted({step['road_name'] for step in steps}, key=lambda name: -sum(s['distance_m'] for s in steps if s['road_name'] == name))
+        return {
+            'coordinates': coordinates.round(6).tolist(),
+            'distance_m': round(float(network.link_length_m[links].sum()), 1),
+            'duration_s': round(duration_s, 1),
+            'free_flow_s': round(free_flow_s, 1),
+            'delay_s': round(max(duration_s - free_flow_s, 0.0), 1),
+            'via': via[:3],
+            'segment_ids': list(dict.fromkeys(network.segment_id[self.edge_segment[edges]].tolist())),
+            'steps': steps
+        }
+
+    def stats(self):
+        return {
+            'nodes': int(self.in_graph.sum()),
+            'edges': len(self.edge_link),
+            'landmarks': len(self.landmarks)
+        }
+
+
+def directions_json(routes):
+    """Described routes in the Google Directions response layout the frontend reads"""
+    def text(distance_m=None, duration_s=None):
+        if distance_m is not None:
+            return f"{distance_m / 1000:.1f} km" if distance_m >= 1000 else f"{int(round(distance_m))} m"
+        return f"{max(int(round(duration_s / 60)), 1)} min"
+
+    google_routes = []
+    for route in routes:
+        coordinates = route['coordinates']
+        if not coordinates:
+            # Zero-length route (origin and destination on the same node)
+            continue
+        steps = [
+            {
+                'html_instructions': f"{'Head along' if i == 0 else 'Continue onto'} <b>{step['road_name']}</b>",
+                'distance': {'value': int(round(step['distance_m'])), 'text': text(distance_m=step['distance_m'])},
+                'duration': {'value': int(round(step['duration_s'])), 'text': text(duration_s=step['duration_s'])},
+                'start_location': {'lat': step['coordinates'][0][0], 'lng': step['coordinates'][0][1]},
+                'end_location': {'lat': step['coordinates'][-1][0], 'lng': step['coordinates'][-1][1]},
+                'polyline': {'points': encode_polyline(step['coordinates'])},
+                'travel_mode': 'DRIVING'
+            }
+            for i, step in enumerate(route['steps'])
+        ]
+        google_routes.append({
+            'summary': ', '.join(route['via']),
+            'legs': [{
+                'distance': {'value': int(round(route['distance_m'])), 'text': text(distance_m=route['distance_m'])},
+                'duration': {'value': int(round(route['duration_s'])), 'text': text(duration_s=route['duration_s'])},
+                'start_location': {'lat': coordinates[0][0], 'lng': coordinates[0][1]},
+                'end_location': {'lat': coordinates[-1][0], 'lng': coordinates[-1][1]},
+                'steps': steps
+            }],
+            'overview_polyline': {'points': encode_polyline(coordinates)},
+            'warnings': []
+        })
+    return {'status': 'OK' if google_routes else 'ZERO_RESULTS', 'routes': google_routes, 'source': 'local'}
@@ -0,0 +1,72 @@
+# backend/services/scheduling.py
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from services.aggregation import severity_classes
+
+
+class StartTimeRanking:
+    """
+    Rank every start hour of a fixed-length disruption window
+
+    Takes hourly severities and delays over the whole search range (the
+    union of every candidate's hours, predicted once) and scores each
+    start with sliding-window reductions: cumulative sums for total delay,
+    heavy hours and severity, a strided max for peak severity.
+
+    Candidates are ordered by total delay, then heavy hours, then peak
+    severity (all lower is better).
+    """
+
+    def __init__(self, severities, delays, window_hours):
+        self.severities = np.asarray(severities, dtype=np.float64)
+        self.delays = np.asarray(delays, dtype=np.float64)
+        self.window_hours = int(window_hours)
+        self.n_candidates = max(len(self.severities) - self.window_hours + 1, 0)
+
+        if self.n_candidates == 0:
+            self.total_delay = self.heavy_hours = self.severity_sum = self.peak_severity = np.zeros(0)
+            self.order = np.zeros(0, dtype=np.int64)
+            return
+
+        def window_sums(values):
+            cumulative = np.concatenate([[0], np.cumsum(values)])
+            return cumulative[self.window_hours:] - cumulative[:-self.window_hours]
+
+        self.total_delay = window_sums(self.delays)
+        self.heavy_hours = window_sums(severity_classes(self.severities) == 2).astype(np.int64)
+        self.severity_sum = window_sums(self.severities)
+        self.peak_severity = sliding_window_view(self.severities, self.window_hours).max(axis=1)
+
+        # Delays are rounded to 0.1 min - round sums so float noise cannot reorder ties
+        self.order = np.lexsort((self.peak_severity, self.heavy_hours, np.round(self.total_delay, 6)))
+
+    def top(self, k=5, min_gap_hours=0):
+        """
+        Offsets of the k best start hours
+
+        Args:
+            k: Number of start times
+            min_gap_hours: Keep picked starts at least this far apart
+                (0 = adjacent hours allowed)
+        """
+        if min_gap_hours <= 0:
+            return self.order[:k].tolist()
+
+        picked = []
+        for offset in self.order.tolist():
+            if all(abs(offset - other) >= min_gap_hours for other in picked):
+                picked.append(offset)
+                if len(picked) == k:
+                    break
+        return picked
+
+    def candidate(self, offset):
+        """Scores of one start offset"""
+        return {
+            'total_delay_min': round(float(self.total_delay[offset]), 1),
+            'heavy_hours': int(self.heavy_hours[offset]),
+            'peak_severity': round(float(self.peak_severity[offset]), 2),
+            'avg_severity': round(float(self.severity_sum[offset]) / self.window_hours, 2)
+        }
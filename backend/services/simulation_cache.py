@@ -0,0 +1,184 @@
+# backend/services/simulation_cache.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def scenario_fingerprint(*parts):
+    """
+    Canonical SHA-256 of scenario inputs
+
+    Parts are serialized as JSON with sorted keys and no whitespace, so the
+    same scenario always hashes the same regardless of key order.
+    """
+    canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class SimulationCache:
+    """
+    Thread-safe TTL + LRU cache for simulation responses, capped by size
+
+    Entries expire after ttl_s (or an earlier per-entry deadline, used for
+    realtime runs) and the least recently used ones are evicted once the
+    JSON size of all entries exceeds max_bytes.
+
+    Identical concurrent requests are collapsed: the first caller to
+    acquire() a missing key gets a lease and computes it, later callers
+    wait for its store() / release(key, lease) and then read the result.
+    """
+
+    def __init__(self, max_bytes=None, ttl_s=None):
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv('SIMULATION_CACHE_MAX_MB', '64')) * 1024 * 1024)
+        if ttl_s is None:
+            ttl_s = float(os.getenv('SIMULATION_CACHE_TTL_S', '3600'))
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.enabled = max_bytes > 0 and ttl_s > 0
+
+        self._entries = OrderedDict()  # key -> (payload, size, expires_at)
+        self._inflight = {}            # key -> threading.Event (the leader's lease)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.collapsed = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def acquire(self, key, wait_timeout_s=120, wait=True):
+        """
+        Cached payload for key, or a lease to compute it
+
+        Args:
+            wait_timeout_s: Longest wait on another request computing key
+            wait: False to return at once when key is in flight elsewhere
+
+        Returns:
+            tuple: (payload, lease). With a payload, lease is None. Without
+            one, lease is the caller's claim as the key's leader: call
+            release(key, lease) when done (after store() on success). A
+            None lease (not waiting, or wait timed out) means another
+            request still leads - compute without coordinating.
+        """
+        if not self.enabled:
+            return None, None
+
+        while True:
+            with self._lock:
+                payload = self._get_fresh(key)
+                if payload is not None:
+                    self.hits += 1
+                    return payload, None
+
+                event = self._inflight.get(key)
+                if event is None:
+                    lease = self._inflight[key] = threading.Event()
+                    self.misses += 1
+                    return None, lease
+                self.collapsed += 1
+
+            # Another request is computing the same scenario
+            if not wait or not event.wait(wait_timeout_s):
+                return None, None
+            # Leader stored the result (or failed - then the loop takes over)
+
+    def peek(self, key):
+        """Cached payload for key or None (never waits or claims the key)"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            payload = self._get_fresh(key)
+            if payload is not None:
+                self.hits += 1
+            return payload
+
+    def store(self, key, payload, expires_at=None):
+        """Cache a payload; expires_at (epoch seconds) can shorten the TTL"""
+        if not self.enabled:
+            return
+        size = len(json.dumps(payload, default=str))
+        if size > self.max_bytes:
+            return
+
+        deadline = time.time() + self.ttl_s
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (payload, size, deadline)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def release(self, key, lease):
+        """
+        Give up leadership of key and wake up requests waiting on it
+
+        Only the lease acquire() handed out clears the key, so a caller
+        that gave up waiting can't end another leader's claim. Safe to
+        call more than once and with a None lease.
+        """
+        if lease is None:
+            return
+        with self._lock:
+            if self._inflight.get(key) is lease:
+                del self._inflight[key]
+        lease.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def reset_after_fork(self):
+        """
+        Fresh lock and empty state in a forked worker (the parent may have
+        held the lock or had requests in flight at fork time)
+        """
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._entries = OrderedDict()
+        self.bytes = 0
+
+    def _get_fresh(self, key):
+        """Payload for key if present and not expired (lock held)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        payload, size, deadline = entry
+        if time.time() >= deadline:
+            del self._entries[key]
+            self.bytes -= size
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return payload
+
+    def stats(self):
+        """Counters for the health endpoint"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_s': self.ttl_s,
+                'hits': self.hits,
+                'misses': self.misses,
+                'collapsed': self.collapsed,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'in_flight': len(self._inflight),
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
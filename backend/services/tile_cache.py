@@ -0,0 +1,203 @@
+# backend/services/tile_cache.py
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+def tile_key(lat, lng, zoom):
+    """Slippy-map tile (zoom, x, y) containing a point"""
+    n = 2 ** zoom
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return zoom, min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+class _Flight:
+    """One fetch in progress; followers wait on it and share its outcome"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TileCache:
+    """
+    Thread-safe TTL cache for upstream traffic data, keyed by map tile
+
+    Entries younger than ttl_s are served as is. For a further grace_s
+    they are still served, but the first such hit starts a background
+    refresh; after that the next caller fetches synchronously.
+
+    Identical concurrent fetches are collapsed: the first caller for a
+    missing key runs fetch(), later callers wait for it and get the same
+    value (or the same exception). Failures are not cached.
+    """
+
+    def __init__(self, ttl_s=None, grace_s=None, max_entries=None, refresh_workers=2):
+        if ttl_s is None:
+            ttl_s = float(os.getenv('TRAFFIC_CACHE_TTL_S', '120'))
+        if grace_s is None:
+            grace_s = float(os.getenv('TRAFFIC_CACHE_GRACE_S', '180'))
+        if max_entries is None:
+            max_entries = int(os.getenv('TRAFFIC_CACHE_MAX_ENTRIES', '5000'))
+        self.ttl_s = ttl_s
+        self.grace_s = grace_s
+        self.max_entries = max_entries
+        self.enabled = ttl_s > 0 and max_entries > 0
+        self.refresh_workers = refresh_workers
+
+        self._entries = OrderedDict()  # key -> (value, fetched_at)
+        self._inflight = {}            # key -> _Flight
+        self._lock = threading.Lock()
+        self._refresher = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.collapsed = 0
+        self.refreshes = 0
+        self.fetch_errors = 0
+        self.evictions = 0
+
+    def get(self, key, fetch, deadline=None):
+        """
+        Cached value for key, fetching it when missing or expired
+
+        Args:
+            key: Hashable cache key (e.g. ('flow', style, *tile_key(...)))
+            fetch: Zero-argument callable returning the fresh value
+            deadline: time.monotonic() value to stop waiting on another
+                caller's fetch at
+
+        Raises:
+            Whatever fetch() raised (for this caller or the one it joined),
+            or TimeoutError if the deadline passed while waiting
+        """
+        if not self.enabled:
+            return fetch()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = time.monotonic() - fetched_at
+                if age < self.ttl_s:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return value
+                if age < self.ttl_s + self.grace_s:
+                    self.stale_hits += 1
+                    self._entries.move_to_end(key)
+                    if key not in self._inflight:
+                        self._inflight[key] = _Flight()
+                        self.refreshes += 1
+                        self._refresh_pool().submit(self._run, key, fetch)
+                    return value
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.collapsed += 1
+
+        if leader:
+            return self._run(key, fetch, raise_errors=True)
+
+        timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+        if not flight.event.wait(timeout):
+            raise TimeoutError(f"Deadline passed waiting for {key}")
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def age_s(self, key):
+        """Seconds since key was fetched (None if not cached)"""
+        with self._lock:
+            entry = self._entries.get(key)
+        return time.monotonic() - entry[1] if entry is not None else None
+
+    def put(self, key, value):
+        """Store a value fetched elsewhere (e.g. by the realtime poller)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        """Insert as most recent and evict past max_entries (lock held)"""
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _run(self, key, fetch, raise_errors=False):
+        """Fetch key, store it and wake everyone waiting on it"""
+        with self._lock:
+            flight = self._inflight.get(key)
+        try:
+            value = fetch()
+        except Exception as e:
+            with self._lock:
+                self.fetch_errors += 1
+                self._inflight.pop(key, None)
+            if flight is not None:
+                flight.error = e
+                flight.event.set()
+            if raise_errors:
+                raise
+            print(f"⚠️ Traffic cache refresh failed for {key}: {e}")
+            return None
+
+        with self._lock:
+            self._store(key, value)
+            self._inflight.pop(key, None)
+        if flight is not None:
+            flight.value = value
+            flight.event.set()
+        return value
+
+    def _refresh_pool(self):
+        """Background refresh threads (lock held)"""
+        if self._refresher is None:
+            self._refresher = ThreadPoolExecutor(max_workers=self.refresh_workers, thread_name_prefix='tile-refresh')
+        return self._refresher
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def reset_after_fork(self):
+        """Fresh lock, state and refresh threads in a forked worker"""
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._entries = OrderedDict()
+        self._refresher = None
+
+    def stats(self):
+        """Counters for the health endpoint"""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses + self.collapsed
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_s': self.ttl_s,
+                'grace_s': self.grace_s,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'collapsed': self.collapsed,
+                'refreshes': self.refreshes,
+                'fetch_errors': self.fetch_errors,
+                'evictions': self.evictions,
+                'in_flight': len(self._inflight),
+                'hit_rate': round((lookups - self.misses) / lookups, 3) if lookups else 0.0
+            }
@@ -3,6 +3,11 @@
 import requests
 from datetime import datetime
 import os
+import time
+
+from services.http_client import get_http_client, RateLimited
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from services.tile_cache import TileCache, tile_key
 
 class TrafficAPIService:
     """Service to fetch real-time traffic data from TomTom API"""
@@ -11,22 +16,43 @@ class TrafficAPIService:
         # Get API key from environment variable
         self.api_key = os.getenv('TOMTOM_API_KEY', 'gTkYjtezuYmWeZeTxueWpvNR8PgzST2L')
         self.base_url = "https://api.tomtom.com/traffic/services/4"
+        self.http = get_http_client()
+        # Flow data changes over minutes; nearby points share a tile entry
+        self.cache = TileCache()
+        self.cache_zoom = int(os.getenv('TRAFFIC_CACHE_ZOOM', '18'))
+        # CitySnapshot published by the realtime poller (None until its first poll)
+        self.snapshot = None
+        self.snapshot_max_age_s = float(os.getenv('REALTIME_SNAPSHOT_MAX_AGE_S', '900'))
+        # Points off the polled tiles use the nearest polled point this close
+        self.snapshot_match_m = float(os.getenv('REALTIME_SNAPSHOT_MATCH_M', '750'))
+        # Fail fast while TomTom is down or slow (cache and snapshot still serve)
+        self.breaker = CircuitBreaker('TomTom')
+        self.latency_budget_s = float(os.getenv('TRAFFIC_LATENCY_BUDGET_S', '0')) or None
     
-    def get_traffic_flow(self, lat, lng, radius=500):
+    def get_flow_segment(self, lat, lng, style='absolute', timeout=None, deadline=None, refresh=False):
         """
-        Get real-time traffic flow data for a location
+        Raw TomTom flowSegmentData for the road nearest a point (cached)
+        
+        Points in the same zoom-level tile (TRAFFIC_CACHE_ZOOM, ~150 m at
+        zoom 18) share one upstream call.
         
         Args:
             lat (float): Latitude
             lng (float): Longitude
-            radius (int): Radius in meters (default 500m)
+            style (str): TomTom flow style ('absolute', 'relative', ...)
+            timeout (float): Read timeout override
+            deadline (float): time.monotonic() value to give up at
+            refresh (bool): Skip the cache lookup (the result is still stored)
             
         Returns:
-            dict: Traffic flow data including speed and congestion
+            dict: flowSegmentData (empty if TomTom had none)
+            
+        Raises:
+            requests.exceptions.RequestException: Upstream failure
+            CircuitOpenError: TomTom circuit open (no request made)
         """
-        try:
-            # TomTom Flow Segment Data endpoint
-            url = f"{self.base_url}/flowSegmentData/absolute/10/json"
+        def request_flow():
+            url = f"{self.base_url}/flowSegmentData/{style}/10/json"
             
             params = {
                 'key': self.api_key,
@@ -34,14 +60,64 @@ class TrafficAPIService:
                 'unit': 'KMPH'
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self.http.get(url, params=params, timeout=timeout, deadline=deadline)
             response.raise_for_status()
+            return response.json().get('flowSegmentData', {})
+        
+        def fetch():
+            # Our own rate limit says nothing about TomTom's health
+            return self.breaker.call(request_flow, neutral=RateLimited)
+        
+        key = ('flow', style) + tile_key(lat, lng, self.cache_zoom)
+        if refresh:
+            flow_data = fetch()
+            self.cache.put(key, flow_data)
+            return flow_data
+        try:
+            return self.cache.get(key, fetch, deadline=deadline)
+        except TimeoutError as e:
+            raise requests.exceptions.Timeout(str(e))
+    
+    def snapshot_flow(self, lat, lng):
+        """
+        Flow data for a point from the poller's snapshot
+        
+        Returns:
+            tuple: (flowSegmentData or None, snapshot age in seconds or None)
+        """
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None, None
+        flow_data = snapshot.get(lat, lng, max_age_s=self.snapshot_max_age_s, match_m=self.snapshot_match_m)
+        return (dict(flow_data), round(snapshot.age_s(), 1)) if flow_data is not None else (None, None)
+    
+    def get_traffic_flow(self, lat, lng, radius=500, budget_s=None):
+        """
+        Get real-time traffic flow data for a location
+        
+        Served from the realtime poller's snapshot when it covers the point,
+        otherwise fetched (through the tile cache).
+        
+        Args:
+            lat (float): Latitude
+            lng (float): Longitude
+            radius (int): Radius in meters (default 500m)
+            budget_s (float): Latency budget for this call (default
+                TRAFFIC_LATENCY_BUDGET_S; None = HTTP timeouts only)
             
-            data = response.json()
-            
-            # Extract useful information
-            flow_data = data.get('flowSegmentData', {})
-            
+        Returns:
+            dict: Traffic flow data including speed and congestion
+        """
+        try:
+            flow_data, snapshot_age_s = self.snapshot_flow(lat, lng)
+            if flow_data is None:
+                budget_s = budget_s if budget_s is not None else self.latency_budget_s
+                deadline = time.monotonic() + budget_s if budget_s else None
+                # TomTom Flow Segment Data endpoint
+                flow_data = self.get_flow_segment(lat, lng, deadline=deadline)
+                data_age_s = self.cache.age_s(('flow', 'absolute') + tile_key(lat, lng, self.cache_zoom)) or 0.0
+            else:
+                data_age_s = snapshot_age_s
             return {
                 'success': True,
                 'timestamp': datetime.now().isoformat(),
@@ -52,6 +128,9 @@ class TrafficAPIService:
                 'free_flow_travel_time': flow_data.get('freeFlowTravelTime', 0),
                 'confidence': flow_data.get('confidence', 0),
                 'road_closure': flow_data.get('roadClosure', False),
+                'snapshot_age_s': snapshot_age_s,
+                # How old the flow data is (snapshot or tile cache entry)
+                'data_age_s': round(data_age_s, 1),
                 # Calculate congestion level
                 'congestion_ratio': self._calculate_congestion_ratio(
                     flow_data.get('currentSpeed', 0),
@@ -64,6 +143,7 @@ class TrafficAPIService:
             return {
                 'success': False,
                 'error': str(e),
+                'circuit_open': isinstance(e, CircuitOpenError),
                 'timestamp': datetime.now().isoformat()
             }
     
@@ -85,10 +165,12 @@ class TrafficAPIService:
                 'fields': '{incidents{type,geometry{type,coordinates},properties{iconCategory,magnitudeOfDelay,events{description,code}}}}'
             }
             
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
+            def request_incidents():
+                response = self.http.get(url, params=params)
+                response.raise_for_status()
+                return response.json()
             
-            data = response.json()
+            data = self.breaker.call(request_incidents, neutral=RateLimited)
             incidents = data.get('incidents', [])
             
             # Process incidents
@@ -0,0 +1,433 @@
+# backend/services/traffic_assignment.py
+
+import math
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
+
+# Standard BPR parameters (same as TrafficPredictor.estimate_delay)
+BPR_ALPHA = 0.15
+BPR_BETA = 4
+
+# Lanes (both directions) when the extract has no lanes tag
+DEFAULT_LANES = {
+    'motorway': 4, 'trunk': 4, 'primary': 4, 'secondary': 2,
+    'tertiary': 2, 'unclassified': 2, 'residential': 2, 'service': 1,
+}
+
+
+def bpr_travel_time(free_flow_time, flows, capacity):
+    """t = t0 * [1 + alpha * (V/C)^beta]"""
+    ratio_squared = np.square(flows / capacity)
+    return free_flow_time * (1 + BPR_ALPHA * ratio_squared * ratio_squared)
+
+
+def bpr_derivative(free_flow_time, flows, capacity):
+    """dt/dV of bpr_travel_time"""
+    ratio = flows / capacity
+    return free_flow_time * BPR_ALPHA * BPR_BETA * ratio * ratio * ratio / capacity
+
+
+class TrafficAssignment:
+    """
+    Static user-equilibrium traffic assignment (conjugate Frank-Wolfe)
+
+    Each iteration loads the demand all-or-nothing on the current shortest
+    paths, mixes that solution with the previous search direction so the
+    two are conjugate (Mitradjieva & Lindberg 2013, far fewer iterations
+    than plain Frank-Wolfe) and moves the flows by the step that minimizes
+    the Beckmann objective. Shortest-path trees of all origins
+    come from one scipy csgraph Dijkstra call; the trees are loaded level
+    by level (deepest nodes first), so the work per iteration is a few
+    array operations per tree depth rather than per node.
+    """
+
+    def __init__(self, link_from, link_to, free_flow_time, n_nodes):
+        """
+        Args:
+            link_from, link_to: Directed link end nodes (0..n_nodes-1)
+            free_flow_time: Free-flow travel time per link (minutes)
+            n_nodes: Number of nodes
+        """
+        self.link_from = np.asarray(link_from, dtype=np.int64)
+        self.link_to = np.asarray(link_to, dtype=np.int64)
+        self.free_flow_time = np.maximum(np.asarray(free_flow_time, dtype=np.float64), 1e-6)
+        self.n_nodes = int(n_nodes)
+        self.n_links = len(self.link_from)
+
+        # Parallel links share a node pair; the cheaper one carries its flow
+        self.link_key = self.link_from * self.n_nodes + self.link_to
+        self.pair_keys = np.unique(self.link_key)
+
+    def _shortest_paths(self, costs, origins):
+        """Distances, predecessors and the link used for every node pair"""
+        order = np.lexsort((costs, self.link_key))
+        first = np.concatenate([[True], self.link_key[order][1:] != self.link_key[order][:-1]])
+        pair_link = order[first]
+
+        graph = csr_matrix(
+            (costs[pair_link], (self.link_from[pair_link], self.link_to[pair_link])),
+            shape=(self.n_nodes, self.n_nodes)
+        )
+        distances, predecessors = dijkstra(graph, directed=True, indices=origins, return_predecessors=True)
+        return distances, predecessors, pair_link
+
+    def all_or_nothing(self, costs, origins, demand):
+        """
+        Load demand on the shortest paths of the given link costs
+
+        Args:
+            costs: Link travel times
+            origins: Origin node of every demand row
+            demand: len(origins) x n_nodes trips from origin to node
+
+        Returns:
+            tuple: (link flows, origins x n_nodes shortest distances)
+        """
+        distances, predecessors, pair_link = self._shortest_paths(costs, origins)
+        n_origins, n = predecessors.shape
+
+        # All trees as one forest over flat (origin, node) indices
+        flat = np.arange(n_origins * n)
+        has_parent = predecessors.ravel() >= 0
+        parent = flat.copy()
+        parent[has_parent] = (predecessors + (np.arange(n_origins) * n)[:, None]).ravel()[has_parent]
+
+        # Tree depth by pointer jumping (int16 keeps the sort below a radix sort)
+        depth = has_parent.astype(np.int16)
+        ancestor = parent.copy()
+        while True:
+            next_ancestor = ancestor[ancestor]
+            if np.array_equal(next_ancestor, ancestor):
+                break
+            depth += depth[ancestor]
+            ancestor = next_ancestor
+
+        # Accumulate trips up the trees, one depth level at a time
+        node_flow = np.where(np.isfinite(distances), demand, 0.0).ravel().astype(np.float64)
+        tree_nodes = np.flatnonzero(has_parent)
+        tree_nodes = tree_nodes[np.argsort(depth[tree_nodes], kind='stable')[::-1]]
+        level_depths = depth[tree_nodes]
+        level_start = np.flatnonzero(np.concatenate([[True], level_depths[1:] != level_depths[:-1]]))
+        for start, end in zip(level_start, np.append(level_start[1:], len(tree_nodes))):
+            level = tree_nodes[start:end]
+            np.add.at(node_flow, parent[level], node_flow[level])
+
+        # Flow into a tree node = flow on the link from its predecessor
+        tree_nodes = tree_nodes[node_flow[tree_nodes] > 0]
+        links = pair_link[np.searchsorted(self.pair_keys, (parent[tree_nodes] % n) * n + tree_nodes % n)]
+        flows = np.bincount(links, weights=node_flow[tree_nodes], minlength=self.n_links)
+        return flows, distances
+
+    def _line_search(self, flows, target, capacity, iterations=16):
+        """Step in [0, 1] where the Beckmann objective stops decreasing (bisection)"""
+        direction = target - flows
+        moving = direction != 0
+        flows, direction = flows[moving], direction[moving]
+        free_flow_time, capacity = self.free_flow_time[moving], capacity[moving]
+
+        def slope(step):
+            return direction @ bpr_travel_time(free_flow_time, flows + step * direction, capacity)
+
+        if slope(1.0) <= 0:
+            return 1.0
+        low, high = 0.0, 1.0
+        for _ in range(iterations):
+            middle = (low + high) / 2
+            if slope(middle) > 0:
+                high = middle
+            else:
+                low = middle
+        return (low + high) / 2
+
+    def solve(self, capacity, origins, demand, max_iterations=30, tolerance=1e-3, initial_flows=None):
+        """
+        User equilibrium link flows
+
+        Args:
+            capacity: Link capacities (veh/h)
+            origins, demand: See all_or_nothing
+            max_iterations: Frank-Wolfe iteration limit
+            tolerance: Relative gap at which the assignment has converged
+            initial_flows: Warm start (e.g. the flows of a similar run)
+
+        Returns:
+            dict: flows, times, iterations, relative_gap
+        """
+        capacity = np.maximum(np.asarray(capacity, dtype=np.float64), 1e-6)
+        if initial_flows is None:
+            flows, _ = self.all_or_nothing(self.free_flow_time, origins, demand)
+        else:
+            flows = np.asarray(initial_flows, dtype=np.float64).copy()
+        relative_gap = math.inf
+        iteration = 0
+        previous = None
+
+        for iteration in range(1, max_iterations + 1):
+            costs = bpr_travel_time(self.free_flow_time, flows, capacity)
+            all_or_nothing, _ = self.all_or_nothing(costs, origins, demand)
+            total_time = flows @ costs
+            relative_gap = (total_time - all_or_nothing @ costs) / total_time if total_time > 0 else 0.0
+            if relative_gap < tolerance:
+                break
+
+            # Conjugate direction: blend with the previous target point
+            target = all_or_nothing
+            if previous is not None:
+                hessian = bpr_derivative(self.free_flow_time, flows, capacity)
+                previous_direction = (previous - flows) * hessian
+                denominator = previous_direction @ (all_or_nothing - previous)
+                if denominator != 0:
+                    weight = min(max((previous_direction @ (all_or_nothing - flows)) / denominator, 0.0), 0.99)
+                    target = weight * previous + (1 - weight) * all_or_nothing
+
+            step = self._line_search(flows, target, capacity)
+            flows = flows + step * (target - flows)
+            previous = target
+
+        return {
+            'flows': flows,
+            'times': bpr_travel_time(self.free_flow_time, flows, capacity),
+            'iterations': iteration,
+            'relative_gap': float(relative_gap)
+        }
+
+
+class NetworkImpactModel:
+    """
+    Spill-over of a disruption on the surrounding road network
+
+    Link capacities come from the lane capacity function (HCM per-lane
+    capacity x lanes per direction). A simulation cuts out the network
+    around the disruption, builds gravity-model demand between zone nodes
+    scaled so the disrupted road carries the predicted baseline V/C,
+    solves the equilibrium with and without the capacity reduction and
+    compares link flows and travel times.
+    """
+
+    def __init__(self, network, lane_capacity):
+        """
+        Args:
+            network: RoadNetwork
+            lane_capacity: f(road_type, max_speed) -> veh/h per lane
+                (app.calculate_lane_capacity)
+        """
+        self.network = network
+
+        segment_types = np.array(network.road_types, dtype=object)[network.road_type_code]
+        speed = network.segment_speed_kmh()
+        lanes = np.where(
+            network.lanes > 0, network.lanes,
+            [DEFAULT_LANES.get(road_type, 2) for road_type in segment_types]
+        )
+        lanes_per_direction = np.where(network.oneway, lanes, np.maximum(lanes / 2, 1))
+
+        # One capacity lookup per (road type, speed) combination
+        combos, combo_index = np.unique(
+            np.column_stack([network.road_type_code, speed]), axis=0, return_inverse=True
+        )
+        lane_capacities = np.array([
+            lane_capacity(network.road_types[int(code)], combo_speed) for code, combo_speed in combos
+        ], dtype=np.float64)
+        segment_capacity = lane_capacities[combo_index.ravel()] * lanes_per_direction
+
+        self.link, self.forward, self.link_from, self.link_to = network.directed_links()
+        self.segment = network.link_segment[self.link]
+        self.capacity = segment_capacity[self.segment]
+        self.free_flow_time = network.link_length_m[self.link] / 1000 / speed[self.segment] * 60
+
+    def _zones(self, nodes, weight, radius_m, n_zones):
+        """Up to n_zones heavy nodes spread over a grid (one per cell)"""
+        x, y = self.network._project(self.network.node_lat[nodes], self.network.node_lng[nodes])
+        cell_size = 2 * radius_m / max(math.sqrt(n_zones), 1)
+        cell = np.floor(x / cell_size).astype(np.int64) * 1_000_003 + np.floor(y / cell_size).astype(np.int64)
+        order = np.lexsort((-weight, cell))
+        first = order[np.concatenate([[True], cell[order][1:] != cell[order][:-1]])]
+        return first[np.argsort(-weight[first], kind='stable')][:n_zones]
+
+    def simulate(self, lat, lng, impact_factor, base_v_c, disruption_length_m=0, snap_m=25,
+                 radius_m=2500, n_zones=24, max_iterations=100, tolerance=2e-4, max_segments=50):
+        """
+        Baseline vs disrupted equilibrium around (lat, lng)
+
+        Args:
+            impact_factor: Disruption impact; capacity / (1 + 0.5 * impact)
+                like the V/C increase in estimate_delay
+            base_v_c: Predicted V/C of the disrupted road without disruption
+            disruption_length_m: Disrupted length along the snapped road
+            radius_m: Simulated area around the disruption (0 = whole network)
+
+        Returns:
+            dict or None: Totals and most affected segments, None when no
+            road lies within snap_m of the point, {'available': False,
+            'reason': ...} when no traffic can be routed over the road
+
+        A minor road that no zone-to-zone path uses gets an extra OD pair
+        across it, sized to base_v_c x its capacity, so the baseline
+        actually loads it.
+        """
+        started = time.time()
+        network = self.network
+
+        # Disrupted links: the snapped road, up to half the disruption length away
+        pieces, distances = network.pieces_within(lat, lng, max(snap_m, disruption_length_m / 2))
+        if len(pieces) == 0 or distances.min() > snap_m:
+            return None
+        snapped_segment = network.piece_segment[pieces[np.argmin(distances)]]
+        disrupted_links = np.unique(network.piece_link[pieces[network.piece_segment[pieces] == snapped_segment]])
+
+        # Simulated area
+        if radius_m > 0:
+            area_pieces, area_distances = network.pieces_within(lat, lng, radius_m)
+            in_area = np.isin(self.link, network.piece_link[area_pieces])
+        else:
+            area_pieces, area_distances = None, None
+            in_area = np.ones(len(self.link), dtype=bool)
+        links = np.flatnonzero(in_area)
+        nodes, local = np.unique(np.concatenate([self.link_from[links], self.link_to[links]]), return_inverse=True)
+        local_from, local_to = local[:len(links)], local[len(links):]
+
+        # Keep the part connected (both ways) to the disruption
+        graph = csr_matrix((np.ones(len(links)), (local_from, local_to)), shape=(len(nodes), len(nodes)))
+        _, component = connected_components(graph, directed=True, connection='strong')
+        disrupted = np.isin(self.link[links], disrupted_links)
+        disrupted_component = component[local_from[np.argmax(disrupted)]]
+        keep = (component[local_from] == disrupted_component) & (component[local_to] == disrupted_component)
+        links, local_from, local_to, disrupted = links[keep], local_from[keep], local_to[keep], disrupted[keep]
+        if not disrupted.any():
+            return None
+
+        capacity = self.capacity[links]
+        weight = np.bincount(local_from, weights=capacity, minlength=len(nodes))
+        weight += np.bincount(local_to, weights=capacity, minlength=len(nodes))
+        connected_nodes = np.flatnonzero(weight > 0)
+        zones = connected_nodes[self._zones(nodes[connected_nodes], weight[connected_nodes], radius_m or 5000, n_zones)]
+
+        # Gravity demand between zones
+        zone_x, zone_y = network._project(network.node_lat[nodes[zones]], network.node_lng[nodes[zones]])
+        zone_distance = np.hypot(zone_x[:, None] - zone_x[None, :], zone_y[:, None] - zone_y[None, :])
+        trips = np.outer(weight[zones], weight[zones]) * np.exp(-zone_distance / max(radius_m or 5000, 1) * 2)
+        np.fill_diagonal(trips, 0)
+        demand = np.zeros((len(zones), len(nodes)))
+        demand[:, zones] = trips
+
+        assignment = TrafficAssignment(local_from, local_to, self.free_flow_time[links], len(nodes))
+
+        def disrupted_v_c(flows):
+            return (flows[disrupted] / capacity[disrupted]).max()
+
+        # Scale demand to the predicted baseline V/C (free-flow estimate, then one equilibrium correction)
+        free_flow, _ = assignment.all_or_nothing(assignment.free_flow_time, zones, demand)
+        if free_flow[disrupted].max() > 0:
+            demand *= base_v_c / disrupted_v_c(free_flow)
+        else:
+            # No zone pair routes over the road: background traffic at the
+            # predicted V/C on average, plus through traffic across the road
+            loaded = free_flow > 0
+            if loaded.any():
+                demand *= base_v_c / (free_flow[loaded] / capacity[loaded]).mean()
+            through_link = np.flatnonzero(disrupted)[np.argmax(capacity[disrupted])]
+            origin = local_from[through_link]
+            if origin not in zones:
+                zones = np.append(zones, origin)
+                demand = np.vstack([demand, np.zeros(len(nodes))])
+            demand[np.flatnonzero(zones == origin)[0], local_to[through_link]] += base_v_c * capacity[through_link]
+            free_flow, _ = assignment.all_or_nothing(assignment.free_flow_time, zones, demand)
+            if free_flow[disrupted].max() <= 0:
+                return {
+                    'available': False,
+                    'reason': 'No traffic can be routed over the disrupted road (a shorter path bypasses it)'
+                }
+
+        calibration = assignment.solve(capacity, zones, demand, max_iterations, tolerance * 10)
+        correction = base_v_c / max(disrupted_v_c(calibration['flows']), 1e-9)
+        demand *= correction
+        baseline = assignment.solve(capacity, zones, demand, max_iterations, tolerance,
+                                    initial_flows=calibration['flows'] * correction)
+
+        # Solved from scratch: a run warm-started from the baseline already
+        # meets the gap before the diverted traffic has moved
+        reduced_capacity = np.where(disrupted, capacity / (1 + 0.5 * impact_factor), capacity)
+        with_disruption = assignment.solve(reduced_capacity, zones, demand, max_iterations, tolerance)
+
+        return {
+            'radius_m': radius_m,
+            'nodes': len(nodes),
+            'links': len(links),
+            'zones': len(zones),
+            'base_v_c_ratio': round(float(base_v_c), 2),
+            'capacity_reduction_pct': round((1 - 1 / (1 + 0.5 * impact_factor)) * 100, 1),
+            'iterations': baseline['iterations'] + with_disruption['iterations'],
+            'relative_gap': round(max(baseline['relative_gap'], with_disruption['relative_gap']), 5),
+            'converged': max(baseline['relative_gap'], with_disruption['relative_gap']) < tolerance,
+            **self._summary(links, disrupted, capacity, reduced_capacity, baseline, with_disruption,
+                            area_pieces, area_distances, lat, lng, max_segments),
+            'solve_time_s': round(time.time() - started, 2)
+        }
+
+    def _summary(self, links, disrupted, capacity, reduced_capacity, baseline, with_disruption,
+                 area_pieces, area_distances, lat, lng, max_segments):
+        """Totals and per-segment changes (busier direction of each segment)"""
+        network = self.network
+        flows_before, flows_after = baseline['flows'], with_disruption['flows']
+        extra_vehicle_hours = (flows_after * with_disruption['times'] - flows_before * baseline['times']) / 60
+        added_time = with_disruption['times'] - baseline['times']
+
+        segments, segment_index = np.unique(self.segment[links], return_inverse=True)
+        n = len(segments)
+
+        def per_segment_max(values):
+            result = np.full(n, -np.inf)
+            np.maximum.at(result, segment_index, values)
+            return result
+
+        direction_delay = np.bincount(segment_index * 2 + self.forward[links], weights=added_time, minlength=2 * n)
+        added_delay = direction_delay.reshape(n, 2).max(axis=1)
+        segment_vehicle_hours = np.bincount(segment_index, weights=extra_vehicle_hours, minlength=n)
+        flow_before, flow_after = per_segment_max(flows_before), per_segment_max(flows_after)
+        v_c_before = per_segment_max(flows_before / capacity)
+        v_c_after = per_segment_max(flows_after / reduced_capacity)
+        is_disrupted = np.bincount(segment_index, weights=disrupted, minlength=n) > 0
+
+        distance = np.full(network.n_segments, np.nan)
+        if area_distances is not None:
+            distance[:] = np.inf
+            np.minimum.at(distance, network.piece_segment[area_pieces], area_distances)
+        distance = distance[segments]
+
+        spillover = ~is_disrupted & ((added_delay >= 0.05) | (np.abs(flow_after - flow_before) >= 1))
+        ranked = np.flatnonzero(spillover)
+        ranked = ranked[np.argsort(-segment_vehicle_hours[ranked], kind='stable')][:max_segments]
+
+        return {
+            'diverted_vph': round(float((flows_before - flows_after)[disrupted].max()), 1),
+            'total_extra_vehicle_hours': round(float(extra_vehicle_hours.sum()), 1),
+            'spillover_vehicle_hours': round(float(extra_vehicle_hours[~disrupted].sum()), 1),
+            'disrupted_segment': {
+                'segment_id': network.segment_id[segments[is_disrupted][0]],
+                'road_name': network.name[segments[is_disrupted][0]],
+                'baseline_flow_vph': round(float(flow_before[is_disrupted].max()), 1),
+                'disrupted_flow_vph': round(float(flow_after[is_disrupted].max()), 1),
+                'baseline_v_c': round(float(v_c_before[is_disrupted].max()), 2),
+                'disrupted_v_c': round(float(v_c_after[is_disrupted].max()), 2),
+                'added_delay_min': round(float(added_delay[is_disrupted].max()), 2)
+            },
+            'spillover_segments': [
+                {
+                    'segment_id': network.segment_id[segments[i]],
+                    'road_name': network.name[segments[i]],
+                    'road_type': network.road_types[network.road_type_code[segments[i]]],
+                    'distance_m': None if np.isnan(distance[i]) else int(round(distance[i])),
+                    'baseline_flow_vph': round(float(flow_before[i]), 1),
+                    'disrupted_flow_vph': round(float(flow_after[i]), 1),
+                    'baseline_v_c': round(float(v_c_before[i]), 2),
+                    'disrupted_v_c': round(float(v_c_after[i]), 2),
+                    'added_delay_min': round(float(added_delay[i]), 2),
+                    'extra_vehicle_hours': round(float(segment_vehicle_hours[i]), 2),
+                    'coordinates': network.coordinates(segments[i])
+                }
+                for i in ranked.tolist()
+            ]
+        }
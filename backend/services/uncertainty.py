@@ -0,0 +1,113 @@
+# backend/services/uncertainty.py
+
+import os
+
+import numpy as np
+
+CLASS_KEYS = ['Light', 'Moderate', 'Heavy']
+
+DEFAULT_SAMPLES = int(os.getenv('UNCERTAINTY_DEFAULT_SAMPLES', '1000'))
+MAX_SAMPLES = int(os.getenv('UNCERTAINTY_MAX_SAMPLES', '10000'))
+
+
+def uncertainty_options(value):
+    """
+    Parse the 'uncertainty' request field
+
+    Accepts true (default sample count), a sample count, or
+    {'samples': N, 'seed': S}. Falsy values turn uncertainty off.
+
+    Returns:
+        dict or None: {'samples': N, 'seed': S or None}
+
+    Raises:
+        ValueError: Invalid option or sample count out of range
+    """
+    if not value:
+        return None
+    if value is True:
+        samples, seed = DEFAULT_SAMPLES, None
+    elif isinstance(value, dict):
+        samples, seed = value.get('samples', DEFAULT_SAMPLES), value.get('seed')
+    else:
+        samples, seed = value, None
+
+    samples = int(samples)
+    if samples < 1 or samples > MAX_SAMPLES:
+        raise ValueError(f'Uncertainty samples must be between 1 and {MAX_SAMPLES}')
+    return {'samples': samples, 'seed': int(seed) if seed is not None else None}
+
+
+def probability_matrix(hourly_predictions):
+    """Hours x 3 class probabilities (rows renormalized after rounding)"""
+    probabilities = np.array(
+        [[p['probabilities'].get(key, 0.0) for key in CLASS_KEYS] for p in hourly_predictions],
+        dtype=np.float64
+    ).reshape(-1, 3)
+    totals = probabilities.sum(axis=1, keepdims=True)
+    return np.divide(probabilities, totals, out=np.full_like(probabilities, 1 / 3), where=totals > 0)
+
+
+class DelayUncertainty:
+    """
+    Monte Carlo spread of total delay and heavy hours
+
+    Draws N severity classes for every hour from its class probabilities
+    (one N x hours uniform matrix compared against the per-hour CDF) and
+    maps them to delays through the per-class BPR delay table, so the
+    whole run is a handful of N x hours array operations.
+
+    Hours are sampled independently - the bands show model uncertainty,
+    not correlated day-to-day swings.
+    """
+
+    def __init__(self, probabilities, class_delays, samples=DEFAULT_SAMPLES, seed=None):
+        """
+        Args:
+            probabilities: Hours x 3 class probabilities (Light, Moderate, Heavy)
+            class_delays: 3 x hours additional delay (minutes) per class
+            samples: Number of Monte Carlo samples (N)
+            seed: Optional RNG seed for reproducible bands
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        class_delays = np.asarray(class_delays, dtype=np.float32)
+        self.samples = int(samples)
+        self.seed = seed
+        self.n_hours = len(probabilities)
+
+        rng = np.random.default_rng(seed)
+        cdf = np.cumsum(probabilities, axis=1)
+        draws = rng.random((self.samples, self.n_hours), dtype=np.float32)
+
+        # Class = number of CDF thresholds passed (0 Light, 1 Moderate, 2 Heavy)
+        classes = (draws >= cdf[:, 0]).astype(np.int8)
+        classes += draws >= cdf[:, 1]
+
+        # Delay of each sampled class: flat index class * hours + hour
+        flat_index = classes.astype(np.int32) * self.n_hours + np.arange(self.n_hours, dtype=np.int32)
+        self.total_delay = class_delays.ravel().take(flat_index).sum(axis=1, dtype=np.float64)
+        self.heavy_hours = np.count_nonzero(classes == 2, axis=1)
+
+    def summary(self):
+        """P10 / P50 / P90 bands for the simulation response"""
+        delay_p10, delay_p50, delay_p90 = np.percentile(self.total_delay, [10, 50, 90]).tolist()
+        heavy_p10, heavy_p50, heavy_p90 = np.percentile(self.heavy_hours, [10, 50, 90]).tolist()
+        hours = max(self.n_hours, 1)
+        return {
+            'samples': self.samples,
+            'seed': self.seed,
+            'total_delay_minutes': {
+                'p10': round(delay_p10, 1), 'p50': round(delay_p50, 1), 'p90': round(delay_p90, 1)
+            },
+            'total_delay_hours': {
+                'p10': round(delay_p10 / 60, 1), 'p50': round(delay_p50 / 60, 1), 'p90': round(delay_p90 / 60, 1)
+            },
+            'avg_delay_minutes': {
+                'p10': round(delay_p10 / hours, 1), 'p50': round(delay_p50 / hours, 1), 'p90': round(delay_p90 / hours, 1)
+            },
+            'heavy_hours': {
+                'p10': int(round(heavy_p10)), 'p50': int(round(heavy_p50)), 'p90': int(round(heavy_p90))
+            },
+            'mean_total_delay_minutes': round(float(self.total_delay.mean()), 1),
+            'mean_heavy_hours': round(float(self.heavy_hours.mean()), 1)
+        }
@@ -0,0 +1,45 @@
+"""
+Build the prediction cube for TrafficPredictor
+
+Runs the Random Forest once for every (date, hour, area, corridor,
+disruption type, has_real_status) combination in a date range and saves
+the results next to random_forest_model.pkl. Rerun after retraining -
+a cube built for another model file is ignored automatically.
+
+Usage:
+    python scripts/build_prediction_cube.py [START_DATE] [END_DATE]
+    (defaults: today through one year ahead)
+"""
+
+import sys
+import os
+import time
+from datetime import date, timedelta
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.predictor import TrafficPredictor
+from backend.models.prediction_cube import build_prediction_cube
+
+start_date = sys.argv[1] if len(sys.argv) > 1 else date.today().isoformat()
+end_date = sys.argv[2] if len(sys.argv) > 2 else (date.fromisoformat(start_date) + timedelta(days=365)).isoformat()
+
+print("="*70)
+print("BUILDING PREDICTION CUBE")
+print("="*70)
+print(f"\n   Date range: {start_date} → {end_date}")
+
+predictor = TrafficPredictor()
+
+started = time.time()
+meta = build_prediction_cube(predictor, start_date, end_date)
+elapsed = time.time() - started
+
+cells = 1
+for size in meta['shape']:
+    cells *= size
+
+print(f"\n✓ Cube built in {elapsed:.1f}s")
+print(f"   Shape: {meta['shape']} ({cells:,} predictions)")
+print(f"   Model hash: {meta['model_sha256'][:12]}...")
@@ -0,0 +1,414 @@
+"""
+Parity check: SimulationAggregate vs the row-by-row aggregation it replaced
+
+Runs the report summaries (calculate_daily_summary,
+calculate_weekly_summary) and the map's day-by-day view
+(SimulationAggregate.daily_map_data) on randomized simulations and
+compares them with verbatim copies of the loops they replaced
+(calculate_daily_summary / calculate_weekly_summary before the
+columnar rewrite and the nested aggregate_predictions_smart of
+/api/simulate-disruption-realtime). Results must be identical.
+
+Imports the Flask app, so the database settings in backend/.env must
+work, as when running the server.
+"""
+
+import sys
+import os
+import random
+from datetime import datetime, timedelta
+
+# Add project root and backend to Python path (app.py imports services.*)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'backend'))
+# app.py loads .env from the working directory
+os.chdir(os.path.join(ROOT, 'backend'))
+
+from backend.app import calculate_daily_summary, calculate_weekly_summary, get_severity_status
+from services.aggregation import SimulationAggregate
+
+RUNS = 400
+
+
+# ============================================================
+# Reference implementations (before the columnar aggregator)
+# ============================================================
+
+def reference_daily_summary(simulation):
+    """Calculate day-by-day summary with accurate peak hour detection"""
+    results = simulation.get('results', [])
+    start_time = simulation.get('start_time')
+
+    if not results or not start_time:
+        return []
+
+    daily_summary = []
+    current_day = []
+    day_number = 1
+
+    for i, result in enumerate(results):
+        hour = result.get('hour', i)
+
+        # Group by 24-hour periods
+        if hour > 0 and hour % 24 == 0:
+            if current_day:
+                # ✅ FIXED: Accurate peak hour detection
+                # Find all hours with severity within 10% of max severity
+                max_severity = max(r.get('severity', 0) for r in current_day)
+                threshold = max_severity * 0.9  # Within 90% of max
+
+                peak_hours = [
+                    r.get('hour', 0) % 24 
+                    for r in current_day 
+                    if r.get('severity', 0) >= threshold
+                ]
+
+                # Format peak hours
+                if len(peak_hours) == 1:
+                    peak_hour_str = f"{peak_hours[0]:02d}:00"
+                elif len(peak_hours) <= 3:
+                    peak_hour_str = ", ".join(f"{h:02d}:00" for h in sorted(peak_hours))
+                else:
+                    # Show range if many consecutive hours
+                    peak_hours.sort()
+                    peak_hour_str = f"{peak_hours[0]:02d}:00 - {peak_hours[-1]:02d}:00"
+
+                # ✅ FIXED: Calculate average delay during peak hours only
+                peak_delays = [
+                    r.get('delay_minutes', 0) 
+                    for r in current_day 
+                    if (r.get('hour', 0) % 24) in peak_hours
+                ]
+                avg_peak_delay = sum(peak_delays) / len(peak_delays) if peak_delays else 0
+
+                # Calculate overall averages
+                avg_severity = sum(r.get('severity', 0) for r in current_day) / len(current_day)
+                max_delay = max(r.get('delay_minutes', 0) for r in current_day)
+
+                date_obj = start_time + timedelta(days=day_number-1)
+
+                daily_summary.append({
+                    'day_number': day_number,
+                    'date': date_obj.strftime('%Y-%m-%d'),
+                    'avg_severity': round(avg_severity, 2),
+                    'peak_hour': peak_hour_str,  # ✅ Now shows range
+                    'peak_hours': peak_hours,  # ✅ List of peak hours
+                    'max_delay': max_delay,
+                    'avg_peak_delay': round(avg_peak_delay),  # ✅ NEW: Avg delay in peak hours
+                    'status': get_severity_status(avg_severity)
+                })
+
+                current_day = []
+                day_number += 1
+
+        current_day.append(result)
+
+    # Handle last day
+    if current_day:
+        max_severity = max(r.get('severity', 0) for r in current_day)
+        threshold = max_severity * 0.9
+
+        peak_hours = [
+            r.get('hour', 0) % 24 
+            for r in current_day 
+            if r.get('severity', 0) >= threshold
+        ]
+
+        if len(peak_hours) == 1:
+            peak_hour_str = f"{peak_hours[0]:02d}:00"
+        elif len(peak_hours) <= 3:
+            peak_hour_str = ", ".join(f"{h:02d}:00" for h in sorted(peak_hours))
+        else:
+            peak_hours.sort()
+            peak_hour_str = f"{peak_hours[0]:02d}:00 - {peak_hours[-1]:02d}:00"
+
+        peak_delays = [
+            r.get('delay_minutes', 0) 
+            for r in current_day 
+            if (r.get('hour', 0) % 24) in peak_hours
+        ]
+        avg_peak_delay = sum(peak_delays) / len(peak_delays) if peak_delays else 0
+
+        avg_severity = sum(r.get('severity', 0) for r in current_day) / len(current_day)
+        max_delay = max(r.get('delay_minutes', 0) for r in current_day)
+
+        date_obj = start_time + timedelta(days=day_number-1)
+
+        daily_summary.append({
+            'day_number': day_number,
+            'date': date_obj.strftime('%Y-%m-%d'),
+            'avg_severity': round(avg_severity, 2),
+            'peak_hour': peak_hour_str,
+            'peak_hours': peak_hours,
+            'max_delay': max_delay,
+            'avg_peak_delay': round(avg_peak_delay),
+            'status': get_severity_status(avg_severity)
+        })
+
+    return daily_summary
+
+
+def reference_weekly_summary(simulation):
+    """Calculate week-by-week summary with accurate peak detection"""
+    results = simulation.get('results', [])
+    start_time = simulation.get('start_time')
+
+    if not results or not start_time:
+        return []
+
+    weekly_summary = []
+    current_week = []
+    week_number = 1
+
+    for i, result in enumerate(results):
+        hour = result.get('hour', i)
+
+        # Group by 168-hour periods (7 days)
+        if hour > 0 and hour % 168 == 0:
+            if current_week:
+                # ✅ FIXED: Calculate accurate weekly metrics
+                avg_severity = sum(r.get('severity', 0) for r in current_week) / len(current_week)
+                avg_delay = sum(r.get('delay_minutes', 0) for r in current_week) / len(current_week)
+
+                # Find peak hours
+                max_severity = max(r.get('severity', 0) for r in current_week)
+                threshold = max_severity * 0.9
+
+                peak_hours = [
+                    r for r in current_week 
+                    if r.get('severity', 0) >= threshold
+                ]
+
+                # Calculate average delay during peak hours
+                avg_peak_delay = sum(r.get('delay_minutes', 0) for r in peak_hours) / len(peak_hours) if peak_hours else 0
+
+                week_start = start_time + timedelta(days=(week_number-1)*7)
+                week_end = week_start + timedelta(days=6)
+
+                # Determine trend
+                first_half_avg = sum(r.get('severity', 0) for r in current_week[:len(current_week)//2]) / (len(current_week)//2)
+                second_half_avg = sum(r.get('severity', 0) for r in current_week[len(current_week)//2:]) / (len(current_week) - len(current_week)//2)
+
+                if second_half_avg > first_half_avg + 0.2:
+                    trend = '↑ Rising'
+                elif second_half_avg < first_half_avg - 0.2:
+                    trend = '↓ Falling'
+                else:
+                    trend = '→ Stable'
+
+                weekly_summary.append({
+                    'week_number': week_number,
+                    'date_range': f"{week_start.strftime('%m/%d')} - {week_end.strftime('%m/%d')}",
+                    'start_date': week_start.strftime('%Y-%m-%d'),
+                    'end_date': week_end.strftime('%Y-%m-%d'),
+                    'avg_severity': round(avg_severity, 2),
+                    'total_hours': len(current_week),
+                    'avg_delay': round(avg_delay, 1),
+                    'avg_peak_delay': round(avg_peak_delay, 1),  # ✅ NEW
+                    'trend': trend
+                })
+
+                current_week = []
+                week_number += 1
+
+        current_week.append(result)
+
+    # Handle last week (same fix as above)
+    if current_week:
+        avg_severity = sum(r.get('severity', 0) for r in current_week) / len(current_week)
+        avg_delay = sum(r.get('delay_minutes', 0) for r in current_week) / len(current_week)
+
+        max_severity = max(r.get('severity', 0) for r in current_week)
+        threshold = max_severity * 0.9
+        peak_hours = [r for r in current_week if r.get('severity', 0) >= threshold]
+        avg_peak_delay = sum(r.get('delay_minutes', 0) for r in peak_hours) / len(peak_hours) if peak_hours else 0
+
+        week_start = start_time + timedelta(days=(week_number-1)*7)
+        week_end = start_time + timedelta(hours=len(results))
+
+        first_half_avg = sum(r.get('severity', 0) for r in current_week[:len(current_week)//2]) / max(len(current_week)//2, 1)
+        second_half_avg = sum(r.get('severity', 0) for r in current_week[len(current_week)//2:]) / max(len(current_week) - len(current_week)//2, 1)
+
+        if second_half_avg > first_half_avg + 0.2:
+            trend = '↑ Rising'
+        elif second_half_avg < first_half_avg - 0.2:
+            trend = '↓ Falling'
+        else:
+            trend = '→ Stable'
+
+        weekly_summary.append({
+            'week_number': week_number,
+            'date_range': f"{week_start.strftime('%m/%d')} - {week_end.strftime('%m/%d')}",
+            'start_date': week_start.strftime('%Y-%m-%d'),
+            'end_date': week_end.strftime('%Y-%m-%d'),
+            'avg_severity': round(avg_severity, 2),
+            'total_hours': len(current_week),
+            'avg_delay': round(avg_delay, 1),
+            'avg_peak_delay': round(avg_peak_delay, 1),  # ✅ NEW
+            'trend': trend
+        })
+
+    return weekly_summary
+
+
+def reference_map_data(hourly_predictions, start_datetime, end_datetime):
+    """
+    Aggregate predictions on a day-by-day basis
+    Always returns daily granularity regardless of duration
+    """
+    # Always show day-by-day breakdown
+    daily_aggregates = []
+    current_date = start_datetime.date()
+    end_date = end_datetime.date()
+
+    while current_date <= end_date:
+        # Get all predictions for this day
+        day_predictions = [
+            p for p in hourly_predictions 
+            if datetime.strptime(p['datetime'], '%Y-%m-%d %H:%M').date() == current_date
+        ]
+
+        if day_predictions:
+            # Calculate daily averages
+            avg_severity = sum(p['severity'] for p in day_predictions) / len(day_predictions)
+            avg_delay = sum(p['delay_info']['additional_delay_min'] for p in day_predictions) / len(day_predictions)
+
+            # Determine dominant severity
+            severity_counts = {
+                'Light': sum(1 for p in day_predictions if p['severity'] < 0.5),
+                'Moderate': sum(1 for p in day_predictions if 0.5 <= p['severity'] < 1.5),
+                'Heavy': sum(1 for p in day_predictions if p['severity'] >= 1.5)
+            }
+            dominant_severity = max(severity_counts, key=severity_counts.get)
+
+            # ✅ FIX: Find ALL peak hours and calculate peak delay
+            max_severity = max(p['severity'] for p in day_predictions)
+            # Consider hours within 0.1 of max severity as "peak hours"
+            peak_threshold = max_severity - 0.1
+            peak_hour_predictions = [p for p in day_predictions if p['severity'] >= peak_threshold]
+
+            # Get the peak hours (sorted)
+            peak_hours_list = sorted([p['hour'] for p in peak_hour_predictions])
+
+            # Calculate average delay during peak hours
+            peak_delay = sum(p['delay_info']['additional_delay_min'] for p in peak_hour_predictions) / len(peak_hour_predictions) if peak_hour_predictions else 0
+
+            # Format peak hour display
+            if len(peak_hours_list) == 1:
+                peak_hour_display = peak_hours_list[0]
+            elif len(peak_hours_list) <= 3:
+                # Show as range or list for 2-3 hours
+                peak_hour_display = peak_hours_list[0] if len(peak_hours_list) == 1 else f"{peak_hours_list[0]}-{peak_hours_list[-1]}"
+            else:
+                # Multiple peak hours - show first and last
+                peak_hour_display = f"{peak_hours_list[0]}-{peak_hours_list[-1]}"
+
+            daily_aggregates.append({
+                'date': current_date.strftime('%Y-%m-%d'),
+                'day_name': current_date.strftime('%A'),
+                'avg_severity': round(avg_severity, 2),
+                'avg_severity_label': dominant_severity,
+                'avg_delay_min': round(avg_delay),
+                'hour_count': len(day_predictions),
+                'severity_breakdown': severity_counts,
+                'peak_hour': peak_hour_display,  # ✅ Now shows formatted hour(s)
+                'peak_hours': peak_hours_list,  # ✅ Array of all peak hours
+                'peak_severity': round(max_severity, 2),
+                'peak_delay': round(peak_delay),  # ✅ Average delay during peak hours
+                'avg_peak_delay': round(peak_delay)  # ✅ Alternative field name for compatibility
+            })
+
+        current_date += timedelta(days=1)
+
+    return {
+        'granularity': 'daily',
+        'display_label': 'Day-by-Day View',
+        'map_data': daily_aggregates
+    }
+
+
+# ============================================================
+# Randomized simulations
+# ============================================================
+
+def random_severity(rng):
+    # Ties and near-ties around the peak thresholds are the interesting cases
+    return rng.choice([0.0, 0.5, 1.0, 1.5, 2.0, round(rng.uniform(0, 3), 2), rng.uniform(0, 3)])
+
+
+def random_delay(rng):
+    return rng.choice([0, rng.randint(0, 60), float(rng.randint(0, 60)), round(rng.uniform(0, 90), 1)])
+
+
+def random_report_simulation(rng):
+    n_hours = rng.choice([1, 5, 23, 24, 25, 168, 169, rng.randint(1, 24 * 45)])
+    return {
+        'start_time': datetime(2025, 1, 1) + timedelta(days=rng.randint(0, 364)),
+        'results': [
+            {'hour': hour, 'severity': random_severity(rng), 'delay_minutes': random_delay(rng)}
+            for hour in range(n_hours)
+        ]
+    }
+
+
+def random_hourly_predictions(rng):
+    start = datetime(2025, 1, 1) + timedelta(days=rng.randint(0, 364), hours=rng.randint(0, 23))
+    end = start + timedelta(hours=rng.randint(0, 24 * 30))
+    predictions = []
+    current = start
+    while current <= end:
+        predictions.append({
+            'datetime': current.strftime('%Y-%m-%d %H:%M'),
+            'date': current.strftime('%Y-%m-%d'),
+            'hour': current.hour,
+            'severity': random_severity(rng),
+            'delay_info': {'additional_delay_min': random_delay(rng)}
+        })
+        current += timedelta(hours=1)
+    return predictions, start, end
+
+
+def first_difference(expected, actual):
+    if len(expected) != len(actual):
+        return f"{len(expected)} periods expected, {len(actual)} returned"
+    for i, (a, b) in enumerate(zip(expected, actual)):
+        for key in a.keys() | b.keys():
+            if a.get(key) != b.get(key) or type(a.get(key)) is not type(b.get(key)):
+                return f"period {i + 1} '{key}': expected {a.get(key)!r}, got {b.get(key)!r}"
+    return None
+
+
+print("="*70)
+print("SIMULATION AGGREGATION PARITY CHECK")
+print("="*70)
+
+rng = random.Random(12)
+failures = []
+
+print(f"\nComparing {RUNS} randomized simulations per section...")
+
+for run in range(RUNS):
+    simulation = random_report_simulation(rng)
+    for name, reference, current in (
+        ('daily summary', reference_daily_summary, calculate_daily_summary),
+        ('weekly summary', reference_weekly_summary, calculate_weekly_summary)
+    ):
+        difference = first_difference(reference(simulation), current(simulation))
+        if difference:
+            failures.append((name, run, difference))
+
+    predictions, start, end = random_hourly_predictions(rng)
+    expected = reference_map_data(predictions, start, end)['map_data']
+    actual = SimulationAggregate.from_hourly_predictions(predictions, start.date(), end.date()).daily_map_data(start.date())
+    difference = first_difference(expected, actual)
+    if difference:
+        failures.append(('map data', run, difference))
+
+if not failures:
+    print("\n✅ Perfect match! Daily / weekly report summaries and map data are unchanged.")
+else:
+    print(f"\n❌ MISMATCH in {len(failures)} comparison(s):")
+    for name, run, difference in failures[:10]:
+        print(f"   - {name}, run {run}: {difference}")
+    sys.exit(1)
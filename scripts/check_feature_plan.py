@@ -0,0 +1,69 @@
+"""
+Parity check: vectorized FeaturePlan vs the per-row feature dict builder
+
+Builds features both ways for every hour, area, road corridor and
+disruption type (over dates covering weekdays, weekends and holidays)
+and compares them at float32, the precision the Random Forest uses.
+"""
+
+import sys
+import os
+import itertools
+
+import numpy as np
+import pandas as pd
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.predictor import TrafficPredictor
+from backend.models.feature_plan import AREAS, ROAD_CORRIDORS, DISRUPTION_TYPES
+
+predictor = TrafficPredictor()
+
+print("="*70)
+print("FEATURE PLAN PARITY CHECK")
+print("="*70)
+
+# A week around a holiday plus a week in another month/year
+dates = list(pd.date_range('2024-12-27', '2025-01-03')) + list(pd.date_range('2025-06-09', '2025-06-15'))
+
+inputs = []
+for i, (date, hour, area, road, disruption_type) in enumerate(itertools.product(
+    dates, range(24), AREAS, ROAD_CORRIDORS, DISRUPTION_TYPES + [None]
+)):
+    # Alternate data quality inputs across rows
+    has_real_status = i % 2
+    total_volume = 850.5 if i % 3 == 0 else 0
+    inputs.append({
+        'date': date.strftime('%Y-%m-%d'),
+        'hour': hour,
+        'area': area,
+        'road_corridor': road,
+        'has_disruption': 0 if disruption_type is None else 1,
+        'disruption_type': disruption_type,
+        'total_volume': total_volume,
+        'has_real_status': has_real_status
+    })
+
+print(f"\nBuilding {len(inputs):,} rows...")
+
+expected = pd.concat(
+    [predictor.prepare_features(input_data) for input_data in inputs],
+    ignore_index=True
+).to_numpy(dtype=np.float32)
+actual = predictor.feature_plan.build_from_inputs(inputs)
+
+print(f"   Shape (dict builder): {expected.shape}")
+print(f"   Shape (feature plan): {actual.shape} {actual.dtype}, C-contiguous={actual.flags['C_CONTIGUOUS']}")
+
+mismatched = np.flatnonzero((expected != actual).any(axis=0))
+
+if len(mismatched) == 0:
+    print("\n✅ Perfect match! Feature plan reproduces every feature.")
+else:
+    print(f"\n❌ MISMATCH in {len(mismatched)} feature(s):")
+    for column in mismatched:
+        rows = np.flatnonzero(expected[:, column] != actual[:, column])
+        print(f"   - {predictor.feature_names[column]}: {len(rows)} row(s), first input {inputs[rows[0]]}")
+    sys.exit(1)
@@ -0,0 +1,83 @@
+"""
+Parity and latency check: NumPy forest engine vs sklearn predict_proba
+
+Compares class probabilities on random feature rows (within tolerance,
+tree sums are accumulated in a different order) and times single-row,
+256-row (the default NUMPY_ENGINE_MAX_ROWS switch-over) and 720-row
+(30-day simulation) batches for both engines.
+"""
+
+import sys
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.predictor import TrafficPredictor
+from backend.models.forest_engine import ForestArrays
+
+TOLERANCE = 1e-9
+
+predictor = TrafficPredictor()
+model = predictor.model
+forest = ForestArrays.from_sklearn(model)
+
+print("="*70)
+print("NUMPY FOREST ENGINE CHECK")
+print("="*70)
+
+# One simulated month of hourly inputs for every corridor / disruption type
+inputs = []
+for road, area in [('Calamba_Pagsanjan', 'Bucal'), ('Maharlika_Parian', 'Parian'), ('Maharlika_Turbina', 'Turbina')]:
+    for disruption_type in ['roadwork', 'incident', 'accident', 'weather', 'event', None]:
+        for timestamp in pd.date_range('2025-03-01', periods=720, freq='h'):
+            inputs.append({
+                'date': timestamp.strftime('%Y-%m-%d'),
+                'hour': timestamp.hour,
+                'area': area,
+                'road_corridor': road,
+                'has_disruption': 0 if disruption_type is None else 1,
+                'disruption_type': disruption_type,
+                'total_volume': 0,
+                'has_real_status': 0
+            })
+
+X = predictor.feature_plan.build_from_inputs(inputs)
+X_df = pd.DataFrame(X, columns=predictor.feature_names)
+
+expected = model.predict_proba(X_df)
+actual = forest.predict_proba(X)
+max_error = np.abs(expected - actual).max()
+
+print(f"\n   Rows compared: {len(X):,}")
+print(f"   Max |probability difference|: {max_error:.2e}")
+print(f"   Class agreement: {(expected.argmax(axis=1) == actual.argmax(axis=1)).mean()*100:.2f}%")
+
+if max_error > TOLERANCE:
+    print(f"\n❌ Probabilities differ by more than {TOLERANCE}")
+    sys.exit(1)
+print(f"\n✅ Probabilities match sklearn (tolerance {TOLERANCE})")
+
+
+def best_time(func, repeats):
+    """Best wall time of several runs, in milliseconds"""
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - started) * 1000)
+    return min(times)
+
+
+print("\n" + "="*70)
+print("LATENCY (best of several runs)")
+print("="*70)
+
+for label, rows, repeats in [('1 row', 1, 20), ('256 rows', 256, 5), ('720 rows', 720, 5)]:
+    sklearn_ms = best_time(lambda: model.predict_proba(X_df.iloc[:rows]), repeats)
+    numpy_ms = best_time(lambda: forest.predict_proba(X[:rows]), repeats)
+    print(f"   {label:9} sklearn: {sklearn_ms:8.2f} ms   numpy: {numpy_ms:8.2f} ms   ({sklearn_ms / numpy_ms:.1f}x)")
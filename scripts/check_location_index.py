@@ -0,0 +1,77 @@
+"""
+Parity and latency check: vectorized vs scalar location multipliers
+
+Scores a lat/lng grid around every Calamba POI for all 24 hours and
+7 days with LocationIndex.location_multipliers and compares it to the
+per-row location_multiplier path used by get_location_multiplier,
+then reports how often the precomputed location raster agrees.
+"""
+
+import sys
+import os
+import time
+
+import numpy as np
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.predictor import TrafficPredictor
+
+predictor = TrafficPredictor()
+index = predictor.location_index
+
+print("="*70)
+print("LOCATION INDEX CHECK")
+print("="*70)
+
+# 30 x 30 grid covering every POI (plus ~1 km margin)
+lat_axis = np.linspace(index.lat.min() - 0.01, index.lat.max() + 0.01, 30)
+lng_axis = np.linspace(index.lng.min() - 0.01, index.lng.max() + 0.01, 30)
+lats, lngs, hours, dows = [a.ravel() for a in np.meshgrid(lat_axis, lng_axis, np.arange(24), np.arange(7), indexing='ij')]
+
+started = time.perf_counter()
+vectorized = predictor.location_multipliers(lats, lngs, hours, dows)
+vectorized_ms = (time.perf_counter() - started) * 1000
+
+started = time.perf_counter()
+scalar = np.array([
+    index.location_multiplier(lat, lng, int(hour), int(dow), dow == 4)
+    for lat, lng, hour, dow in zip(lats.tolist(), lngs.tolist(), hours, dows)
+])
+scalar_ms = (time.perf_counter() - started) * 1000
+
+mismatches = int((vectorized != scalar).sum())
+
+print(f"\n   POIs indexed: {len(index.kind)} in {len(index._cell_keys)} grid cells")
+print(f"   Rows compared: {len(lats):,}")
+print(f"   Mismatches: {mismatches}")
+print(f"   Distinct multipliers: {sorted(set(vectorized.tolist()))}")
+
+if mismatches:
+    print("\n❌ Vectorized and scalar multipliers differ")
+    sys.exit(1)
+print("\n✅ Vectorized multipliers match the scalar path")
+
+print("\n" + "="*70)
+print("LATENCY")
+print("="*70)
+print(f"   Scalar loop:   {scalar_ms:9.1f} ms ({scalar_ms * 1000 / len(lats):.1f} µs/row)")
+print(f"   Vectorized:    {vectorized_ms:9.1f} ms ({vectorized_ms * 1000 / len(lats):.2f} µs/row)")
+
+print("\n" + "="*70)
+print("LOCATION RASTER")
+print("="*70)
+
+raster = predictor.location_raster
+if raster is None:
+    print("\n   Raster disabled (USE_LOCATION_RASTER=false)")
+else:
+    # Cells store the value at their center, so only cells cut by a POI radius differ
+    started = time.perf_counter()
+    rastered = raster.lookup(lats, lngs, hours, dows)
+    raster_ms = (time.perf_counter() - started) * 1000
+
+    print(f"\n   Grid: {raster.n_rows} x {raster.n_cols} cells at {raster.meta['resolution_m']:g} m")
+    print(f"   Agreement with exact multipliers: {(rastered == vectorized).mean()*100:.2f}%")
+    print(f"   Lookup: {raster_ms:9.1f} ms ({raster_ms * 1000 / len(lats):.2f} µs/row)")
@@ -0,0 +1,60 @@
+"""
+Parity check: TrafficPredictor.predict_batch vs calling predict() per row
+
+Runs both on a mix of hours (day and night rules), areas, road
+corridors, disruption types and data-quality inputs over weekdays,
+weekends and a holiday, and requires identical result dicts.
+"""
+
+import sys
+import os
+import itertools
+
+import pandas as pd
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.predictor import TrafficPredictor
+from backend.models.feature_plan import AREAS, ROAD_CORRIDORS, DISRUPTION_TYPES
+
+predictor = TrafficPredictor(cache_size=0)
+
+print("="*70)
+print("PREDICT BATCH PARITY CHECK")
+print("="*70)
+
+# Holidays, a weekend day and a weekday; every other date passed as a Timestamp
+dates = pd.to_datetime(['2024-12-29', '2024-12-30', '2025-01-01', '2025-06-10', '2025-06-14'])
+
+inputs = []
+for i, (date, hour, area, road, disruption_type) in enumerate(itertools.product(
+    dates, range(24), AREAS, ROAD_CORRIDORS[:2], DISRUPTION_TYPES + [None]
+)):
+    inputs.append({
+        'date': date if i % 2 else date.strftime('%Y-%m-%d'),
+        'hour': hour,
+        'area': area,
+        'road_corridor': road,
+        'has_disruption': 0 if disruption_type is None else 1,
+        'disruption_type': disruption_type,
+        'total_volume': 850.5 if i % 3 == 0 else 0,
+        'has_real_status': i % 2
+    })
+
+print(f"\nPredicting {len(inputs):,} inputs both ways...")
+
+expected = [predictor.predict(input_data) for input_data in inputs]
+actual = predictor.predict_batch(inputs)
+
+mismatched = [i for i, (a, b) in enumerate(zip(expected, actual)) if a != b]
+
+if len(actual) == len(expected) and not mismatched:
+    print("\n✅ Perfect match! predict_batch returns what the predict() loop returns.")
+else:
+    print(f"\n❌ MISMATCH in {len(mismatched)} of {len(inputs):,} input(s) ({len(actual)} results for {len(expected)} inputs)")
+    for i in mismatched[:5]:
+        print(f"   - input {inputs[i]}")
+        print(f"     predict():       {expected[i]}")
+        print(f"     predict_batch(): {actual[i]}")
+    sys.exit(1)
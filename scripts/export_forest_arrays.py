@@ -0,0 +1,49 @@
+"""
+Export the Random Forest model(s) as packed NumPy arrays
+
+Writes random_forest_arrays/ (and random_forest_compact_arrays/ when the
+compact model exists) next to the model files: one uncompressed .npy
+per node array plus meta.json with the model hash. TrafficPredictor uses
+them with PREDICTION_ENGINE=numpy or MODEL_LOADING=mmap. Rerun after
+retraining - arrays exported from another model file are ignored.
+"""
+
+import sys
+import os
+import time
+
+import joblib
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.forest_engine import ForestArrays, forest_arrays_dir
+from backend.models.prediction_cube import file_sha256
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'models')
+
+print("="*70)
+print("EXPORTING RANDOM FOREST TO NUMPY ARRAYS")
+print("="*70)
+
+for model_file in ['random_forest_model.pkl', 'random_forest_model_compact.pkl']:
+    model_path = os.path.join(MODELS_DIR, model_file)
+    if not os.path.exists(model_path):
+        print(f"\n⚠ {model_file} not found - skipping")
+        continue
+
+    output_dir = forest_arrays_dir(model_path)
+
+    started = time.time()
+    model = joblib.load(model_path)
+    print(f"\n✓ {model_file} loaded in {time.time() - started:.1f}s")
+
+    forest = ForestArrays.from_sklearn(model)
+    forest.save(output_dir, model_sha256=file_sha256(model_path))
+
+    size_mb = sum(
+        os.path.getsize(os.path.join(output_dir, name)) for name in os.listdir(output_dir)
+    ) / 1024 / 1024
+
+    print(f"✓ Exported {forest.n_estimators} trees, {forest.n_nodes:,} nodes (max depth {forest.max_depth})")
+    print(f"✓ Saved: {output_dir} ({size_mb:.1f} MB)")
@@ -10,6 +10,7 @@ import pandas as pd
 import numpy as np
 import os
 import joblib
+import time
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split, cross_val_score, StratifiedKFold
 from sklearn.metrics import (
@@ -232,6 +233,61 @@ print(classification_report(y_test, final_pred,
                            target_names=['Light', 'Moderate', 'Heavy'],
                            digits=3))
 
+# ============================================================
+# STEP 5B: COMPACT MODEL FOR LATENCY-BUDGETED SERVING
+# ============================================================
+
+print("\n" + "="*70)
+print("STEP 5B: Training compact model (fewer, shallower trees)...")
+
+def measure_latency_ms(model, X_rows, repeats):
+    """Best-of-N predict_proba wall time in milliseconds"""
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        model.predict_proba(X_rows)
+        times.append((time.perf_counter() - started) * 1000)
+    return min(times)
+
+def latency_profile(model):
+    """Single-row and 720-row (30-day simulation) latency"""
+    rows_720 = X_test.sample(n=720, replace=len(X_test) < 720, random_state=42)
+    return {
+        'single_row': round(measure_latency_ms(model, X_test.iloc[:1], repeats=20), 2),
+        'rows_720': round(measure_latency_ms(model, rows_720, repeats=5), 2)
+    }
+
+compact_model = RandomForestClassifier(
+    n_estimators=100,
+    max_depth=15,
+    min_samples_split=10,
+    min_samples_leaf=5,
+    max_features='sqrt',
+    class_weight='balanced',
+    random_state=42,
+    n_jobs=-1
+)
+compact_model.fit(X_train, y_train)
+
+# Small forests answer faster without joblib thread dispatch
+compact_model.n_jobs = 1
+
+compact_pred = compact_model.predict(X_test)
+compact_acc = accuracy_score(y_test, compact_pred)
+compact_balanced = balanced_accuracy_score(y_test, compact_pred)
+
+final_latency = latency_profile(final_model)
+compact_latency = latency_profile(compact_model)
+
+print(f"\n📊 Full vs compact:")
+print(f"   {'':16} {'Full':>10} {'Compact':>10}")
+print(f"   {'Trees':16} {final_model.n_estimators:>10} {compact_model.n_estimators:>10}")
+print(f"   {'Max depth':16} {final_model.max_depth:>10} {compact_model.max_depth:>10}")
+print(f"   {'Accuracy':16} {final_acc*100:>9.2f}% {compact_acc*100:>9.2f}%")
+print(f"   {'1 row (ms)':16} {final_latency['single_row']:>10.2f} {compact_latency['single_row']:>10.2f}")
+print(f"   {'720 rows (ms)':16} {final_latency['rows_720']:>10.2f} {compact_latency['rows_720']:>10.2f}")
+print(f"   Accuracy difference: {(compact_acc - final_acc)*100:+.2f}%")
+
 # ============================================================
 # STEP 6: PROGRESSION SUMMARY
 # ============================================================
@@ -262,6 +318,10 @@ feature_path = os.path.join(MODELS_DIR, 'feature_names.pkl')
 joblib.dump(list(X.columns), feature_path)
 print(f"✓ Features saved: {feature_path}")
 
+compact_path = os.path.join(MODELS_DIR, 'random_forest_model_compact.pkl')
+joblib.dump(compact_model, compact_path)
+print(f"✓ Compact model saved: {compact_path}")
+
 info = {
     'accuracy': final_acc,
     'cohen_kappa': final_kappa,
@@ -274,7 +334,16 @@ info = {
     'max_depth': final_model.max_depth,
     'features_removed': len(weak_features),
     'training_samples': len(X_train),
-    'test_samples': len(X_test)
+    'test_samples': len(X_test),
+    'latency_ms': final_latency,
+    'compact': {
+        'accuracy': compact_acc,
+        'balanced_accuracy': compact_balanced,
+        'accuracy_diff': compact_acc - final_acc,
+        'n_estimators': compact_model.n_estimators,
+        'max_depth': compact_model.max_depth,
+        'latency_ms': compact_latency
+    }
 }
 
 info_path = os.path.join(MODELS_DIR, 'model_info.pkl')
@@ -303,3 +372,8 @@ print(f"   Max depth:           {final_model.max_depth}")
 print(f"   Features:            {len(X.columns)}")
 print(f"   Training samples:    {len(X_train):,}")
 
+print(f"\n Compact Variant:")
+print(f"   Trees / depth:       {compact_model.n_estimators} / {compact_model.max_depth}")
+print(f"   Accuracy:            {compact_acc*100:.2f}% ({(compact_acc - final_acc)*100:+.2f}%)")
+print(f"   720-row latency:     {compact_latency['rows_720']:.1f} ms (full: {final_latency['rows_720']:.1f} ms)")
+